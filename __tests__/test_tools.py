@@ -0,0 +1,182 @@
+"""Tests of the Python asset and data tools (generate_assets.py, sharecode.py,
+analytics.py, leaderboard.py, synthetic.py). Run with pytest from the repo root."""
+
+import base64
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import leaderboard  # noqa: E402
+import sharecode  # noqa: E402
+import synthetic  # noqa: E402
+from generate_assets import LayerStack, PngStream  # noqa: E402
+
+GAME = {
+    'v': 2, 'pc': 4, 'd': '2025/03/01', 'p': ['太郎', '花子', '次郎', '美咲'],
+    's': [[1, i, p, 1740816000000, '3月1日08:00'] for i, p in enumerate((30, 10, -10, -30))],
+    'c': [[1, i, c, 1740816060000, '3月1日08:01'] for i, c in enumerate((2, -2, 0, 0))],
+}
+
+
+# ──────────────────────────────────────────────
+# Share codes
+# ──────────────────────────────────────────────
+
+def test_reference_codec_round_trip():
+    text = sharecode.share_json(GAME)
+    assert sharecode.decode_share_code(sharecode.encode_share_code(text)) == text
+
+
+def test_reference_codec_reads_uncompressed_codes():
+    text = sharecode.share_json(GAME)
+    assert sharecode.decode_share_code(base64.b64encode(text.encode('utf-8')).decode('ascii')) == text
+
+
+def test_compact_codec_round_trip():
+    for game in [GAME] + sharecode.synthetic_corpus(20, seed=7):
+        code = sharecode.encode_compact(game)
+        assert code.startswith(sharecode.COMPACT_MARKER)
+        assert sharecode.decode_compact(code) == game
+
+
+def test_compact_codes_decode_with_the_frozen_dictionary():
+    # Encoded with COMPACT_VERSION 1; fails if PRESET_DICTIONARY changes
+    code = ('~AatGd4C-gbG-gSHM-dDUroNIsPA8AU3WWOyHuCwaGo6xkIAxBnINwFlC1xikAhJMJgYWhmYGYIARMsbP5nQYgtKdhZ'
+            'WBAVq44LPJCJRuIZLIlpgRtMQQZEktAA')
+    assert sharecode.decode_compact(code) == GAME
+
+
+def test_compact_codec_rejects_other_versions():
+    code = sharecode.encode_compact(GAME)
+    raw = bytearray(base64.urlsafe_b64decode(code[1:] + '=' * (-len(code[1:]) % 4)))
+    raw[0] = sharecode.COMPACT_VERSION + 1
+    other = sharecode.COMPACT_MARKER + base64.urlsafe_b64encode(bytes(raw)).decode('ascii').rstrip('=')
+    with pytest.raises(ValueError):
+        sharecode.decode_compact(other)
+
+
+def test_compact_codec_carries_v2_only():
+    with pytest.raises(ValueError):
+        sharecode.encode_compact(dict(GAME, v=1))
+
+
+# ──────────────────────────────────────────────
+# Ranks
+# ──────────────────────────────────────────────
+
+@pytest.mark.parametrize('points, ranks', [
+    ([30, 10, -20, -20], [1, 2, 3, 3]),
+    ([0, 0, 0], [1, 1, 1]),
+    ([30, 10, 10, -50], [1, 2, 2, 4]),
+    ([-50, 10, 30, 10], [4, 2, 1, 2]),
+    ([], []),
+])
+def test_competition_ranks_matches_calc_ranks(points, ranks):
+    point = np.array(points, dtype=np.int64)
+    assert analytics.competition_ranks(np.zeros(len(point), dtype=np.int64), point).tolist() == ranks
+
+
+def test_competition_ranks_ranks_each_group_separately():
+    group = np.array([2, 1, 2, 1, 2, 1])
+    point = np.array([10, 5, 10, 5, -20, -10])
+    assert analytics.competition_ranks(group, point).tolist() == [1, 1, 1, 1, 3, 3]
+
+
+# ──────────────────────────────────────────────
+# Synthetic games through analytics and the leaderboard
+# ──────────────────────────────────────────────
+
+def test_leaderboard_standings_match_analytics(tmp_path):
+    games = list(synthetic.synthetic_games(30, hanchan=(1, 8), seed=11))
+    db = str(tmp_path / 'backup.db')
+    synthetic.write_sqlite(db, games)
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    synthetic.write_share_codes(str(archive / 'codes.txt'), games)
+
+    data = analytics.Dataset(analytics.load_backups([db]))
+    expected = analytics.player_stats(data)
+    season, added, rejected = leaderboard.update_season(str(archive), str(tmp_path / 'cache'))
+    assert (added, rejected) == (30, [])
+    got = leaderboard.standings(season)
+
+    index = {name: i for i, name in enumerate(season.players)}
+    order = [index[name] for name in data.players]
+    for key in ('games', 'hanchan', 'total', 'chips'):
+        assert got[key][order].tolist() == expected[key].tolist(), key
+    assert np.allclose(got['average_rank'][order], expected['average_rank'])
+
+
+def test_season_cache_only_decodes_new_codes(tmp_path):
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    games = list(synthetic.synthetic_games(6, hanchan=3, seed=2))
+    synthetic.write_share_codes(str(archive / 'a.txt'), games[:4])
+    cache = str(tmp_path / 'cache')
+    assert leaderboard.update_season(str(archive), cache)[1] == 4
+    synthetic.write_share_codes(str(archive / 'b.txt'), games[3:])
+    season, added, _ = leaderboard.update_season(str(archive), cache)
+    assert (added, season.n_games) == (2, 6)
+
+
+# ──────────────────────────────────────────────
+# Images
+# ──────────────────────────────────────────────
+
+def _noise(size, mode, seed):
+    rng = np.random.default_rng(seed)
+    shape = (size[1], size[0]) + ((len(mode),) if len(mode) > 1 else ())
+    return Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8), mode)
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA'])
+def test_png_stream_writes_bands_pillow_reads_back(mode):
+    img = _noise((37, 50), mode, 1)
+    buf = io.BytesIO()
+    png = PngStream(buf, img.width, mode, idat_size=256)
+    for y in range(0, img.height, 16):
+        png.write(img.crop((0, y, img.width, min(img.height, y + 16))))
+    png.close()
+    buf.seek(0)
+    out = Image.open(buf)
+    assert out.size == img.size
+    assert np.array_equal(np.asarray(out.convert(mode)), np.asarray(img))
+
+
+def test_png_stream_checks_declared_height():
+    png = PngStream(io.BytesIO(), 4, height=3)
+    png.write(Image.new('RGB', (4, 2)))
+    with pytest.raises(ValueError):
+        png.close()
+
+
+@pytest.mark.parametrize('base_alpha', [255, 128])
+def test_layer_stack_flatten_matches_alpha_composite(base_alpha):
+    base = Image.new('RGBA', (80, 90), (40, 90, 160, base_alpha))
+    sprite = _noise((30, 40), 'RGBA', 3)
+    mask = _noise((25, 25), 'L', 4)
+
+    stack = LayerStack()
+    stack.add(sprite, (10, 5))
+    stack.add_fill((30, 40, 55, 65), (255, 0, 0, 200), mask)
+    stack.add(sprite, (70, 80))  # partly outside the base
+    got = stack.flatten(base.copy())
+
+    expected = base.copy()
+    expected.alpha_composite(sprite, (10, 5))
+    fill = Image.new('RGBA', mask.size, (255, 0, 0, 0))
+    fill.putalpha(mask.point(lambda a: a * 200 // 255))
+    expected.alpha_composite(fill, (30, 40))
+    expected.alpha_composite(sprite.crop((0, 0, 10, 10)), (70, 80))
+    diff = np.abs(np.asarray(got, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+    assert len(stack) == 0
+    assert diff[..., 3].max() <= 1
+    # Colour under nearly transparent pixels is not well defined after unpremultiplying
+    assert diff[..., :3][np.asarray(expected)[..., 3] >= 16].max() <= 2
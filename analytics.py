@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Columnar statistics over Mahjong Score Table database backups.
+
+Loads the games, game_players, scores and chips tables (see database.ts) of
+one or many SQLite backups into numpy columns with one query per table per
+file, and aggregates them per player:
+
+  - hanchan played and total / average points
+  - rank distribution, recomputed from points with the tie rule of calcRanks
+    in utils.ts (equal points share the better rank, the next rank skips)
+  - chip balance
+
+Each backup's columns are cached on disk and reloaded while the file's
+modification time and size are unchanged, so re-running over hundreds of
+backups only reads the ones that changed.
+
+Requires numpy.
+"""
+
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'mahjong-score-table', 'analytics')
+MAX_RANK = 4
+
+# table -> (query, integer columns); player_name is always the last column
+QUERIES = {
+    'games': ('SELECT id, player_count, created_at, finished FROM games',
+              ('id', 'player_count', 'created_at', 'finished')),
+    'game_players': ('SELECT game_id, sort_order, player_name FROM game_players',
+                     ('game_id', 'sort_order')),
+    'scores': ('SELECT game_id, hanchan, point, rank, player_name FROM scores',
+               ('game_id', 'hanchan', 'point', 'rank')),
+    'chips': ('SELECT game_id, hanchan, chip_point, player_name FROM chips',
+              ('game_id', 'hanchan', 'chip_point')),
+}
+
+
+# ──────────────────────────────────────────────
+# Loading
+# ──────────────────────────────────────────────
+
+def read_backup(path):
+    """Columns of one backup: ``{'<table>.<column>': array, 'names': array}``.
+
+    player_name columns are stored as indices into ``names``.
+    """
+    con = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        names = {}
+        cols = {}
+        for table, (query, int_cols) in QUERIES.items():
+            rows = con.execute(query).fetchall()
+            has_name = 'player_name' in query
+            width = len(int_cols) + has_name
+            by_col = list(zip(*rows)) if rows else [()] * width
+            for name, values in zip(int_cols, by_col):
+                cols[f'{table}.{name}'] = np.array(values, dtype=np.int64)
+            if has_name:
+                cols[f'{table}.player'] = np.array(
+                    [names.setdefault(n, len(names)) for n in by_col[-1]], dtype=np.int32)
+    finally:
+        con.close()
+    cols['names'] = np.array(list(names), dtype=str)
+    return cols
+
+
+class BackupCache:
+    """On-disk cache of read_backup() results, one .npz per backup file.
+
+    An entry is keyed by the backup's absolute path and stores the
+    modification time and size it was read at; a backup that changed since
+    is read again.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, path):
+        key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.directory, key + '.npz')
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return np.array([CACHE_VERSION, st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+    def get(self, path):
+        """Cached columns for `path`, or None if missing or stale."""
+        try:
+            with np.load(self._entry(path)) as data:
+                if not np.array_equal(data['stamp'], self._stamp(path)):
+                    return None
+                return {k: data[k] for k in data.files if k != 'stamp'}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, path, cols, stamp):
+        entry = self._entry(path)
+        tmp = f'{entry}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, stamp=stamp, **cols)
+        os.replace(tmp, entry)
+
+
+def _read_and_stamp(path):
+    # Stamp before reading so a write racing the read leaves the entry stale
+    stamp = BackupCache._stamp(path)
+    return read_backup(path), stamp
+
+
+def load_backups(paths, cache=None, jobs=1):
+    """Read every backup in `paths` (through `cache` if given).
+
+    Returns one list of per-file column dicts, in `paths` order. Backups not
+    in the cache are read on `jobs` worker processes.
+    """
+    paths = list(paths)
+    loaded = [cache.get(p) if cache else None for p in paths]
+    missing = [i for i, cols in enumerate(loaded) if cols is None]
+    if jobs > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_read_and_stamp, [paths[i] for i in missing]))
+    else:
+        results = [_read_and_stamp(paths[i]) for i in missing]
+    for i, (cols, stamp) in zip(missing, results):
+        if cache:
+            cache.put(paths[i], cols, stamp)
+        loaded[i] = cols
+    return loaded
+
+
+class Dataset:
+    """Every loaded backup concatenated into one set of columns.
+
+    Games are renumbered globally (a game is a (backup, id) pair) and players
+    are identified by name across backups, indexing ``players``.
+    """
+
+    def __init__(self, per_file):
+        players = {}
+        parts = {}
+        game_offset = 0
+        for cols in per_file:
+            remap = np.array([players.setdefault(n, len(players)) for n in cols['names'].tolist()],
+                             dtype=np.int32)
+            ids = cols['games.id']
+            # Global game index = offset + position of the id in this backup's
+            # games table; rows of games that no longer exist map to -1
+            top = max([0] + [int(v.max()) for k, v in cols.items() if k.endswith('id') and len(v)])
+            lookup = np.full(top + 1, -1, dtype=np.int64)
+            lookup[ids] = np.arange(len(ids)) + game_offset
+            keep = {}
+            for key, values in cols.items():
+                if key == 'names':
+                    continue
+                table, column = key.split('.')
+                if column == 'player':
+                    values = remap[values]
+                elif column == 'game_id':
+                    values = lookup[values]
+                    keep[table] = values >= 0
+                parts.setdefault(key, []).append(values)
+            for key in parts:
+                table = key.split('.')[0]
+                if table in keep:
+                    parts[key][-1] = parts[key][-1][keep[table]]
+            game_offset += len(ids)
+        self.players = list(players)
+        self.n_games = game_offset
+        self.columns = {k: np.concatenate(v) for k, v in parts.items()}
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+
+# ──────────────────────────────────────────────
+# Aggregation
+# ──────────────────────────────────────────────
+
+def competition_ranks(group, point):
+    """Rank of each row within its group, as calcRanks ranks a hanchan.
+
+    Higher points rank first; equal points share a rank and the next rank
+    skips (points 30, 10, 10, -50 rank 1, 2, 2, 4).
+    """
+    n = len(point)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((-point, group))
+    g = group[order]
+    p = point[order]
+    idx = np.arange(n)
+    new_group = np.r_[True, g[1:] != g[:-1]]
+    new_value = new_group | np.r_[True, p[1:] != p[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_group, idx, 0))
+    value_start = np.maximum.accumulate(np.where(new_value, idx, 0))
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = value_start - group_start + 1
+    return ranks
+
+
+def player_stats(data):
+    """Per-player aggregates of a Dataset, as a dict of arrays indexed like ``data.players``."""
+    n = len(data.players)
+    player = data['scores.player']
+    point = data['scores.point']
+    game = data['scores.game_id']
+    hanchan = data['scores.hanchan']
+
+    group = game * (int(hanchan.max()) + 1 if len(hanchan) else 1) + hanchan
+    ranks = competition_ranks(group, point)
+    rank_counts = np.zeros((n, MAX_RANK), dtype=np.int64)
+    np.add.at(rank_counts, (player, np.minimum(ranks, MAX_RANK) - 1), 1)
+
+    hanchan_count = np.bincount(player, minlength=n)
+    total = np.bincount(player, weights=point, minlength=n).astype(np.int64)
+    rank_sum = np.bincount(player, weights=ranks, minlength=n)
+    chips = np.bincount(data['chips.player'], weights=data['chips.chip_point'], minlength=n).astype(np.int64)
+
+    # Distinct games per player, from the roster
+    roster = np.unique(data['game_players.game_id'] * n + data['game_players.player'])
+    games = np.bincount((roster % n).astype(np.int64), minlength=n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average = np.where(hanchan_count > 0, total / hanchan_count, 0.0)
+        average_rank = np.where(hanchan_count > 0, rank_sum / hanchan_count, 0.0)
+    return {
+        'games': games,
+        'hanchan': hanchan_count,
+        'total': total,
+        'average': average,
+        'average_rank': average_rank,
+        'rank_counts': rank_counts,
+        'chips': chips,
+    }
+
+
+def find_backups(paths):
+    """Expand directories in `paths` to the .db / .sqlite files inside them."""
+    out = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                out.extend(os.path.join(root, f) for f in sorted(files)
+                           if f.endswith(('.db', '.sqlite', '.sqlite3')))
+        else:
+            out.append(path)
+    return out
+
+
+def format_table(players, stats):
+    lines = [f"{'player':<16}{'games':>6}{'hanchan':>8}{'total':>9}{'avg':>8}{'avg rank':>9}"
+             f"{'1st':>6}{'2nd':>6}{'3rd':>6}{'4th':>6}{'chips':>7}"]
+    for i in np.argsort(-stats['total'], kind='stable'):
+        r = stats['rank_counts'][i]
+        lines.append(f"{players[i]:<16}{stats['games'][i]:>6}{stats['hanchan'][i]:>8}"
+                     f"{stats['total'][i]:>+9}{stats['average'][i]:>+8.1f}{stats['average_rank'][i]:>9.2f}"
+                     f"{r[0]:>6}{r[1]:>6}{r[2]:>6}{r[3]:>6}{stats['chips'][i]:>+7}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('backups', nargs='+', help='backup .db files or directories containing them')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR,
+                        help=f'column cache directory (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='read every backup from SQLite')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='read uncached backups on this many worker processes')
+    cli = parser.parse_args()
+
+    t0 = time.time()
+    paths = find_backups(cli.backups)
+    cache = None if cli.no_cache else BackupCache(cli.cache)
+    data = Dataset(load_backups(paths, cache, cli.jobs))
+    stats = player_stats(data)
+    print(format_table(data.players, stats))
+    print(f"\n{len(paths)} backups, {data.n_games} games, {len(data['scores.point'])} score rows "
+          f"in {time.time() - t0:.2f}s")
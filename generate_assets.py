@@ -5,11 +5,35 @@ Generates:
   - icon.png, adaptive-icon.png, splash.png, favicon.png (app assets)
   - iphone/promo_1_setup.png ... promo_6_share.png (6 iPhone promotional screenshots)
   - ipad/promo_1_setup.png ... promo_6_share.png (6 iPad promotional screenshots)
+
+Requires Pillow and numpy; --subset-fonts also needs fontTools.
 """
 
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageFilter
+import numpy as np
+import atexit
+import contextlib
+import fcntl
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import json
 import math
+import mmap
 import os
+import queue
+import sqlite3
+import struct
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+
+from analytics import competition_ranks
 
 # ──────────────────────────────────────────────
 # Colors matching the React Native app exactly
@@ -42,6 +66,7 @@ GOLD = (255, 215, 0)          # #FFD700
 SILVER = (192, 192, 192)      # #C0C0C0
 BRONZE = (205, 127, 50)       # #CD7F32
 RANK_GRAY = (149, 165, 166)   # #95a5a6
+RANK_COLORS = {1: GOLD, 2: SILVER, 3: BRONZE, 4: RANK_GRAY}
 TEAL = (23, 162, 184)         # #17a2b8
 CODE_BG = (245, 245, 245)     # #f5f5f5
 
@@ -57,26 +82,66 @@ FONT_JP = "/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf"
 FONT_MONO = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
 
 
-def font(size, bold=False, jp=False, mono=False):
+_font_cache = {}
+_font_specs = {}
+_font_files = {}
+
+
+def font_path(bold=False, jp=False, mono=False):
+    """System font file for font()'s flags."""
     if mono:
-        return ImageFont.truetype(FONT_MONO, size)
+        return FONT_MONO
     if jp:
-        return ImageFont.truetype(FONT_JP, size)
+        return FONT_JP
     if bold:
-        return ImageFont.truetype(FONT_BOLD, size)
-    return ImageFont.truetype(FONT_REGULAR, size)
+        return FONT_BOLD
+    return FONT_REGULAR
+
+
+def use_font_files(files):
+    """Load fonts from `files` (system font path -> replacement file) from now on."""
+    _font_files.clear()
+    _font_files.update(files)
+    _font_cache.clear()
+    clear_layout_cache()
+
+
+def font(size, bold=False, jp=False, mono=False):
+    path = font_path(bold, jp, mono)
+    path = _font_files.get(path, path)
+    key = (path, size)
+    f = _font_cache.get(key)
+    if f is None:
+        f = ImageFont.truetype(path, size)
+        _font_cache[key] = f
+        _font_specs[id(f)] = (size, bold, jp, mono)
+    return f
+
+
+def font_spec(f):
+    """Return the (size, bold, jp, mono) arguments a font() object was created with."""
+    try:
+        return _font_specs[id(f)]
+    except KeyError:
+        raise ValueError("font was not created with font()") from None
+
+
+def gradient_strip(color1, color2, height, y0=0, y1=None):
+    """Rows y0..y1 of a vertical gradient over `height`, as a 1px-wide RGBA image."""
+    if y1 is None:
+        y1 = height
+    data = bytearray()
+    for y in range(y0, y1):
+        ratio = y / height
+        data += bytes((int(color1[0] + (color2[0] - color1[0]) * ratio),
+                       int(color1[1] + (color2[1] - color1[1]) * ratio),
+                       int(color1[2] + (color2[2] - color1[2]) * ratio), 255))
+    return Image.frombytes('RGBA', (1, y1 - y0), bytes(data))
 
 
 def draw_gradient_bg(img, color1, color2):
     """Vertical linear gradient."""
-    draw = ImageDraw.Draw(img)
-    w, h = img.size
-    for y in range(h):
-        ratio = y / h
-        r = int(color1[0] + (color2[0] - color1[0]) * ratio)
-        g = int(color1[1] + (color2[1] - color1[1]) * ratio)
-        b = int(color1[2] + (color2[2] - color1[2]) * ratio)
-        draw.line([(0, y), (w, y)], fill=(r, g, b))
+    img.paste(gradient_image(img.size, color1, color2).convert(img.mode), (0, 0))
 
 
 def text_size(draw, text, f):
@@ -89,10 +154,504 @@ def draw_centered_text(draw, text, cx, y, f, fill):
     draw.text((cx - tw // 2, y), text, fill=fill, font=f)
 
 
+# ──────────────────────────────────────────────
+# Auto-fit text (largest font size that fits a box)
+# ──────────────────────────────────────────────
+
+_extent_cache = {}
+_fit_cache = {}
+
+
+def _extent(f, text):
+    """(width, height) of `text`'s ink in font `f`, as text_size() measures it."""
+    key = (f.path, f.size, text)
+    size = _extent_cache.get(key)
+    if size is None:
+        x0, y0, x1, y1 = f.getbbox(text)
+        size = _extent_cache[key] = (x1 - x0, y1 - y0)
+    return size
+
+
+def wrap_text(f, text, width):
+    """Break `text` into lines no wider than `width` in font `f`.
+
+    Text with spaces breaks between words, other text (Japanese) between
+    characters; a single word wider than `width` gets a line of its own.
+    """
+    sep = ' ' if ' ' in text else ''
+    words = text.split(' ') if sep else list(text)
+    lines = []
+    line = ''
+    for word in words:
+        candidate = line + sep + word if line else word
+        if line and _extent(f, candidate)[0] > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line]
+
+
+def _fits(f, text, box_w, box_h, wrap, line_spacing):
+    if not wrap:
+        w, h = _extent(f, text)
+        return w <= box_w and h <= box_h, [text]
+    lines = wrap_text(f, text, box_w)
+    extents = [_extent(f, line) for line in lines]
+    height = int(f.size * line_spacing) * (len(lines) - 1) + max(h for _, h in extents)
+    return max(w for w, _ in extents) <= box_w and height <= box_h, lines
+
+
+def fit_text(text, box_w, box_h, max_size, bold=False, jp=False, mono=False,
+             min_size=6, wrap=False, line_spacing=1.3):
+    """Largest font() of at most `max_size` at which `text` fits in box_w x box_h.
+
+    Returns (font, lines): with ``wrap=True`` the text may break over
+    several lines (see wrap_text()) spaced ``size * line_spacing`` apart,
+    otherwise `lines` is just ``[text]``. Text that does not fit even at
+    `min_size` comes back at `min_size`. Sizes are binary searched over
+    memoized glyph extents and the answer is memoized per (text, box, face),
+    so repeated layouts cost a dict lookup.
+    """
+    path = font_path(bold, jp, mono)
+    key = (text, box_w, box_h, max_size, min_size, _font_files.get(path, path), wrap, line_spacing)
+    hit = _fit_cache.get(key)
+    if hit is None:
+        lo, hi = min_size, max_size
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            ok, lines = _fits(font(mid, bold, jp, mono), text, box_w, box_h, wrap, line_spacing)
+            if ok:
+                best = (mid, lines)
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        if best is None:
+            best = (min_size, _fits(font(min_size, bold, jp, mono), text, box_w, box_h, wrap, line_spacing)[1])
+        hit = _fit_cache[key] = best
+    size, lines = hit
+    return font(size, bold, jp, mono), lines
+
+
+# ──────────────────────────────────────────────
+# Glyph atlas (rasterize each glyph once, blit strings)
+# ──────────────────────────────────────────────
+
+class GlyphAtlas:
+    """Coverage masks of every glyph drawn so far, packed into shared pages.
+
+    A glyph is keyed by (font file, size, character, 1/64 pixel pen phase)
+    and rasterized once, by Pillow itself, so blitting it reproduces
+    draw.text. Pages are filled shelf by shelf, left to right.
+    """
+
+    PAGE = 1024
+
+    def __init__(self):
+        self.pages = []
+        self._glyphs = {}
+        self._layouts = {}
+        self._shelf = (0, 0, 0)   # x, y, height of the open shelf on the last page
+        self.hits = 0
+        self.misses = 0
+
+    def _alloc(self, w, h):
+        x, y, shelf_h = self._shelf
+        if not self.pages or x + w > self.PAGE:
+            x, y, shelf_h = 0, y + shelf_h, 0
+        if not self.pages or y + h > self.PAGE:
+            self.pages.append(Image.new('L', (self.PAGE, self.PAGE), 0))
+            x, y, shelf_h = 0, 0, 0
+        self._shelf = (x + w, y, max(shelf_h, h))
+        return len(self.pages) - 1, (x, y, x + w, y + h)
+
+    def glyph(self, f, ch, phase):
+        """``(page, box, offset)`` of `ch` drawn at pen x `phase`/64, or None if blank."""
+        key = (f.path, f.size, ch, phase)
+        try:
+            entry = self._glyphs[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            return entry
+        left, top, right, bottom = f.getbbox(ch)
+        canvas = Image.new('L', (right - left + 3, bottom - top + 2), 0)
+        ImageDraw.Draw(canvas).text((1 - left + phase / 64, -top), ch, fill=255, font=f)
+        bbox = canvas.getbbox()
+        entry = None
+        if bbox is not None:
+            page, box = self._alloc(bbox[2] - bbox[0], bbox[3] - bbox[1])
+            self.pages[page].paste(canvas.crop(bbox), box[:2])
+            entry = (page, box, (bbox[0] + left - 1, bbox[1] + top))
+        self._glyphs[key] = entry
+        return entry
+
+    def layout(self, f, text):
+        """Pen x (in 1/64 px) of each character, kerned as Pillow's basic layout places them."""
+        key = (f.path, f.size, text)
+        pens = self._layouts.get(key)
+        if pens is None:
+            pens = self._layouts[key] = [
+                round((f.getlength(text[:i + 1]) - f.getlength(ch)) * 64) for i, ch in enumerate(text)]
+        return pens
+
+    def mask(self, f, text, phase=0):
+        """``(mask, offset)`` of `text` as one 'L' image, like font.getmask2() at pen x `phase`/64."""
+        placed = []
+        for ch, pen in zip(text, self.layout(f, text)):
+            pen += phase
+            entry = self.glyph(f, ch, pen % 64)
+            if entry is not None:
+                page, box, (ox, oy) = entry
+                placed.append((page, box, pen // 64 + ox, oy))
+        if not placed:
+            return None, (0, 0)
+        x0 = min(p[2] for p in placed)
+        y0 = min(p[3] for p in placed)
+        x1 = max(p[2] + p[1][2] - p[1][0] for p in placed)
+        y1 = max(p[3] + p[1][3] - p[1][1] for p in placed)
+        out = Image.new('L', (x1 - x0, y1 - y0), 0)
+        for page, box, x, y in placed:
+            glyph = self.pages[page].crop(box)
+            dest = (x - x0, y - y0, x - x0 + glyph.width, y - y0 + glyph.height)
+            # Overlapping glyphs keep the stronger coverage, as FreeType rendering does
+            out.paste(ImageChops.lighter(out.crop(dest), glyph), dest[:2])
+        return out, (x0, y0)
+
+    def clear(self):
+        self.__init__()
+
+
+glyph_atlas = GlyphAtlas()
+
+
+def aa_rounded_rectangle(img, xy, radius, fill=None, outline=None, width=1, factor=4):
+    """rounded_rectangle() on `img` with corner arcs anti-aliased at `factor`x.
+
+    The shape is drawn at 1x, which is exact for its straight, pixel-aligned
+    edges. Each corner square is then redone from the pixels that were
+    under it: fill and outline coverage are rasterized at `factor`x over
+    just that square, box-filtered down and composited, so the cost grows
+    with the radius rather than the image.
+    """
+    if len(xy) == 2:
+        xy = (*xy[0], *xy[1])
+    x0, y0, x1, y1 = (int(round(v)) for v in xy)
+    r = min(int(round(radius)), (x1 - x0 + 1) // 2, (y1 - y0 + 1) // 2)
+    draw = ImageDraw.Draw(img)
+    if r < 1 or (fill is None and outline is None):
+        draw.rounded_rectangle((x0, y0, x1, y1), radius=r, fill=fill, outline=outline, width=width)
+        return
+    corners = [(x0, y0), (x1 - r, y0), (x0, y1 - r), (x1 - r, y1 - r)]
+    under = [img.crop((cx, cy, cx + r + 1, cy + r + 1)) for cx, cy in corners]
+    draw.rounded_rectangle((x0, y0, x1, y1), radius=r, fill=fill, outline=outline, width=width)
+
+    w = width if outline is not None else 0
+
+    def coverage(cx, cy, inset, rad):
+        mask = Image.new('L', ((r + 1) * factor, (r + 1) * factor), 0)
+        box = ((x0 - cx + inset) * factor, (y0 - cy + inset) * factor,
+               (x1 + 1 - cx - inset) * factor - 1, (y1 + 1 - cy - inset) * factor - 1)
+        if box[2] >= box[0] and box[3] >= box[1]:
+            ImageDraw.Draw(mask).rounded_rectangle(box, radius=rad * factor, fill=255)
+        return mask.reduce(factor)
+
+    for (cx, cy), region in zip(corners, under):
+        outer = coverage(cx, cy, 0, r)
+        inner = coverage(cx, cy, w, max(0, r - w)) if w else outer
+        rd = ImageDraw.Draw(region)
+        if fill is not None:
+            rd.bitmap((0, 0), inner, fill=fill)
+        if w:
+            rd.bitmap((0, 0), ImageChops.subtract(outer, inner), fill=outline)
+        img.paste(region, (cx, cy))
+
+
+class AtlasDraw(ImageDraw.ImageDraw):
+    """ImageDraw whose single-line text() is composed from glyph_atlas and
+    whose rounded rectangles have anti-aliased corners.
+
+    Anything the atlas does not model (multiline text, anchors, strokes,
+    complex layout, bitmap fonts) goes to ImageDraw.text unchanged.
+    """
+
+    def __init__(self, im, mode=None):
+        super().__init__(im, mode)
+        self.image = im
+
+    def rounded_rectangle(self, xy, radius=0, fill=None, outline=None, width=1, **kwargs):
+        if kwargs or self.mode != self.image.mode:
+            return super().rounded_rectangle(xy, radius, fill, outline, width, **kwargs)
+        aa_rounded_rectangle(self.image, xy, radius, fill, outline, width)
+
+    def text(self, xy, text, fill=None, font=None, anchor=None, *args, **kwargs):
+        if (args or kwargs or anchor not in (None, 'la') or self.fontmode != 'L'
+                or not isinstance(font, ImageFont.FreeTypeFont)
+                or font.layout_engine != ImageFont.Layout.BASIC
+                or not isinstance(text, str) or '\n' in text or '\r' in text):
+            return super().text(xy, text, fill, font, anchor, *args, **kwargs)
+        x, y = int(xy[0]), int(xy[1])
+        mask, (ox, oy) = glyph_atlas.mask(font, text, round(math.modf(xy[0])[0] * 64))
+        if mask is not None:
+            self.bitmap((x + ox, y + oy), mask, fill=fill)
+
+
 def rrect(draw, xy, radius, fill=None, outline=None, width=1):
     draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
 
 
+# ──────────────────────────────────────────────
+# Intermediate cache (shared between worker processes)
+# ──────────────────────────────────────────────
+
+class IntermediateCache:
+    """Raw image intermediates in memory-mapped files shared by worker processes.
+
+    Each entry is ``<sha1(key)>.raw`` (a small header plus raw pixels) and
+    ``index.json`` lists the keys. The first process to ask for a key builds
+    it while the others wait; everyone then maps the same file and gets a
+    read-only Image over it without copying.
+    """
+
+    HEADER = struct.Struct('<4s4sII')
+    MAGIC = b'MSI1'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._attached = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.raw')
+
+    def get(self, key, build, timeout=300):
+        img = self._attached.get(key)
+        if img is not None:
+            return img
+        path = self._path(key)
+        if not os.path.exists(path):
+            # The builder holds a flock, which goes away with it if it dies
+            with open(path + '.lock', 'w') as lock:
+                deadline = time.monotonic() + timeout
+                while True:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"timed out waiting for intermediate {key!r}")
+                        time.sleep(0.01)
+                if not os.path.exists(path):
+                    self._store(key, path, build())
+        img = self._attached[key] = self._attach(path)
+        return img
+
+    def _store(self, key, path, img):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.write(self.HEADER.pack(self.MAGIC, img.mode.ljust(4).encode('ascii'), img.width, img.height))
+            fh.write(img.tobytes())
+        os.replace(tmp, path)
+        with open(os.path.join(self.directory, 'index.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index_path = os.path.join(self.directory, 'index.json')
+            index = {}
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as fh:
+                    index = json.load(fh)
+            index[os.path.basename(path)] = {'key': repr(key), 'mode': img.mode, 'size': list(img.size)}
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as fh:
+                json.dump(index, fh, ensure_ascii=False, indent=1)
+            os.replace(index_path + '.tmp', index_path)
+
+    def _attach(self, path):
+        with open(path, 'rb') as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, mode, w, h = self.HEADER.unpack_from(mm)
+        if magic != self.MAGIC:
+            raise ValueError(f"not an intermediate cache entry: {path}")
+        mode = mode.decode('ascii').strip()
+        return Image.frombuffer(mode, (w, h), memoryview(mm)[self.HEADER.size:], 'raw', mode, 0, 1)
+
+
+_shared_intermediates = None
+_local_intermediates = {}
+
+
+def attach_intermediate_cache(directory):
+    """Share intermediates through `directory` (None: keep them per process)."""
+    global _shared_intermediates
+    _shared_intermediates = IntermediateCache(directory) if directory else None
+
+
+def intermediate(key, build):
+    """Return the image for `key`, calling build() at most once per build.
+
+    The returned image is shared (and read-only when memory-mapped): copy it
+    before drawing on it.
+    """
+    build = _persisted(key, build)
+    if _shared_intermediates is not None:
+        return _shared_intermediates.get(key, build)
+    img = _local_intermediates.get(key)
+    if img is None:
+        img = _local_intermediates[key] = build()
+    return img
+
+
+class RenderCache:
+    """Content-addressed store of encoded renders, shareable between machines.
+
+    Entries live at ``<2 hex>/<sha256 of the render key>`` and are written
+    to a temporary file first and renamed into place, so readers on the
+    same directory (a shared NFS path, a restored CI cache) never see a
+    partial entry. A hit touches the entry's mtime; trim() evicts the
+    least recently used entries until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=512 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def trim(self):
+        """Delete least recently used entries beyond max_bytes; returns the bytes freed."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        return freed
+
+
+_render_cache = None
+_file_digests = {}
+
+
+def attach_render_cache(directory, max_bytes=512 << 20):
+    """Serve renders from and store them in `directory` (None: always render)."""
+    global _render_cache
+    _render_cache = RenderCache(directory, max_bytes) if directory else None
+    return _render_cache
+
+
+def _file_digest(path):
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(key)
+    if digest is None:
+        with open(path, 'rb') as fh:
+            digest = _file_digests[key] = hashlib.sha256(fh.read()).hexdigest()
+    return digest
+
+
+def render_key(generator, params, config=None):
+    """Cache key of one render: everything that can change its pixels.
+
+    That is the generator and its parameters, the device config, the font
+    files font() loads, the Pillow version and this script itself.
+    """
+    import PIL
+
+    fonts = [_file_digest(_font_files.get(p, p))
+             for p in (FONT_BOLD, FONT_REGULAR, FONT_JP, FONT_MONO)]
+    device = sorted(vars(config).items()) if config is not None else None
+    blob = repr((generator, params, device, fonts, PIL.__version__, _file_digest(os.path.abspath(__file__))))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def cached_png(generator, params, render, config=None):
+    """PNG bytes of render(), from the render cache when it has them."""
+    if _render_cache is None:
+        return encode_png(render())
+    key = render_key(generator, params, config)
+    data = _render_cache.get(key)
+    if data is None:
+        data = encode_png(render())
+        _render_cache.put(key, data)
+    return data
+
+
+def save_rendered(output_path, generator, params, render, config=None):
+    """Write render() to `output_path` as PNG, through the render cache."""
+    data = cached_png(generator, params, render, config)
+    with open(output_path, 'wb') as fh:
+        fh.write(data)
+
+
+def _persisted(key, build):
+    """`build` for intermediate `key`, going through the render cache when attached."""
+    if _render_cache is None:
+        return build
+
+    def build_cached():
+        ck = render_key('intermediate', key)
+        data = _render_cache.get(ck)
+        if data is not None:
+            img = Image.open(io.BytesIO(data))
+            img.load()
+            return img
+        img = build()
+        buf = io.BytesIO()
+        img.save(buf, 'PNG', compress_level=1)
+        _render_cache.put(ck, buf.getvalue())
+        return img
+    return build_cached
+
+
+def gradient_image(size, color1, color2):
+    """Shared full-size vertical gradient."""
+    w, h = size
+    return intermediate(('gradient', tuple(size), tuple(color1), tuple(color2)),
+                        lambda: gradient_strip(color1, color2, h).resize((w, h), Image.NEAREST))
+
+
 # ──────────────────────────────────────────────
 # Icon / Splash / Favicon (keep existing design)
 # ──────────────────────────────────────────────
@@ -111,9 +670,18 @@ def draw_shadow(img, xy, radius, shadow_offset=6, shadow_blur=12):
 
 
 def draw_mahjong_tile(img, cx, cy, tile_w, tile_h, rotation=15):
+    tile_img = intermediate(('tile', tile_w, tile_h, rotation, FONT_JP),
+                            lambda: _render_mahjong_tile(tile_w, tile_h, rotation))
+    paste_x = cx - tile_img.width // 2
+    paste_y = cy - tile_img.height // 2
+    img.paste(tile_img, (paste_x, paste_y), tile_img)
+    return img
+
+
+def _render_mahjong_tile(tile_w, tile_h, rotation):
     pad = int(max(tile_w, tile_h) * 0.8)
     tile_img = Image.new('RGBA', (tile_w + pad * 2, tile_h + pad * 2), (0, 0, 0, 0))
-    td = ImageDraw.Draw(tile_img)
+    td = AtlasDraw(tile_img)
     tx, ty = pad, pad
     td.rounded_rectangle(
         (tx + 4, ty + 4, tx + tile_w + 4, ty + tile_h + 4),
@@ -139,29 +707,34 @@ def draw_mahjong_tile(img, cx, cy, tile_w, tile_h, rotation=15):
     td.text((char_x, char_y), char, fill=(190, 30, 30), font=chung_font)
     if rotation != 0:
         tile_img = tile_img.rotate(-rotation, resample=Image.BICUBIC, expand=False)
-    paste_x = cx - tile_img.width // 2
-    paste_y = cy - tile_img.height // 2
-    img.paste(tile_img, (paste_x, paste_y), tile_img)
-    return img
+    return tile_img
 
 
 def draw_score_sheet(img, sheet_x, sheet_y, sheet_w, sheet_h, num_rows=8, num_cols=8, score_font_size=None):
-    draw = ImageDraw.Draw(img)
-    shadow_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))
-    sd = ImageDraw.Draw(shadow_layer)
-    sd.rounded_rectangle(
-        (sheet_x + 8, sheet_y + 8, sheet_x + sheet_w + 8, sheet_y + sheet_h + 8),
-        radius=12, fill=(0, 0, 0, 50)
-    )
-    shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(15))
-    img = Image.alpha_composite(img, shadow_layer)
-    draw = ImageDraw.Draw(img)
+    if score_font_size is None:
+        score_font_size = int(sheet_h * 0.085)
+    shapes = [((0, 0, sheet_w, sheet_h), 12)]
+    x0, y0, x1, y1 = shadow_extent(shapes, (8, 8), 15)
+
+    def build():
+        # Sheet and its shadow on a transparent sprite, composited as one layer
+        sprite = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        draw_rrect_shadows(sprite, [((-x0, -y0, sheet_w - x0, sheet_h - y0), 12)], (8, 8), 15, (0, 0, 0, 50))
+        _draw_score_sheet_body(sprite, -x0, -y0, sheet_w, sheet_h, num_rows, num_cols, score_font_size)
+        return sprite
+
+    sprite = intermediate(('score_sheet', sheet_w, sheet_h, num_rows, num_cols, score_font_size,
+                           FONT_BOLD, FONT_REGULAR), build)
+    composite_region(img, sprite, sheet_x + x0, sheet_y + y0)
+    return img
+
+
+def _draw_score_sheet_body(img, sheet_x, sheet_y, sheet_w, sheet_h, num_rows, num_cols, score_font_size):
+    draw = AtlasDraw(img)
     draw.rounded_rectangle(
         (sheet_x, sheet_y, sheet_x + sheet_w, sheet_y + sheet_h),
         radius=10, fill=WHITE, outline=(180, 190, 210), width=2
     )
-    if score_font_size is None:
-        score_font_size = int(sheet_h * 0.085)
     score_f = font(score_font_size, bold=True)
     score_text = "SCORE"
     bbox = draw.textbbox((0, 0), score_text, font=score_f)
@@ -210,15 +783,19 @@ def draw_score_sheet(img, sheet_x, sheet_y, sheet_w, sheet_h, num_rows=8, num_co
         nx = grid_left + (num_col_w - nw) // 2
         ny = data_top + i * row_h + (row_h - nh) // 2
         draw.text((nx, ny), num, fill=GRID_BLUE, font=num_f)
-    return img
 
 
 def generate_icon(output_path, size=1024):
+    save_rendered(output_path, 'icon', (size,), lambda: render_icon(size))
+    print(f"Generated: {output_path} ({size}x{size})")
+
+
+def render_icon(size=1024):
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     bg = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw_gradient_bg(bg, BG_DARK, BG_MED)
     mask = Image.new('L', (size, size), 0)
-    md = ImageDraw.Draw(mask)
+    md = AtlasDraw(mask)
     md.rounded_rectangle((0, 0, size - 1, size - 1), radius=int(size * 0.18), fill=255)
     img.paste(bg, (0, 0), mask)
     margin = int(size * 0.10)
@@ -231,11 +808,15 @@ def generate_icon(output_path, size=1024):
     tile_h = int(size * 0.43)
     img = draw_mahjong_tile(img, sheet_x + sheet_w - int(size * 0.06),
                             sheet_y + sheet_h - int(size * 0.06), tile_w, tile_h, rotation=15)
-    img.save(output_path, 'PNG')
-    print(f"Generated: {output_path} ({size}x{size})")
+    return img
 
 
 def generate_adaptive_icon(output_path, size=1024):
+    save_rendered(output_path, 'adaptive_icon', (size,), lambda: render_adaptive_icon(size))
+    print(f"Generated: {output_path} ({size}x{size})")
+
+
+def render_adaptive_icon(size=1024):
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     sheet_w = int(size * 0.56)
     sheet_h = int(size * 0.52)
@@ -247,11 +828,15 @@ def generate_adaptive_icon(output_path, size=1024):
     tile_h = int(size * 0.33)
     img = draw_mahjong_tile(img, sheet_x + sheet_w - int(size * 0.04),
                             sheet_y + sheet_h - int(size * 0.04), tile_w, tile_h, rotation=15)
-    img.save(output_path, 'PNG')
-    print(f"Generated: {output_path} ({size}x{size})")
+    return img
 
 
 def generate_splash(output_path, width=1284, height=2778):
+    save_rendered(output_path, 'splash', (width, height), lambda: render_splash(width, height))
+    print(f"Generated: {output_path} ({width}x{height})")
+
+
+def render_splash(width=1284, height=2778):
     img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
     draw_gradient_bg(img, BG_DARK, (35, 70, 130))
     draw = ImageDraw.Draw(img)
@@ -273,11 +858,15 @@ def generate_splash(output_path, width=1284, height=2778):
     text_y2 = text_y + int(width * 0.12)
     jp_small = font(int(width * 0.055), jp=True)
     draw_centered_text(draw, "スコアシートモバイル", width // 2, text_y2, jp_small, (200, 210, 230))
-    img.save(output_path, 'PNG')
-    print(f"Generated: {output_path} ({width}x{height})")
+    return img
 
 
 def generate_favicon(output_path, size=48):
+    save_rendered(output_path, 'favicon', (size,), lambda: render_favicon(size))
+    print(f"Generated: {output_path} ({size}x{size})")
+
+
+def render_favicon(size=48):
     render_size = size * 8
     img = Image.new('RGBA', (render_size, render_size), (0, 0, 0, 0))
     bg = Image.new('RGBA', (render_size, render_size), (0, 0, 0, 0))
@@ -297,9 +886,7 @@ def generate_favicon(output_path, size=48):
     tile_h = int(render_size * 0.43)
     img = draw_mahjong_tile(img, sheet_x + sheet_w - int(render_size * 0.06),
                             sheet_y + sheet_h - int(render_size * 0.06), tile_w, tile_h, rotation=15)
-    img = img.resize((size, size), Image.LANCZOS)
-    img.save(output_path, 'PNG')
-    print(f"Generated: {output_path} ({size}x{size})")
+    return img.resize((size, size), Image.LANCZOS)
 
 
 # ══════════════════════════════════════════════
@@ -325,16 +912,399 @@ IPHONE = DeviceConfig(1080, 2340, 1242, 2688, 375, False)
 IPAD = DeviceConfig(1536, 2048, 2048, 2732, 590, True)
 
 
+# ──────────────────────────────────────────────
+# Charts
+# ──────────────────────────────────────────────
+
+def decimate_series(values, width):
+    """Indices into `values` that draw the same polyline at `width` columns.
+
+    Samples are bucketed into pixel columns and each column keeps its first,
+    minimum, maximum and last sample in order (M4 aggregation), so the line
+    covers exactly the pixels the full series would while the vertex count
+    stays at most 4 * width however long the series is.
+    """
+    n = len(values)
+    if n <= 4 * width:
+        return np.arange(n)
+    values = np.asarray(values)
+    idx = np.arange(n)
+    starts = np.flatnonzero(np.r_[True, np.diff(idx * width // n) != 0])
+    ends = np.r_[starts[1:], n] - 1
+    col = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    lo = np.minimum.reduceat(values, starts)
+    hi = np.maximum.reduceat(values, starts)
+    # First index of each column's minimum and maximum
+    imin = np.minimum.reduceat(np.where(values == lo[col], idx, n), starts)
+    imax = np.minimum.reduceat(np.where(values == hi[col], idx, n), starts)
+    picks = np.stack([starts, np.minimum(imin, imax), np.maximum(imin, imax), ends], axis=1).ravel()
+    return picks[np.r_[True, picks[1:] != picks[:-1]]]
+
+
+# ──────────────────────────────────────────────
+# Display lists (record once, replay at any scale)
+# ──────────────────────────────────────────────
+
+def _boxes_touch(a, b):
+    return a[0] <= b[2] + 1 and b[0] <= a[2] + 1 and a[1] <= b[3] + 1 and b[1] <= a[3] + 1
+
+
+def _tuplify(obj):
+    if isinstance(obj, list):
+        return tuple(_tuplify(o) for o in obj)
+    return obj
+
+
+def composite_region(img, layer, x, y):
+    """Alpha-composite `layer` onto `img` at (x, y) in place, clipped to the canvas."""
+    sx0, sy0 = max(0, -x), max(0, -y)
+    sx1 = min(layer.width, img.width - x)
+    sy1 = min(layer.height, img.height - y)
+    if sx1 <= sx0 or sy1 <= sy0:
+        return
+    img.alpha_composite(layer, (x + sx0, y + sy0), (sx0, sy0, sx1, sy1))
+
+
+def shadow_extent(shapes, offset, blur):
+    """Bounding box of the pixels touched by a blurred rounded-rect shadow."""
+    m = int(blur * 3) + 1
+    return (min(b[0] for b, _ in shapes) + offset[0] - m,
+            min(b[1] for b, _ in shapes) + offset[1] - m,
+            max(b[2] for b, _ in shapes) + offset[0] + m,
+            max(b[3] for b, _ in shapes) + offset[1] + m)
+
+
+def rrect_shadow_mask(shapes, offset, blur, alpha):
+    """Blurred alpha mask for rounded-rect shadows; returns (mask, x0, y0).
+
+    `shapes` is a list of ((x1, y1, x2, y2), radius); all shapes share one
+    mask and a single blur pass over only the region they cover.
+    """
+    x0, y0, x1, y1 = shadow_extent(shapes, offset, blur)
+    # Shapes relative to the extent: equal-sized shadows share one sprite.
+    rel = tuple(((bx1 + offset[0] - x0, by1 + offset[1] - y0, bx2 + offset[0] - x0, by2 + offset[1] - y0), radius)
+                for (bx1, by1, bx2, by2), radius in shapes)
+
+    def build():
+        mask = Image.new('L', (x1 - x0, y1 - y0), 0)
+        md = ImageDraw.Draw(mask)
+        for box, radius in rel:
+            md.rounded_rectangle(box, radius=radius, fill=alpha)
+        return mask.filter(ImageFilter.GaussianBlur(blur))
+
+    return intermediate(('shadow', rel, blur, alpha), build), x0, y0
+
+
+def draw_rrect_shadows(img, shapes, offset, blur, fill):
+    """Draw blurred rounded-rect shadows onto `img` in place."""
+    mask, x0, y0 = rrect_shadow_mask(shapes, offset, blur, fill[3])
+    layer = Image.new('RGBA', mask.size, fill[:3] + (0,))
+    layer.putalpha(mask)
+    composite_region(img, layer, x0, y0)
+
+
+class LayerStack:
+    """Layers with bounding boxes, flattened onto a base image in one pass.
+
+    flatten() converts only the union of the layers' boxes to premultiplied
+    alpha once, composites every layer into that single buffer and writes it
+    back, instead of allocating a full-size image per alpha_composite.
+    """
+
+    BAND = 64
+
+    def __init__(self):
+        self.layers = []
+
+    def __len__(self):
+        return len(self.layers)
+
+    def add(self, image, xy=(0, 0)):
+        """Add an RGBA image with its top-left at `xy`."""
+        self.layers.append((xy[0], xy[1], image, None))
+
+    def add_fill(self, box, fill, mask=None):
+        """Add a solid colour over `box`; an optional L `mask` scales its alpha."""
+        x0, y0, x1, y1 = box
+        if mask is None:
+            mask = Image.new('L', (x1 - x0, y1 - y0), 255)
+        self.layers.append((x0, y0, mask, tuple(fill)))
+
+    def add_shadow(self, shapes, offset, blur, fill):
+        mask, x0, y0 = rrect_shadow_mask(shapes, offset, blur, 255)
+        self.add_fill((x0, y0, x0 + mask.width, y0 + mask.height), fill, mask)
+
+    def flatten(self, base):
+        """Composite all layers onto `base` (RGBA) in place and return it."""
+        w, h = base.size
+        clipped = []
+        for x, y, src, fill in self.layers:
+            alpha = src if fill is not None else src.getchannel('A')
+            touched = alpha.getbbox()
+            if touched is None:
+                continue
+            box = (max(0, x + touched[0]), max(0, y + touched[1]),
+                   min(w, x + touched[2]), min(h, y + touched[3]))
+            if box[2] > box[0] and box[3] > box[1]:
+                clipped.append((box, x, y, src, fill))
+        self.layers = []
+        if not clipped:
+            return base
+        ux0 = min(c[0][0] for c in clipped)
+        uy0 = min(c[0][1] for c in clipped)
+        ux1 = max(c[0][2] for c in clipped)
+        uy1 = max(c[0][3] for c in clipped)
+
+        region = base.crop((ux0, uy0, ux1, uy1))
+        # Over an opaque base the result stays opaque: composite colour only
+        # and skip the premultiply/unpremultiply round trip.
+        opaque = region.getchannel('A').getextrema()[0] == 255
+        channels = 3 if opaque else 4
+        out = np.asarray(region.convert('RGB') if opaque else region).copy()
+        arrays = [(box, np.asarray(src.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y))), fill)
+                  for box, x, y, src, fill in clipped]
+
+        # Walk the region in bands of rows so the working set stays in cache;
+        # a band of an image layer that is fully opaque is a plain copy.
+        for by0 in range(uy0, uy1, self.BAND):
+            by1 = min(uy1, by0 + self.BAND)
+            buf = None
+            for (lx0, ly0, lx1, ly1), arr, fill in arrays:
+                y0, y1 = max(by0, ly0), min(by1, ly1)
+                if y1 <= y0:
+                    continue
+                part = arr[y0 - ly0:y1 - ly0]
+                if buf is None:
+                    buf = out[by0 - uy0:by1 - uy0].astype(np.float32)
+                    if not opaque:
+                        buf[..., :3] *= buf[..., 3:] * (1.0 / 255.0)
+                dst = buf[y0 - by0:y1 - by0, lx0 - ux0:lx1 - ux0]
+                if fill is None:
+                    if part[..., 3].min() == 255:
+                        dst[...] = part[..., :channels]
+                        continue
+                    a = part[..., 3:] * np.float32(1.0 / 255.0)
+                    layer = part[..., :channels] * a
+                    if not opaque:
+                        layer[..., 3:] = part[..., 3:]
+                else:
+                    a = part[..., None] * np.float32(fill[3] / 65025.0)
+                    layer = a * np.array((fill[:3] + (255,))[:channels], dtype=np.float32)
+                dst *= 1.0 - a
+                dst += layer
+            if buf is None:
+                continue
+            if not opaque:
+                alpha = buf[..., 3:] * (1.0 / 255.0)
+                np.divide(buf[..., :3], alpha, out=buf[..., :3], where=alpha > 0)
+            buf += 0.5
+            out[by0 - uy0:by1 - uy0] = buf.clip(0, 255, out=buf)
+        base.paste(Image.fromarray(out, 'RGBA' if channels == 4 else 'RGB'), (ux0, uy0))
+        return base
+
+
+class DisplayList:
+    """Compact, serializable record of drawing operations on a canvas.
+
+    Every op is a tuple ``(kind, bbox, *args)`` where bbox is the area the op
+    touches in recorded pixels, used for culling on replay.
+    """
+
+    def __init__(self, size, ops=None):
+        self.size = tuple(size)
+        self.ops = list(ops) if ops else []
+
+    def __len__(self):
+        return len(self.ops)
+
+    # ── recording ──
+
+    def gradient(self, color1, color2):
+        self.ops.append(('gradient', (0, 0) + self.size, tuple(color1), tuple(color2)))
+
+    def rect(self, box, fill=None, outline=None, width=1):
+        self.ops.append(('rect', tuple(box), tuple(box), fill, outline, width))
+
+    def rrect(self, box, radius, fill=None, outline=None, width=1):
+        self.ops.append(('rrect', tuple(box), tuple(box), radius, fill, outline, width))
+
+    def line(self, points, fill=None, width=1):
+        points = tuple(tuple(p) for p in points)
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        hw = width // 2 + 1
+        bbox = (min(xs) - hw, min(ys) - hw, max(xs) + hw, max(ys) + hw)
+        self.ops.append(('line', bbox, points, fill, width))
+
+    def text(self, xy, text, spec, fill, bbox):
+        self.ops.append(('text', tuple(bbox), tuple(xy), text, tuple(spec), fill))
+
+    def shadow(self, box, radius, offset, blur, fill):
+        shapes = ((tuple(box), radius),)
+        offset = tuple(offset)
+        self.ops.append(('shadow', shadow_extent(shapes, offset, blur), shapes, offset, blur, tuple(fill)))
+
+    def composite(self, box, fill):
+        """Alpha-composite a filled rectangle (e.g. a modal dimming overlay)."""
+        self.ops.append(('composite', tuple(box), tuple(box), tuple(fill)))
+
+    # ── optimization ──
+
+    def batched(self):
+        """Return a copy with adjacent fills merged and shadows batched.
+
+        Touching same-colour rectangles that form a rectangle become one op.
+        A shadow joins the previous shadow batch with the same blur and colour
+        when nothing drawn in between overlaps it, so the batch is blurred once.
+        """
+        out = []
+        for op in self.ops:
+            prev = out[-1] if out else None
+            if (op[0] == 'rect' and prev is not None and prev[0] == 'rect'
+                    and op[4] is None and prev[4] is None and op[3] == prev[3]):
+                a, b = prev[2], op[2]
+                if ((a[0] == b[0] and a[2] == b[2]) or (a[1] == b[1] and a[3] == b[3])) and _boxes_touch(a, b):
+                    box = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    out[-1] = ('rect', box, box, op[3], None, prev[5])
+                    continue
+            if op[0] == 'shadow':
+                merged = False
+                for i in range(len(out) - 1, -1, -1):
+                    cand = out[i]
+                    if cand[0] == 'shadow' and cand[3:] == op[3:]:
+                        shapes = cand[2] + op[2]
+                        out[i] = ('shadow', shadow_extent(shapes, op[3], op[4]), shapes) + op[3:]
+                        merged = True
+                        break
+                    if _boxes_touch(cand[1], op[1]):
+                        break
+                if merged:
+                    continue
+            out.append(op)
+        return DisplayList(self.size, out)
+
+    # ── replay ──
+
+    def replay(self, scale=1.0, clip=None):
+        """Render the list at `scale`, optionally only the `clip` box of the output.
+
+        Ops whose bounding box falls outside the output canvas are skipped.
+        """
+        full_w = round(self.size[0] * scale)
+        full_h = round(self.size[1] * scale)
+        cx0, cy0, cx1, cy1 = clip if clip is not None else (0, 0, full_w, full_h)
+        img = Image.new('RGBA', (cx1 - cx0, cy1 - cy0), (0, 0, 0, 0))
+        draw = AtlasDraw(img)
+
+        def px(v, origin=0):
+            return round(v * scale) - origin
+
+        def box(b):
+            return (px(b[0], cx0), px(b[1], cy0), px(b[2], cx0), px(b[3], cy0))
+
+        def width(w):
+            return max(1, round(w * scale))
+
+        # Consecutive shadow/composite ops are collected and flattened together.
+        layers = LayerStack()
+        for op in self.ops:
+            kind = op[0]
+            bx = box(op[1])
+            if bx[2] < 0 or bx[3] < 0 or bx[0] >= img.width or bx[1] >= img.height:
+                continue
+            if kind == 'shadow':
+                _, _, shapes, offset, blur, fill = op
+                layers.add_shadow([(box(b), px(r)) for b, r in shapes],
+                                  (px(offset[0]), px(offset[1])), blur * scale, fill)
+                continue
+            if kind == 'composite':
+                layers.add_fill(box(op[2]), op[3])
+                continue
+            if layers:
+                layers.flatten(img)
+            if kind == 'gradient':
+                y0, y1 = max(0, cy0), min(full_h, cy1)
+                if y1 > y0:
+                    strip = gradient_strip(op[2], op[3], full_h, y0, y1)
+                    img.paste(strip.resize((img.width, y1 - y0), Image.NEAREST), (0, y0 - cy0))
+            elif kind == 'rect':
+                _, _, b, fill, outline, w = op
+                draw.rectangle(box(b), fill=fill, outline=outline, width=width(w))
+            elif kind == 'rrect':
+                _, _, b, radius, fill, outline, w = op
+                rrect(draw, box(b), px(radius), fill=fill, outline=outline, width=width(w))
+            elif kind == 'line':
+                _, _, points, fill, w = op
+                draw.line([(px(x, cx0), px(y, cy0)) for x, y in points], fill=fill, width=width(w))
+            elif kind == 'text':
+                _, _, (x, y), text, spec, fill = op
+                size, bold, jp, mono = spec
+                f = font(max(1, round(size * scale)), bold=bold, jp=jp, mono=mono)
+                draw.text((px(x, cx0), px(y, cy0)), text, fill=fill, font=f)
+        if layers:
+            layers.flatten(img)
+        return img
+
+    # ── serialization ──
+
+    def dumps(self):
+        """Serialize to compressed bytes; replaying the result needs no layout code."""
+        payload = {'v': 1, 'size': self.size, 'ops': self.ops}
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def loads(cls, data):
+        payload = json.loads(zlib.decompress(data).decode('utf-8'))
+        if payload.get('v') != 1:
+            raise ValueError(f"unsupported display list version: {payload.get('v')}")
+        return cls(payload['size'], [_tuplify(op) for op in payload['ops']])
+
+
+class RecordingDraw:
+    """Stand-in for ImageDraw.Draw that appends to a DisplayList instead of drawing."""
+
+    def __init__(self, display_list):
+        self.display_list = display_list
+        self._measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+    def textbbox(self, xy, text, font=None, **kwargs):
+        return self._measure.textbbox(xy, text, font=font, **kwargs)
+
+    def text(self, xy, text, fill=None, font=None):
+        bbox = self._measure.textbbox(xy, text, font=font)
+        self.display_list.text(xy, text, font_spec(font), fill, bbox)
+
+    def rectangle(self, xy, fill=None, outline=None, width=1):
+        self.display_list.rect(xy, fill=fill, outline=outline, width=width)
+
+    def rounded_rectangle(self, xy, radius=0, fill=None, outline=None, width=1):
+        self.display_list.rrect(xy, radius, fill=fill, outline=outline, width=width)
+
+    def line(self, xy, fill=None, width=0):
+        self.display_list.line(xy, fill=fill, width=width)
+
+
 class PhoneScreen:
-    """Helper to draw pixel-accurate app screen mockups."""
+    """Helper to draw pixel-accurate app screen mockups.
+
+    With ``record=True`` nothing is rasterized: every draw call is appended to
+    ``display_list``, which get_image() replays.
+    """
 
-    def __init__(self, config=IPHONE):
+    def __init__(self, config=IPHONE, record=False):
+        self.config = config
         self.w = config.screen_w
         self.h = config.screen_h
         self.base_dp = config.base_dp
-        self.img = Image.new('RGBA', (self.w, self.h), (0, 0, 0, 0))
-        draw_gradient_bg(self.img, BG_DARK, BG_MED)
-        self.draw = ImageDraw.Draw(self.img)
+        if record:
+            self.display_list = DisplayList((self.w, self.h))
+            self.display_list.gradient(BG_DARK, BG_MED)
+            self.img = None
+            self.draw = RecordingDraw(self.display_list)
+        else:
+            self.display_list = None
+            self.img = gradient_image((self.w, self.h), BG_DARK, BG_MED).copy()
+            self.draw = AtlasDraw(self.img)
         self.pad = int(self.w * 0.042)  # ~16px at 375dp
         self.y = int(self.h * 0.02)     # start below status area
 
@@ -355,19 +1325,25 @@ class PhoneScreen:
         d.rectangle((bx + bw, by + bh // 4, bx + bw + 2, by + bh * 3 // 4), fill=WHITE)
         self.y = self._s(28)
 
+    def draw_shadow(self, x, y, w, h, radius, offset, blur, fill):
+        """Draw a blurred rounded-rect shadow for the region (x, y, w, h)."""
+        if self.display_list is not None:
+            self.display_list.shadow((x, y, x + w, y + h), radius, offset, blur, fill)
+        else:
+            draw_rrect_shadows(self.img, [((x, y, x + w, y + h), radius)], offset, blur, fill)
+
+    def draw_overlay(self, fill):
+        """Composite a translucent fill over the whole screen."""
+        if self.display_list is not None:
+            self.display_list.composite((0, 0, self.w, self.h), fill)
+        else:
+            self.img.alpha_composite(Image.new('RGBA', self.img.size, fill))
+
     def draw_card_shadow(self, x, y, w, h, radius=None):
         """Draw a card shadow under a card region."""
         if radius is None:
             radius = self._s(12)
-        shadow = Image.new('RGBA', self.img.size, (0, 0, 0, 0))
-        sd = ImageDraw.Draw(shadow)
-        sd.rounded_rectangle(
-            (x + 2, y + 4, x + w + 2, y + h + 4),
-            radius=radius, fill=(0, 0, 0, 40)
-        )
-        shadow = shadow.filter(ImageFilter.GaussianBlur(8))
-        self.img = Image.alpha_composite(self.img, shadow)
-        self.draw = ImageDraw.Draw(self.img)
+        self.draw_shadow(x, y, w, h, radius, (2, 4), 8, (0, 0, 0, 40))
 
     def draw_card(self, x, y, w, h, radius=None):
         """Draw a white card with shadow."""
@@ -395,13 +1371,15 @@ class PhoneScreen:
         if box_w is None:
             box_w = self._s(155)
         # Label
-        lf = font(self._s(12), jp=True)
+        lf, _ = fit_text(label, box_w, self._s(18), self._s(12), jp=True)
         d.text((x, y), label, fill=DARK_TEXT, font=lf)
         y += self._s(18)
 
         btn_h = self._s(26)
         btn_gap = self._s(4)
-        bf = font(self._s(11), bold=True)
+        # "+10" is the widest label; all four buttons share its size
+        bf, _ = fit_text("+10", box_w // 2 - btn_gap // 2 - self._s(4), btn_h, self._s(11), bold=True)
+        btn_text_y = (btn_h - self._s(12) + self._s(11) - bf.size) // 2
 
         # Top row: [+10] [+1]
         top_btns = ["+10", "+1"]
@@ -411,7 +1389,7 @@ class PhoneScreen:
             rrect(d, (bx, y, bx + bw, y + btn_h), self._s(4),
                    fill=DRUMROLL_BTN_BG, outline=DRUMROLL_BTN_BORDER, width=1)
             tw, _ = text_size(d, bl, bf)
-            d.text((bx + (bw - tw) // 2, y + (btn_h - self._s(12)) // 2), bl,
+            d.text((bx + (bw - tw) // 2, y + btn_text_y), bl,
                    fill=DRUMROLL_BTN_TEXT, font=bf)
         y += btn_h + btn_gap
 
@@ -419,11 +1397,11 @@ class PhoneScreen:
         disp_h = self._s(40)
         rrect(d, (x, y, x + box_w, y + disp_h), self._s(6),
                fill=WHITE, outline=DRUMROLL_DISPLAY_BORDER, width=2)
-        vf = font(self._s(18), bold=True)
         val_str = f"+{value}" if value > 0 else str(value)
+        vf, _ = fit_text(val_str, box_w - self._s(8), disp_h, self._s(18), bold=True)
         val_color = GREEN if value > 0 else RED if value < 0 else SECTION_TITLE_COLOR
         tw, _ = text_size(d, val_str, vf)
-        d.text((x + (box_w - tw) // 2, y + (disp_h - self._s(18)) // 2), val_str,
+        d.text((x + (box_w - tw) // 2, y + (disp_h - vf.size) // 2), val_str,
                fill=val_color, font=vf)
         y += disp_h + btn_gap
 
@@ -435,7 +1413,7 @@ class PhoneScreen:
             rrect(d, (bx, y, bx + bw, y + btn_h), self._s(4),
                    fill=DRUMROLL_BTN_BG, outline=DRUMROLL_BTN_BORDER, width=1)
             tw2, _ = text_size(d, bl, bf)
-            d.text((bx + (bw - tw2) // 2, y + (btn_h - self._s(12)) // 2), bl,
+            d.text((bx + (bw - tw2) // 2, y + btn_text_y), bl,
                    fill=DRUMROLL_BTN_TEXT, font=bf)
         return y + btn_h
 
@@ -443,44 +1421,492 @@ class PhoneScreen:
         """Draw a rounded button."""
         d = self.draw
         rrect(d, (x, y, x + w, y + h), self._s(6), fill=bg_color)
-        bf = font(self._s(14), jp=True)
+        bf, _ = fit_text(text, w - self._s(16), h, self._s(14), jp=True)
         tw, _ = text_size(d, text, bf)
-        d.text((x + (w - tw) // 2, y + (h - self._s(14)) // 2), text,
+        d.text((x + (w - tw) // 2, y + (h - bf.size) // 2), text,
                fill=text_color, font=bf)
 
+    def draw_summary_card(self, x, y, w, h, name, score, rank, accent):
+        """Draw one SummaryCards.tsx player card with rank accent and badge."""
+        d = self.draw
+        s = self._s
+        # Card bg
+        rrect(d, (x, y, x + w, y + h), s(8),
+               fill=(248, 249, 250), outline=CARD_BORDER, width=2)
+        # Left accent
+        d.rectangle((x + 1, y + s(6), x + s(4), y + h - s(6)), fill=accent)
+
+        # Player name
+        nf, _ = fit_text(name, w - s(16), s(20), s(14), jp=True)
+        d.text((x + s(12), y + s(6)), name, fill=DARK_TEXT, font=nf)
+
+        # Score
+        sf = font(s(20), bold=True)
+        scolor = GREEN if score.startswith("+") else RED if score.startswith("-") else HINT_TEXT
+        tw, _ = text_size(d, score, sf)
+        d.text((x + (w - tw) // 2, y + s(28)), score, fill=scolor, font=sf)
+
+        # Rank badge
+        rank_text = f"{rank}位"
+        rf = font(s(10), jp=True)
+        rtw, _ = text_size(d, rank_text, rf)
+        rbx = x + s(12)
+        rby = y + h - s(22)
+        rrect(d, (rbx, rby, rbx + rtw + s(10), rby + s(16)), s(8), fill=accent)
+        d.text((rbx + s(5), rby + s(1)), rank_text, fill=WHITE, font=rf)
+
+    def draw_score_chart(self, x, y, w, h, series):
+        """Draw each player's cumulative points across hanchan as a line chart.
+
+        `series` is ``[(name, points per hanchan), ...]``; a season is the
+        hanchan of its games concatenated. Lines take the rank colour of the
+        player's final total and are decimated to the plot width, so drawing
+        costs the same for 10 hanchan or 100,000.
+        """
+        d = self.draw
+        s = self._s
+        rrect(d, (x, y, x + w, y + h), s(8), fill=(248, 249, 250), outline=CARD_BORDER, width=2)
+        if not series or not any(len(pts) for _, pts in series):
+            hf = font(s(12), jp=True)
+            _, th = text_size(d, "記録なし", hf)
+            draw_centered_text(d, "記録なし", x + w // 2, y + (h - th) // 2, hf, HINT_TEXT)
+            return
+
+        curves = [np.concatenate([[0], np.cumsum(np.asarray(pts, dtype=np.int64))]) for _, pts in series]
+        totals = [int(c[-1]) for c in curves]
+        ranks = competition_ranks(np.zeros(len(totals), dtype=np.int64), np.asarray(totals)).tolist()
+
+        # Legend: rank dot, name and total per player
+        lf = font(s(11), jp=True)
+        vf = font(s(11), bold=True)
+        lx = x + s(12)
+        for (name, _), total, rank in zip(series, totals, ranks):
+            d.rounded_rectangle((lx, y + s(12), lx + s(8), y + s(20)), radius=s(4), fill=RANK_COLORS.get(rank, RANK_GRAY))
+            d.text((lx + s(12), y + s(9)), name, fill=DARK_TEXT, font=lf)
+            lx += s(12) + text_size(d, name, lf)[0] + s(4)
+            label = f"{total:+d}" if total else "0"
+            d.text((lx, y + s(9)), label, fill=GREEN if total > 0 else RED if total < 0 else HINT_TEXT, font=vf)
+            lx += text_size(d, label, vf)[0] + s(12)
+
+        # Plot area with value axis on the left
+        af = font(s(9))
+        px0, px1 = x + s(40), x + w - s(12)
+        py0, py1 = y + s(32), y + h - s(22)
+        lo = min(0, min(int(c.min()) for c in curves))
+        hi = max(0, max(int(c.max()) for c in curves))
+        raw = max(hi - lo, 1) / 4
+        mag = 10 ** math.floor(math.log10(raw))
+        # Whole points only: ranges of 4 or less get a step of 1
+        step = max(1, int(next(m * mag for m in (1, 2, 5, 10) if m * mag >= raw)))
+        lo = math.floor(lo / step) * step
+        hi = max(math.ceil(hi / step) * step, lo + step)
+
+        def to_y(v):
+            return py1 - (v - lo) * (py1 - py0) / (hi - lo)
+
+        for v in range(int(lo), int(hi) + 1, step):
+            gy = round(to_y(v))
+            d.line([(px0, gy), (px1, gy)], fill=GRAY_TEXT if v == 0 else (233, 236, 239), width=1)
+            label = f"{v:+d}" if v else "0"
+            tw, th = text_size(d, label, af)
+            d.text((px0 - s(4) - tw, gy - th // 2 - s(1)), label, fill=GRAY_TEXT, font=af)
+        n = len(curves[0]) - 1
+        d.text((px0, py1 + s(4)), "0", fill=GRAY_TEXT, font=af)
+        end = f"{n}半荘"
+        d.text((px1 - text_size(d, end, font(s(9), jp=True))[0], py1 + s(4)), end, fill=GRAY_TEXT,
+               font=font(s(9), jp=True))
+
+        # Lines, leader drawn last so it stays on top
+        lw = max(2, s(2))
+        plot_w = px1 - px0
+        for i in sorted(range(len(curves)), key=lambda i: -ranks[i]):
+            c = curves[i]
+            idx = decimate_series(c, plot_w)
+            xs = np.rint(px0 + idx * (plot_w / max(len(c) - 1, 1))).astype(int)
+            ys = np.rint(py1 - (c[idx] - lo) * ((py1 - py0) / (hi - lo))).astype(int)
+            d.line(list(zip(xs.tolist(), ys.tolist())), fill=RANK_COLORS.get(ranks[i], RANK_GRAY), width=lw)
+
     def get_image(self):
+        if self.display_list is not None:
+            return self.display_list.replay()
         return self.img
 
 
-def create_promo_frame(phone_img, title_text=None, subtitle_text=None, config=IPHONE):
-    """Wrap a phone/tablet screen image in a promo frame with title."""
+# ──────────────────────────────────────────────
+# Declarative screen specs
+# ──────────────────────────────────────────────
+
+class SpecNode:
+    """Immutable node of a declarative screen spec; sizes are in dp.
+
+    Nodes compare and hash by content, so an unchanged subtree keeps its
+    cached layout when a sibling is replaced.
+    """
+
+    def __init__(self, children=(), **props):
+        self.children = tuple(children)
+        self.props = props
+        for k, v in props.items():
+            setattr(self, k, v)
+        self.key = (type(self).__name__, tuple(sorted(props.items())),
+                    tuple(c.key for c in self.children))
+        self._hash = hash(self.key)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return isinstance(other, SpecNode) and self._hash == other._hash and self.key == other.key
+
+    def replace(self, **changes):
+        """Return a copy with some props (or `children`) changed."""
+        # Built from the stored props, as subclass constructors take their own arguments
+        children = changes.pop('children', self.children)
+        node = object.__new__(type(self))
+        SpecNode.__init__(node, children, **{**self.props, **changes})
+        return node
+
+    def arrange(self, s, w, measure):
+        """Return (height, ((child, dx, dy, w, h), ...)) for a box `w` pixels wide."""
+        return s(self.height), ()
+
+    def paint(self, ps, x, y, w, h):
+        pass
+
+
+class Column(SpecNode):
+    """Vertical stack with padding and gap between children."""
+
+    def __init__(self, children=(), padding=0, gap=0, height=None):
+        super().__init__(children, padding=padding, gap=gap, height=height)
+
+    def _inset(self, s, w):
+        return s(self.padding), s(self.padding)
+
+    def arrange(self, s, w, measure):
+        px, py = self._inset(s, w)
+        inner_w = w - 2 * px
+        y = py
+        placed = []
+        for i, child in enumerate(self.children):
+            if i:
+                y += s(self.gap)
+            ch = measure(child, inner_w)
+            placed.append((child, px, y, inner_w, ch))
+            y += ch
+        h = s(self.height) if self.height is not None else y + py
+        return h, tuple(placed)
+
+
+class Screen(Column):
+    """Root of a phone screen: children stacked below the top, inset by the screen padding."""
+
+    def _inset(self, s, w):
+        return int(w * 0.042), 0
+
+
+class Card(Column):
+    """White card with shadow around a vertical stack."""
+
+    def __init__(self, children=(), padding=16, gap=0, height=None):
+        super().__init__(children, padding=padding, gap=gap, height=height)
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_card(x, y, w, h)
+
+
+class Grid(SpecNode):
+    """Fixed-column grid; rows are `row_height` tall (or as tall as their tallest cell)."""
+
+    def __init__(self, children=(), columns=2, gap=8, row_gap=0, row_height=None):
+        super().__init__(children, columns=columns, gap=gap, row_gap=row_gap, row_height=row_height)
+
+    def arrange(self, s, w, measure):
+        gap = s(self.gap)
+        cell_w = (w - gap * (self.columns - 1)) // self.columns
+        rows = [self.children[i:i + self.columns] for i in range(0, len(self.children), self.columns)]
+        placed = []
+        y = 0
+        for ri, row in enumerate(rows):
+            if ri:
+                y += s(self.row_gap)
+            heights = [measure(c, cell_w) for c in row]
+            row_h = s(self.row_height) if self.row_height is not None else max(heights)
+            for ci, (child, ch) in enumerate(zip(row, heights)):
+                placed.append((child, ci * (cell_w + gap), y, cell_w, ch))
+            y += row_h
+        return y, tuple(placed)
+
+
+class Spacer(SpecNode):
+    def __init__(self, height=0):
+        super().__init__(height=height)
+
+
+class StatusBar(SpecNode):
+    def __init__(self):
+        super().__init__(height=28)
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_status_bar()
+
+
+class GameHeader(SpecNode):
+    """Game screen header (half-game label, suspend and finish buttons)."""
+
+    def __init__(self, label="第1半荘"):
+        super().__init__(label=label)
+
+    def arrange(self, s, w, measure):
+        return s(4) + s(48), ()
+
+    def paint(self, ps, x, y, w, h):
+        ps.y = y
+        _draw_game_header(ps, self.label)
+
+
+class Section(SpecNode):
+    """Section title with blue underline and optional right-hand label."""
+
+    def __init__(self, title, right=None):
+        super().__init__(title=title, right=right)
+
+    def arrange(self, s, w, measure):
+        return s(24) + s(8), ()
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_section_title(x, y, w, self.title, self.right)
+
+
+class Text(SpecNode):
+    def __init__(self, text, size=14, color=DARK_TEXT, height=None, jp=True, bold=False):
+        super().__init__(text=text, size=size, color=color, height=height, jp=jp, bold=bold)
+
+    def arrange(self, s, w, measure):
+        return s(self.height if self.height is not None else self.size + 4), ()
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw.text((x, y), self.text, fill=self.color,
+                     font=font(ps._s(self.size), bold=self.bold, jp=self.jp))
+
+
+class Button(SpecNode):
+    def __init__(self, text, color, text_color=WHITE, height=48):
+        super().__init__(text=text, color=color, text_color=text_color, height=height)
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_button(x, y, w, h, self.text, self.color, self.text_color)
+
+
+class DrumRoll(SpecNode):
+    """DrumRollInput with its label above."""
+
+    def __init__(self, label, value):
+        super().__init__(label=label, value=value)
+
+    def arrange(self, s, w, measure):
+        return s(18) + 2 * s(26) + s(40) + 2 * s(4), ()
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_drumroll_input(x, y, self.label, self.value, box_w=w)
+
+
+class SummaryCard(SpecNode):
+    """Per-player total with rank accent, as in SummaryCards.tsx."""
+
+    def __init__(self, name, score, rank, accent, height=80):
+        super().__init__(name=name, score=score, rank=rank, accent=accent, height=height)
+
+    def paint(self, ps, x, y, w, h):
+        ps.draw_summary_card(x, y, w, h, self.name, self.score, self.rank, self.accent)
+
+
+class Slot(SpecNode):
+    """Fixed-height slot holding one child laid out at its own height."""
+
+    def __init__(self, child, height):
+        super().__init__((child,), height=height)
+
+    def arrange(self, s, w, measure):
+        child = self.children[0]
+        return s(self.height), ((child, 0, 0, w, measure(child, w)),)
+
+
+class SetupHeader(SpecNode):
+    """SetupScreen title block with the 使い方 help button at the right."""
+
+    def __init__(self, title, subtitle, help_label="使い方"):
+        super().__init__(title=title, subtitle=subtitle, help_label=help_label, height=76)
+
+    def paint(self, ps, x, y, w, h):
+        d = ps.draw
+        s = ps._s
+        draw_centered_text(d, self.title, ps.w // 2, y, font(s(36), jp=True), WHITE)
+        draw_centered_text(d, self.subtitle, ps.w // 2, y + s(44), font(s(16), jp=True), WHITE)
+        hx = x + w - s(40)
+        rrect(d, (hx, y, hx + s(40), y + s(36)), s(8), fill=(255, 255, 255, 64))
+        draw_centered_text(d, "?", hx + s(20), y + s(2), font(s(18), bold=True), WHITE)
+        draw_centered_text(d, self.help_label, hx + s(20), y + s(22), font(s(9), jp=True), WHITE)
+
+
+class Choice(SpecNode):
+    """Row of toggle buttons, one of them selected."""
+
+    def __init__(self, options, selected=0, gap=12, height=56):
+        super().__init__(options=tuple(options), selected=selected, gap=gap, height=height)
+
+    def paint(self, ps, x, y, w, h):
+        d = ps.draw
+        s = ps._s
+        n = len(self.options)
+        bw = (w - s(self.gap) * (n - 1)) // n
+        for i, label in enumerate(self.options):
+            bx = x + i * (bw + s(self.gap))
+            on = i == self.selected
+            rrect(d, (bx, y, bx + bw, y + h), s(8),
+                  fill=BG_MED if on else WHITE, outline=BG_MED if on else CARD_BORDER, width=2)
+            draw_centered_text(d, label, bx + bw // 2, y + s(20), font(s(14), jp=True),
+                               WHITE if on else GRAY_TEXT)
+
+
+class TextInput(SpecNode):
+    """Labelled text field, with the gap below it to the next row."""
+
+    def __init__(self, label, value):
+        super().__init__(label=label, value=value)
+
+    def arrange(self, s, w, measure):
+        return s(44) + s(24), ()
+
+    def paint(self, ps, x, y, w, h):
+        d = ps.draw
+        s = ps._s
+        d.text((x, y), self.label, fill=MED_TEXT, font=font(s(12), jp=True))
+        iy = y + s(18)
+        rrect(d, (x, iy, x + w, iy + s(44)), s(6), fill=WHITE, outline=INPUT_BORDER, width=2)
+        d.text((x + s(10), iy + s(10)), self.value, fill=DARK_TEXT, font=font(s(16), jp=True))
+
+
+class PageHeader(SpecNode):
+    """Sub-screen header: back button at the left, title centered."""
+
+    def __init__(self, title, back="← 戻る"):
+        super().__init__(title=title, back=back, height=48)
+
+    def paint(self, ps, x, y, w, h):
+        d = ps.draw
+        s = ps._s
+        rrect(d, (x, y, x + s(60), y + s(32)), s(6), fill=(255, 255, 255, 50))
+        draw_centered_text(d, self.back, x + s(30), y + s(6), font(s(14), jp=True), WHITE)
+        draw_centered_text(d, self.title, ps.w // 2, y + s(2), font(s(20), jp=True), WHITE)
+
+
+class GameCard(SpecNode):
+    """One PastGamesScreen entry: date and type over players and hanchan count."""
+
+    def __init__(self, date, kind, players, hanchan, height=88):
+        super().__init__(date=date, kind=kind, players=players, hanchan=hanchan, height=height)
+
+    def paint(self, ps, x, y, w, h):
+        s = ps._s
+        ps.draw_card(x, y, w, h)
+        d = ps.draw
+        cx = x + s(16)
+        cw = w - 2 * s(16)
+        d.text((cx, y + s(10)), self.date, fill=SECTION_TITLE_COLOR, font=font(s(16), jp=True))
+        kf = font(s(13), jp=True)
+        tw, _ = text_size(d, self.kind, kf)
+        d.text((cx + cw - tw, y + s(12)), self.kind, fill=GRAY_TEXT, font=kf)
+        div_y = y + s(38)
+        d.line([(cx, div_y), (cx + cw, div_y)], fill=(238, 238, 238), width=1)
+        d.text((cx, div_y + s(8)), self.players, fill=DARK_TEXT, font=font(s(14), jp=True))
+        tw, _ = text_size(d, self.hanchan, kf)
+        d.text((cx + cw - tw, div_y + s(10)), self.hanchan, fill=GRAY_TEXT, font=kf)
+
+
+_layout_cache = {}
+_spec_cache = {}
+
+
+def _config_unit(config):
+    return (config.screen_w, config.base_dp)
+
+
+def _arrange(node, unit, w):
+    key = (node, unit, w)
+    hit = _layout_cache.get(key)
+    if hit is None:
+        screen_w, base_dp = unit
+
+        def s(dp):
+            return int(dp * screen_w / base_dp)
+
+        hit = node.arrange(s, w, lambda child, cw: _arrange(child, unit, cw)[0])
+        _layout_cache[key] = hit
+    return hit
+
+
+def layout_spec(spec, config=IPHONE, w=None):
+    """Absolute boxes ((node, x, y, w, h), ...) for `spec`, in paint order.
+
+    Results are cached per (spec, config, width); every subtree's relative
+    layout is cached by content, so editing one node only re-lays-out the
+    path from it to the root.
+    """
+    if w is None:
+        w = config.screen_w
+    key = (spec, _config_unit(config), w)
+    boxes = _spec_cache.get(key)
+    if boxes is None:
+        out = []
+
+        def walk(node, x, y, nw):
+            h, placed = _arrange(node, key[1], nw)
+            out.append((node, x, y, nw, h))
+            for child, dx, dy, cw, _ in placed:
+                walk(child, x + dx, y + dy, cw)
+
+        walk(spec, 0, 0, w)
+        boxes = _spec_cache[key] = tuple(out)
+    return boxes
+
+
+def paint_spec(spec, ps, x=0, y=0, w=None):
+    """Paint `spec` onto PhoneScreen `ps` with its top-left at (x, y)."""
+    for node, nx, ny, nw, nh in layout_spec(spec, ps.config, w):
+        node.paint(ps, x + nx, y + ny, nw, nh)
+
+
+def clear_layout_cache():
+    """Drop cached spec layouts and text fits, e.g. when the fonts change."""
+    _layout_cache.clear()
+    _spec_cache.clear()
+    _fit_cache.clear()
+    _extent_cache.clear()
+
+
+def promo_frame_layout(config=IPHONE, title_text=None, subtitle_text=None):
+    """Geometry of a promo frame: text positions and where the screen goes."""
     promo_w, promo_h = config.promo_w, config.promo_h
     screen_w, screen_h = config.screen_w, config.screen_h
 
-    img = Image.new('RGBA', (promo_w, promo_h), (0, 0, 0, 0))
-    # Dark top for text contrast → lighter bottom so device frame stands out
-    draw_gradient_bg(img, (10, 20, 55), (50, 95, 165))
-    draw = ImageDraw.Draw(img)
-
+    # Captions shrink (but keep their line's height) when too wide for the frame
+    text_w = int(promo_w * 0.94)
     top_y = int(promo_h * 0.03)
-
-    # Title text (large enough to be visible on App Store listing)
+    title_y = top_y
+    title_font_size = int(promo_w * 0.09)
     if title_text:
-        title_font_size = int(promo_w * 0.09)
-        tf = font(title_font_size, jp=True)
-        draw_centered_text(draw, title_text, promo_w // 2, top_y, tf, WHITE)
         top_y += int(title_font_size * 1.5)
-
+        title_font_size = fit_text(title_text, text_w, title_font_size * 2, title_font_size, jp=True)[0].size
+    subtitle_y = top_y
+    sub_font_size = int(promo_w * 0.065)
     if subtitle_text:
-        sub_font_size = int(promo_w * 0.065)
-        sf = font(sub_font_size, jp=True)
-        draw_centered_text(draw, subtitle_text, promo_w // 2, top_y, sf, (255, 225, 130))
         top_y += int(sub_font_size * 1.5)
+        sub_font_size = fit_text(subtitle_text, text_w, sub_font_size * 2, sub_font_size, jp=True)[0].size
 
     # Device frame (smaller to give more space to text)
     phone_w = int(promo_w * 0.62)
     phone_h = int(phone_w * screen_h / screen_w)
-    phone_scaled = phone_img.resize((phone_w, phone_h), Image.LANCZOS)
 
     # Bezel dimensions (iPad has slightly thicker bezels, less rounded corners)
     if config.is_tablet:
@@ -492,154 +1918,134 @@ def create_promo_frame(phone_img, title_text=None, subtitle_text=None, config=IP
 
     px = (promo_w - phone_w) // 2 - bezel
     py = top_y + int(promo_h * 0.02)
+    return {
+        'title_y': title_y, 'title_font_size': title_font_size,
+        'subtitle_y': subtitle_y, 'sub_font_size': sub_font_size,
+        'phone_w': phone_w, 'phone_h': phone_h, 'bezel': bezel, 'corner_r': corner_r,
+        'px': px, 'py': py, 'body_w': phone_w + bezel * 2, 'body_h': phone_h + bezel * 2,
+        'screen_x': px + bezel, 'screen_y': py + bezel,
+    }
 
-    # Shadow
-    shadow = Image.new('RGBA', img.size, (0, 0, 0, 0))
-    sd = ImageDraw.Draw(shadow)
-    sd.rounded_rectangle(
-        (px + 12, py + 12, px + phone_w + bezel * 2 + 12, py + phone_h + bezel * 2 + 12),
-        radius=corner_r + bezel, fill=(0, 0, 0, 80)
-    )
-    shadow = shadow.filter(ImageFilter.GaussianBlur(30))
-    img = Image.alpha_composite(img, shadow)
-    draw = ImageDraw.Draw(img)
 
-    # Device body
-    draw.rounded_rectangle(
-        (px, py, px + phone_w + bezel * 2, py + phone_h + bezel * 2),
-        radius=corner_r + bezel, fill=(20, 20, 25), outline=(60, 60, 65), width=2
-    )
+def promo_backdrop(title_text=None, subtitle_text=None, config=IPHONE):
+    """Promo frame without the screen: background, device body and titles."""
+    promo_w, promo_h = config.promo_w, config.promo_h
+    g = promo_frame_layout(config, title_text, subtitle_text)
+    px, py, body_w, body_h = g['px'], g['py'], g['body_w'], g['body_h']
+    corner_r, bezel = g['corner_r'], g['bezel']
+
+    def build_template():
+        # Dark top for text contrast → lighter bottom so device frame stands out
+        template = gradient_image((promo_w, promo_h), (10, 20, 55), (50, 95, 165)).copy()
+        layers = LayerStack()
+        # Shadow
+        layers.add_shadow([((px, py, px + body_w, py + body_h), corner_r + bezel)],
+                          (12, 12), 30, (0, 0, 0, 80))
+        # Device body
+        body = Image.new('RGBA', (body_w + 1, body_h + 1), (0, 0, 0, 0))
+        AtlasDraw(body).rounded_rectangle(
+            (0, 0, body_w, body_h),
+            radius=corner_r + bezel, fill=(20, 20, 25), outline=(60, 60, 65), width=2
+        )
+        layers.add(body, (px, py))
+        return layers.flatten(template)
 
-    # Screen mask
-    screen_mask = Image.new('L', (phone_w, phone_h), 0)
-    sm = ImageDraw.Draw(screen_mask)
-    sm.rounded_rectangle((0, 0, phone_w - 1, phone_h - 1), radius=corner_r, fill=255)
+    img = intermediate(('promo_frame', promo_w, promo_h, px, py, body_w, body_h, corner_r + bezel),
+                       build_template).copy()
+    draw = AtlasDraw(img)
 
-    # Composite screen
-    screen_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))
-    screen_layer.paste(phone_scaled, (px + bezel, py + bezel), screen_mask)
-    img = Image.alpha_composite(img, screen_layer)
+    # Title text (large enough to be visible on App Store listing)
+    if title_text:
+        tf = font(g['title_font_size'], jp=True)
+        draw_centered_text(draw, title_text, promo_w // 2, g['title_y'], tf, WHITE)
 
+    if subtitle_text:
+        sf = font(g['sub_font_size'], jp=True)
+        draw_centered_text(draw, subtitle_text, promo_w // 2, g['subtitle_y'], sf, (255, 225, 130))
     return img
 
 
-# ── Promo 1: Setup Screen ──
+def promo_screen_mask(g):
+    """Rounded-corner alpha of the scaled screen, for promo_frame_layout() `g`."""
+    phone_w, phone_h, corner_r = g['phone_w'], g['phone_h'], g['corner_r']
+
+    def build_screen_mask():
+        screen_mask = Image.new('L', (phone_w, phone_h), 0)
+        sm = AtlasDraw(screen_mask)
+        sm.rounded_rectangle((0, 0, phone_w - 1, phone_h - 1), radius=corner_r, fill=255)
+        return screen_mask
+
+    return intermediate(('screen_mask', phone_w, phone_h, corner_r), build_screen_mask)
+
+
+def composite_screen(backdrop, phone_img, g, region=None):
+    """Scale the screen into the device on `backdrop`, laid out by promo_frame_layout() `g`.
+
+    With `region` (a box in scaled-screen pixels) only that part is resampled
+    and composited, matching a full composite there to within rounding; the
+    result is then the backdrop crop under the region.
+    """
+    phone_w, phone_h = g['phone_w'], g['phone_h']
+    if region is None:
+        region = (0, 0, phone_w, phone_h)
+    x0, y0, x1, y1 = region
+    kx = phone_img.width / phone_w
+    ky = phone_img.height / phone_h
+    phone_scaled = phone_img.resize((x1 - x0, y1 - y0), Image.LANCZOS,
+                                    box=(x0 * kx, y0 * ky, x1 * kx, y1 * ky))
+    screen_mask = promo_screen_mask(g).crop(region)
+    phone_scaled.putalpha(ImageChops.multiply(phone_scaled.getchannel('A'), screen_mask))
+    layers = LayerStack()
+    if region == (0, 0, phone_w, phone_h):
+        layers.add(phone_scaled, (g['screen_x'], g['screen_y']))
+        return layers.flatten(backdrop)
+    sx, sy = g['screen_x'] + x0, g['screen_y'] + y0
+    layers.add(phone_scaled, (0, 0))
+    return layers.flatten(backdrop.crop((sx, sy, sx + x1 - x0, sy + y1 - y0)))
 
-def generate_promo_setup(output_path, config=IPHONE):
-    """Setup screen with type selection and player inputs."""
-    ps = PhoneScreen(config)
-    d = ps.draw
-    s = ps._s
-    pad = ps.pad
 
-    ps.draw_status_bar()
-
-    # Header
-    header_y = ps.y + s(8)
-    title_f = font(s(36), jp=True)
-    draw_centered_text(d, "麻雀", ps.w // 2, header_y, title_f, WHITE)
-    # Actually the title in SetupScreen is "🀄 麻雀" but emoji won't render in PIL
-    # So use text only
-    sub_f = font(s(16), jp=True)
-    draw_centered_text(d, "スコアシートモバイル", ps.w // 2, header_y + s(44), sub_f, WHITE)
-
-    # Help button (top right)
-    hx = ps.w - pad - s(40)
-    hy = header_y
-    rrect(d, (hx, hy, hx + s(40), hy + s(36)), s(8), fill=(255, 255, 255, 64))
-    hf = font(s(18), bold=True)
-    draw_centered_text(d, "?", hx + s(20), hy + s(2), hf, WHITE)
-    hlf = font(s(9), jp=True)
-    draw_centered_text(d, "使い方", hx + s(20), hy + s(22), hlf, WHITE)
-
-    card_y = header_y + s(76)
-    card_x = pad
-    card_w = ps.w - 2 * pad
-
-    # ── Main Card: ゲーム設定 ──
-    card_h = s(380)
-    ps.draw_card(card_x, card_y, card_w, card_h)
-    d = ps.draw  # refresh after card shadow composite
-    inner_pad = s(20)
-    cx = card_x + inner_pad
-    cw = card_w - 2 * inner_pad
-
-    # Section title
-    cy = card_y + inner_pad
-    next_y = ps.draw_section_title(cx, cy, cw, "ゲーム設定")
-    d = ps.draw
-
-    # 麻雀タイプ label
-    lf = font(s(14), jp=True)
-    d.text((cx, next_y), "麻雀タイプ", fill=SECTION_TITLE_COLOR, font=lf)
-    next_y += s(24)
+def create_promo_frame(phone_img, title_text=None, subtitle_text=None, config=IPHONE):
+    """Wrap a phone/tablet screen image in a promo frame with title."""
+    return composite_screen(promo_backdrop(title_text, subtitle_text, config), phone_img,
+                            promo_frame_layout(config, title_text, subtitle_text))
 
-    # Type buttons (two side by side)
-    btn_w = (cw - s(12)) // 2
-    btn_h = s(56)
 
-    # 4人麻雀 (active)
-    rrect(d, (cx, next_y, cx + btn_w, next_y + btn_h), s(8),
-           fill=BG_MED, outline=BG_MED, width=2)
-    icon_f = font(s(20), jp=True)
-    draw_centered_text(d, "4人麻雀", cx + btn_w // 2, next_y + s(20), font(s(14), jp=True), WHITE)
+# ── Promo 1: Setup Screen ──
 
-    # 3人麻雀 (inactive)
-    bx2 = cx + btn_w + s(12)
-    rrect(d, (bx2, next_y, bx2 + btn_w, next_y + btn_h), s(8),
-           fill=WHITE, outline=CARD_BORDER, width=2)
-    draw_centered_text(d, "3人麻雀", bx2 + btn_w // 2, next_y + s(20), font(s(14), jp=True), GRAY_TEXT)
+PROMO_SETUP_SPEC = Screen([
+    StatusBar(),
+    Spacer(8),
+    # SetupScreen's title is "🀄 麻雀", but PIL does not render the emoji
+    SetupHeader("麻雀", "スコアシートモバイル"),
+    Card([
+        Section("ゲーム設定"),
+        Text("麻雀タイプ", color=SECTION_TITLE_COLOR, height=24),
+        Choice(["4人麻雀", "3人麻雀"]),
+        Spacer(16),
+        Text("プレイヤー設定", color=SECTION_TITLE_COLOR, height=22),
+        Text("※ 4文字以内で入力してください", size=11, color=HINT_TEXT, height=18),
+        Grid([TextInput(f"プレイヤー{i + 1}", name) for i, name in enumerate(["太郎", "花子", "次郎", "美咲"])],
+             gap=12),
+        Spacer(4),
+        Button("ゲーム開始", BG_MED),
+    ], padding=20, height=380),
+    Spacer(16),
+    Card([
+        Slot(Section("過去のゲーム履歴管理"), height=36),
+        Slot(Button("過去のゲームを見る", GRAY_TEXT), height=56),
+        Button("ゲームを取り込む", TEAL),
+    ], padding=20, height=170),
+])
+
+
+def _draw_promo_setup(ps):
+    """Setup screen with type selection and player inputs."""
+    paint_spec(PROMO_SETUP_SPEC, ps)
 
-    next_y += btn_h + s(16)
 
-    # プレイヤー設定
-    d.text((cx, next_y), "プレイヤー設定", fill=SECTION_TITLE_COLOR, font=lf)
-    next_y += s(22)
-    hint_f = font(s(11), jp=True)
-    d.text((cx, next_y), "※ 4文字以内で入力してください", fill=HINT_TEXT, font=hint_f)
-    next_y += s(18)
-
-    # Player input fields (2x2 grid)
-    inp_w = (cw - s(12)) // 2
-    inp_h = s(44)
-    inp_label_f = font(s(12), jp=True)
-    inp_text_f = font(s(16), jp=True)
-    player_names = ["太郎", "花子", "次郎", "美咲"]
-
-    for i, name in enumerate(player_names):
-        col = i % 2
-        row = i // 2
-        ix = cx + col * (inp_w + s(12))
-        iy = next_y + row * (inp_h + s(24))
-
-        d.text((ix, iy), f"プレイヤー{i+1}", fill=MED_TEXT, font=inp_label_f)
-        iy += s(18)
-        rrect(d, (ix, iy, ix + inp_w, iy + inp_h), s(6),
-               fill=WHITE, outline=INPUT_BORDER, width=2)
-        d.text((ix + s(10), iy + s(10)), name, fill=DARK_TEXT, font=inp_text_f)
-
-    next_y += 2 * (inp_h + s(24)) + s(4)
-
-    # ゲーム開始 button
-    btn_y = next_y
-    ps.draw_button(cx, btn_y, cw, s(48), "ゲーム開始", BG_MED)
-
-    # ── Second Card: 過去のゲーム履歴管理 ──
-    card2_y = card_y + card_h + s(16)
-    card2_h = s(170)
-    ps.draw_card(card_x, card2_y, card_w, card2_h)
-    d = ps.draw
-    cy2 = card2_y + inner_pad
-    ps.draw_section_title(cx, cy2, cw, "過去のゲーム履歴管理")
-    by = cy2 + s(36)
-    ps.draw_button(cx, by, cw, s(48), "過去のゲームを見る", GRAY_TEXT)
-    by += s(56)
-    ps.draw_button(cx, by, cw, s(48), "ゲームを取り込む", TEAL)
-
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "麻雀対戦スコア管理", "３麻４麻両対応！", config)
-    promo.save(output_path, 'PNG')
-    print(f"Generated: {output_path}")
+def generate_promo_setup(output_path, config=IPHONE):
+    """Setup screen with type selection and player inputs."""
+    save_promo('setup', output_path, config)
 
 
 # ── Promo 2: Score Input Screen ──
@@ -668,107 +2074,63 @@ def _draw_game_header(ps, hanchan_label="第1半荘"):
     return hy
 
 
-def generate_promo_score(output_path, config=IPHONE):
-    """Game screen with score drum roll input (score only, no chip)."""
-    ps = PhoneScreen(config)
-    d = ps.draw
-    s = ps._s
-    pad = ps.pad
+def _drumroll_screen_spec(title, values, button_text):
+    """Game screen with one 2x2 DrumRoll input card."""
+    total = sum(val for _, val in values)
+    return Screen([
+        StatusBar(),
+        GameHeader(),
+        Card([
+            Section(title, f"合計: {total:+d}" if total else "合計: 0"),
+            Grid([DrumRoll(name, val) for name, val in values], gap=8, row_height=120),
+            Spacer(8),
+            Button(button_text, GREEN, height=42),
+        ], height=390),
+    ])
 
-    ps.draw_status_bar()
-    hy = _draw_game_header(ps)
 
-    card_y = hy + s(48)
-    card_x = pad
-    card_w = ps.w - 2 * pad
-    inner_pad = s(16)
-    cx = card_x + inner_pad
-    cw = card_w - 2 * inner_pad
+PROMO_SCORE_INPUT = ("ポイント入力", [("太郎", 32), ("花子", -15), ("次郎", -8), ("美咲", -9)], "スコアを記録")
+PROMO_SCORE_SPEC = _drumroll_screen_spec(*PROMO_SCORE_INPUT)
 
-    # ── ポイント入力 Card ──
-    card_h = s(390)
-    ps.draw_card(card_x, card_y, card_w, card_h)
-    d = ps.draw
-    cy = card_y + inner_pad
-    cy = ps.draw_section_title(cx, cy, cw, "ポイント入力", "合計: 0")
-    d = ps.draw
 
-    # DrumRoll inputs (2x2 grid)
-    players_scores = [("太郎", 32), ("花子", -15), ("次郎", -8), ("美咲", -9)]
-    dr_gap = s(8)
-    dr_w = (cw - dr_gap) // 2
-    dr_row_h = s(120)
-    for i, (name, val) in enumerate(players_scores):
-        col = i % 2
-        row = i // 2
-        dx = cx + col * (dr_w + dr_gap)
-        dy = cy + row * dr_row_h
-        ps.draw_drumroll_input(dx, dy, name, val, box_w=dr_w)
-
-    # スコアを記録 button
-    btn_y = cy + 2 * dr_row_h + s(8)
-    ps.draw_button(cx, btn_y, cw, s(42), "スコアを記録", GREEN)
-
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "ポイント入力", "直感的なUIでかんたん入力", config)
-    promo.save(output_path, 'PNG')
-    print(f"Generated: {output_path}")
+def _draw_promo_score(ps):
+    """Game screen with score drum roll input (score only, no chip)."""
+    paint_spec(PROMO_SCORE_SPEC, ps)
+
+
+def generate_promo_score(output_path, config=IPHONE):
+    """Game screen with score drum roll input (score only, no chip)."""
+    save_promo('score', output_path, config)
 
 
 # ── Promo 3: Chip Input Screen ──
 
-def generate_promo_chip(output_path, config=IPHONE):
-    """Game screen with chip drum roll input (chip only)."""
-    ps = PhoneScreen(config)
-    d = ps.draw
-    s = ps._s
-    pad = ps.pad
+PROMO_CHIP_INPUT = ("チップ移動", [("太郎", 3), ("花子", -1), ("次郎", 2), ("美咲", -4)], "チップを記録")
+PROMO_CHIP_SPEC = _drumroll_screen_spec(*PROMO_CHIP_INPUT)
 
-    ps.draw_status_bar()
-    hy = _draw_game_header(ps)
 
-    card_y = hy + s(48)
-    card_x = pad
-    card_w = ps.w - 2 * pad
-    inner_pad = s(16)
-    cx = card_x + inner_pad
-    cw = card_w - 2 * inner_pad
+def _draw_promo_chip(ps):
+    """Game screen with chip drum roll input (chip only)."""
+    paint_spec(PROMO_CHIP_SPEC, ps)
 
-    # ── チップ移動 Card (2x2 grid, all 4 players) ──
-    chip_h = s(390)
-    ps.draw_card(card_x, card_y, card_w, chip_h)
-    d = ps.draw
-    cy = card_y + inner_pad
-    cy = ps.draw_section_title(cx, cy, cw, "チップ移動", "合計: 0")
-    d = ps.draw
 
-    # DrumRoll inputs (2x2 grid)
-    dr_gap = s(8)
-    dr_w = (cw - dr_gap) // 2
-    dr_row_h = s(120)
-    chip_scores = [("太郎", 3), ("花子", -1), ("次郎", 2), ("美咲", -4)]
-    for i, (name, val) in enumerate(chip_scores):
-        col = i % 2
-        row = i // 2
-        dx = cx + col * (dr_w + dr_gap)
-        dy = cy + row * dr_row_h
-        ps.draw_drumroll_input(dx, dy, name, val, box_w=dr_w)
-
-    # チップを記録 button
-    btn_y = cy + 2 * dr_row_h + s(8)
-    ps.draw_button(cx, btn_y, cw, s(42), "チップを記録", GREEN)
-
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "チップ移動", "チップ枚数もまとめて管理", config)
-    promo.save(output_path, 'PNG')
-    print(f"Generated: {output_path}")
+def generate_promo_chip(output_path, config=IPHONE):
+    """Game screen with chip drum roll input (chip only)."""
+    save_promo('chip', output_path, config)
 
 
 # ── Promo 3: Summary + History Screen ──
 
-def generate_promo_summary(output_path, config=IPHONE):
+SUMMARY_GRID_SPEC = Grid([
+    SummaryCard("太郎", "+87", 1, GOLD),
+    SummaryCard("花子", "+23", 2, SILVER),
+    SummaryCard("次郎", "-42", 3, BRONZE),
+    SummaryCard("美咲", "-68", 4, RANK_GRAY),
+], gap=8, row_gap=8)
+
+
+def _draw_promo_summary(ps, summary_grid=SUMMARY_GRID_SPEC):
     """Summary cards and history table."""
-    ps = PhoneScreen(config)
     d = ps.draw
     s = ps._s
     pad = ps.pad
@@ -792,44 +2154,7 @@ def generate_promo_summary(output_path, config=IPHONE):
     d = ps.draw
 
     # Summary cards (2x2)
-    summary = [
-        ("太郎", "+87", 1, GOLD),
-        ("花子", "+23", 2, SILVER),
-        ("次郎", "-42", 3, BRONZE),
-        ("美咲", "-68", 4, RANK_GRAY),
-    ]
-    sc_w = (cw - s(8)) // 2
-    sc_h = s(80)
-    for i, (name, score, rank, accent) in enumerate(summary):
-        col = i % 2
-        row = i // 2
-        sx = cx + col * (sc_w + s(8))
-        sy = cy + row * (sc_h + s(8))
-
-        # Card bg
-        rrect(d, (sx, sy, sx + sc_w, sy + sc_h), s(8),
-               fill=(248, 249, 250), outline=CARD_BORDER, width=2)
-        # Left accent
-        d.rectangle((sx + 1, sy + s(6), sx + s(4), sy + sc_h - s(6)), fill=accent)
-
-        # Player name
-        nf = font(s(14), jp=True)
-        d.text((sx + s(12), sy + s(6)), name, fill=DARK_TEXT, font=nf)
-
-        # Score
-        sf = font(s(20), bold=True)
-        scolor = GREEN if score.startswith("+") else RED
-        tw, _ = text_size(d, score, sf)
-        d.text((sx + (sc_w - tw) // 2, sy + s(28)), score, fill=scolor, font=sf)
-
-        # Rank badge
-        rank_text = f"{rank}位"
-        rf = font(s(10), jp=True)
-        rtw, _ = text_size(d, rank_text, rf)
-        rbx = sx + s(12)
-        rby = sy + sc_h - s(22)
-        rrect(d, (rbx, rby, rbx + rtw + s(10), rby + s(16)), s(8), fill=accent)
-        d.text((rbx + s(5), rby + s(1)), rank_text, fill=WHITE, font=rf)
+    paint_spec(summary_grid, ps, cx, cy, cw)
 
     # ── 記録履歴 Card ──
     hist_y = card_y + card_h + s(16)
@@ -855,8 +2180,6 @@ def generate_promo_summary(output_path, config=IPHONE):
     rank_f = font(s(10), jp=True)
     time_f = font(s(11), jp=True)
 
-    rank_colors = {1: GOLD, 2: SILVER, 3: BRONZE, 4: RANK_GRAY}
-
     for ri, (label, scores) in enumerate(hist_data):
         ry = hy2 + ri * (row_h + s(8))
         # Row background
@@ -876,7 +2199,7 @@ def generate_promo_summary(output_path, config=IPHONE):
             ntw, _ = text_size(d, pname, name_f)
             d.text((cell_cx - ntw // 2, cell_y), pname, fill=MED_TEXT, font=name_f)
             # Rank badge centered
-            rc = rank_colors.get(prank, RANK_GRAY)
+            rc = RANK_COLORS.get(prank, RANK_GRAY)
             rtext = f"{prank}位"
             rtw2, _ = text_size(d, rtext, rank_f)
             badge_w = rtw2 + s(8)
@@ -888,85 +2211,42 @@ def generate_promo_summary(output_path, config=IPHONE):
             vtw, _ = text_size(d, pval, val_f)
             d.text((cell_cx - vtw // 2, cell_y + s(34)), pval, fill=vc, font=val_f)
 
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "総合スコア & 履歴", "ランキングと全記録を一目で確認", config)
-    promo.save(output_path, 'PNG')
-    print(f"Generated: {output_path}")
+
+def generate_promo_summary(output_path, config=IPHONE):
+    """Summary cards and history table."""
+    save_promo('summary', output_path, config)
 
 
 # ── Promo 4: Past Games Screen ──
 
-def generate_promo_past_games(output_path, config=IPHONE):
+PROMO_PAST_GAMES_SPEC = Screen([
+    StatusBar(),
+    Spacer(4),
+    PageHeader("過去のゲーム"),
+    Column([
+        GameCard("2026/02/25", "4人麻雀", "太郎 / 花子 / 次郎 / 美咲", "5半荘"),
+        GameCard("2026/02/20", "3人麻雀", "太郎 / 花子 / 次郎", "3半荘"),
+        GameCard("2026/02/15", "4人麻雀", "Aさん / Bさん / Cさん / Dさん", "4半荘"),
+        GameCard("2026/02/10", "4人麻雀", "太郎 / 花子 / 次郎 / 美咲", "6半荘"),
+        GameCard("2026/02/05", "3人麻雀", "太郎 / 花子 / 次郎", "2半荘"),
+    ], gap=12),
+])
+
+
+def _draw_promo_past_games(ps):
     """Past games list screen."""
-    ps = PhoneScreen(config)
-    d = ps.draw
-    s = ps._s
-    pad = ps.pad
+    paint_spec(PROMO_PAST_GAMES_SPEC, ps)
 
-    ps.draw_status_bar()
 
-    # Header: ← 戻る | 過去のゲーム | (spacer)
-    hy = ps.y + s(4)
-    # Back button
-    rrect(d, (pad, hy, pad + s(60), hy + s(32)), s(6), fill=(255, 255, 255, 50))
-    bf = font(s(14), jp=True)
-    draw_centered_text(d, "← 戻る", pad + s(30), hy + s(6), bf, WHITE)
-    # Title
-    tf = font(s(20), jp=True)
-    draw_centered_text(d, "過去のゲーム", ps.w // 2, hy + s(2), tf, WHITE)
-
-    card_x = pad
-    card_w = ps.w - 2 * pad
-    inner_pad = s(16)
-
-    # Game cards
-    games = [
-        ("2026/02/25", "4人麻雀", "太郎 / 花子 / 次郎 / 美咲", "5半荘"),
-        ("2026/02/20", "3人麻雀", "太郎 / 花子 / 次郎", "3半荘"),
-        ("2026/02/15", "4人麻雀", "Aさん / Bさん / Cさん / Dさん", "4半荘"),
-        ("2026/02/10", "4人麻雀", "太郎 / 花子 / 次郎 / 美咲", "6半荘"),
-        ("2026/02/05", "3人麻雀", "太郎 / 花子 / 次郎", "2半荘"),
-    ]
-
-    card_h = s(88)
-    gy = hy + s(48)
-
-    for date, gtype, players, hanchan in games:
-        ps.draw_card(card_x, gy, card_w, card_h)
-        d = ps.draw
-        cx = card_x + inner_pad
-        cw = card_w - 2 * inner_pad
-
-        # Header row: date + type
-        df = font(s(16), jp=True)
-        d.text((cx, gy + s(10)), date, fill=SECTION_TITLE_COLOR, font=df)
-        gtf = font(s(13), jp=True)
-        tw, _ = text_size(d, gtype, gtf)
-        d.text((cx + cw - tw, gy + s(12)), gtype, fill=GRAY_TEXT, font=gtf)
-        # Divider
-        div_y = gy + s(38)
-        d.line([(cx, div_y), (cx + cw, div_y)], fill=(238, 238, 238), width=1)
-
-        # Body: players + hanchan
-        pf = font(s(14), jp=True)
-        d.text((cx, div_y + s(8)), players, fill=DARK_TEXT, font=pf)
-        hf2 = font(s(13), jp=True)
-        tw2, _ = text_size(d, hanchan, hf2)
-        d.text((cx + cw - tw2, div_y + s(10)), hanchan, fill=GRAY_TEXT, font=hf2)
-
-        gy += card_h + s(12)
-
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "過去のゲーム一覧", "いつでも振り返り・削除が可能", config)
-    promo.save(output_path, 'PNG')
-    print(f"Generated: {output_path}")
+def generate_promo_past_games(output_path, config=IPHONE):
+    """Past games list screen."""
+    save_promo('past_games', output_path, config)
 
 
 # ── Promo 5: Share / Read-Only Screen ──
 
-def generate_promo_share(output_path, config=IPHONE):
+def _draw_promo_share(ps):
     """Read-only game view with share modal."""
-    ps = PhoneScreen(config)
     d = ps.draw
     s = ps._s
     pad = ps.pad
@@ -1002,44 +2282,12 @@ def generate_promo_share(output_path, config=IPHONE):
     cy = ps.draw_section_title(cx, cy, cw, "総合スコア")
     d = ps.draw
 
-    summary = [
-        ("太郎", "+87", 1, GOLD),
-        ("花子", "+23", 2, SILVER),
-        ("次郎", "-42", 3, BRONZE),
-        ("美咲", "-68", 4, RANK_GRAY),
-    ]
-    sc_w = (cw - s(8)) // 2
-    sc_h = s(80)
-    for i, (name, score, rank, accent) in enumerate(summary):
-        col = i % 2
-        row = i // 2
-        sx = cx + col * (sc_w + s(8))
-        sy = cy + row * (sc_h + s(8))
-        rrect(d, (sx, sy, sx + sc_w, sy + sc_h), s(8),
-               fill=(248, 249, 250), outline=CARD_BORDER, width=2)
-        d.rectangle((sx + 1, sy + s(6), sx + s(4), sy + sc_h - s(6)), fill=accent)
-        nf = font(s(14), jp=True)
-        d.text((sx + s(12), sy + s(6)), name, fill=DARK_TEXT, font=nf)
-        sf = font(s(20), bold=True)
-        scolor = GREEN if score.startswith("+") else RED
-        tw, _ = text_size(d, score, sf)
-        d.text((sx + (sc_w - tw) // 2, sy + s(28)), score, fill=scolor, font=sf)
-        rank_text = f"{rank}位"
-        rf = font(s(10), jp=True)
-        rtw, _ = text_size(d, rank_text, rf)
-        rbx = sx + s(12)
-        rby = sy + sc_h - s(22)
-        rrect(d, (rbx, rby, rbx + rtw + s(10), rby + s(16)), s(8), fill=accent)
-        d.text((rbx + s(5), rby + s(1)), rank_text, fill=WHITE, font=rf)
+    paint_spec(SUMMARY_GRID_SPEC, ps, cx, cy, cw)
 
     # ── Share Modal Overlay ──
     # Semi-transparent overlay
-    overlay = Image.new('RGBA', ps.img.size, (0, 0, 0, 0))
-    od = ImageDraw.Draw(overlay)
-    od.rectangle((0, 0, ps.w, ps.h), fill=(0, 0, 0, 128))
-    ps.img = Image.alpha_composite(ps.img, overlay)
-    d = ImageDraw.Draw(ps.img)
-    ps.draw = d
+    ps.draw_overlay((0, 0, 0, 128))
+    d = ps.draw
 
     # Modal
     modal_w = ps.w - 2 * s(24)
@@ -1048,14 +2296,8 @@ def generate_promo_share(output_path, config=IPHONE):
     my = (ps.h - modal_h) // 2
 
     # Modal shadow
-    mshadow = Image.new('RGBA', ps.img.size, (0, 0, 0, 0))
-    msd = ImageDraw.Draw(mshadow)
-    msd.rounded_rectangle((mx + 4, my + 4, mx + modal_w + 4, my + modal_h + 4),
-                           radius=s(16), fill=(0, 0, 0, 60))
-    mshadow = mshadow.filter(ImageFilter.GaussianBlur(12))
-    ps.img = Image.alpha_composite(ps.img, mshadow)
-    d = ImageDraw.Draw(ps.img)
-    ps.draw = d
+    ps.draw_shadow(mx, my, modal_w, modal_h, s(16), (4, 4), 12, (0, 0, 0, 60))
+    d = ps.draw
 
     rrect(d, (mx, my, mx + modal_w, my + modal_h), s(16), fill=WHITE)
 
@@ -1101,42 +2343,1717 @@ def generate_promo_share(output_path, config=IPHONE):
     rrect(d, (code_x, btn_y, code_x + btn_w, btn_y + btn_h), s(8), fill=(240, 240, 240))
     draw_centered_text(d, "閉じる", code_x + btn_w // 2, btn_y + s(10), bbf, LIGHT_TEXT)
 
-    phone_img = ps.get_image()
-    promo = create_promo_frame(phone_img, "ゲームの共有", "共有コードで友達にかんたん送信", config)
-    promo.save(output_path, 'PNG')
+
+def generate_promo_share(output_path, config=IPHONE):
+    """Read-only game view with share modal."""
+    save_promo('share', output_path, config)
+
+
+# ── Promo registry ──
+
+# name -> (file name, screen body, title, subtitle)
+PROMOS = {
+    'setup': ('promo_1_setup.png', _draw_promo_setup,
+              "麻雀対戦スコア管理", "３麻４麻両対応！"),
+    'score': ('promo_2_score.png', _draw_promo_score,
+              "ポイント入力", "直感的なUIでかんたん入力"),
+    'chip': ('promo_3_chip.png', _draw_promo_chip,
+             "チップ移動", "チップ枚数もまとめて管理"),
+    'summary': ('promo_4_summary.png', _draw_promo_summary,
+                "総合スコア & 履歴", "ランキングと全記録を一目で確認"),
+    'past_games': ('promo_5_past_games.png', _draw_promo_past_games,
+                   "過去のゲーム一覧", "いつでも振り返り・削除が可能"),
+    'share': ('promo_6_share.png', _draw_promo_share,
+              "ゲームの共有", "共有コードで友達にかんたん送信"),
+}
+
+
+def record_promo_screen(name, config=IPHONE):
+    """Run the layout code for promo `name` once and return its DisplayList."""
+    ps = PhoneScreen(config, record=True)
+    PROMOS[name][1](ps)
+    return ps.display_list
+
+
+def render_promo(name, config=IPHONE, screen=None):
+    """Render promo `name` framed for `config`; `screen` skips drawing the app screen."""
+    _, draw_screen, title, subtitle = PROMOS[name]
+    if screen is None:
+        ps = PhoneScreen(config)
+        draw_screen(ps)
+        screen = ps.get_image()
+    return create_promo_frame(screen, title, subtitle, config)
+
+
+def render_promo_variants(name, config, targets):
+    """Render promo `name` for several devices from one recording at `config`.
+
+    Each target must share the recorded screen's aspect ratio; its screen is
+    replayed at ``target.screen_w / config.screen_w``. Yields (target, image).
+    """
+    display_list = record_promo_screen(name, config).batched()
+    for target in targets:
+        scale = target.screen_w / config.screen_w
+        if round(config.screen_h * scale) != target.screen_h:
+            raise ValueError(f"{target.screen_w}x{target.screen_h} does not match the "
+                             f"{config.screen_w}x{config.screen_h} aspect ratio")
+        yield target, render_promo(name, target, display_list.replay(scale))
+
+
+def save_promo(name, output_path, config=IPHONE):
+    save_rendered(output_path, 'promo', (name,), lambda: render_promo(name, config), config)
     print(f"Generated: {output_path}")
 
 
+# ── Animated promos ──
+
+def _ease_out(t):
+    return 1 - (1 - t) ** 3
+
+
+def _ticking(values, frames):
+    """Per frame, `values` (name, target) counted up from 0 with an ease-out."""
+    for f in range(1, frames + 1):
+        t = _ease_out(f / frames)
+        yield [(name, round(target * t)) for name, target in values]
+
+
+def _drumroll_animation(title, values, button_text, frames):
+    for vals in _ticking(values, frames):
+        spec = _drumroll_screen_spec(title, vals, button_text)
+        yield lambda ps, spec=spec: paint_spec(spec, ps)
+
+
+# Hanchan points behind the summary promo: the two history rows, then the
+# third hanchan that brings the totals to SUMMARY_GRID_SPEC's cards
+SUMMARY_HANCHAN = [(12, -8, 20, -24), (43, -30, -20, 7), (32, 61, -42, -51)]
+
+
+def _summary_animation(frames):
+    """Totals counting up hanchan by hanchan, so the ranks reorder on the way."""
+    names = [card.name for card in SUMMARY_GRID_SPEC.children]
+    totals = np.zeros(len(names), dtype=np.int64)
+    steps = []
+    for i, points in enumerate(SUMMARY_HANCHAN):
+        n = frames * (i + 1) // len(SUMMARY_HANCHAN) - frames * i // len(SUMMARY_HANCHAN)
+        steps.extend((totals + np.rint(np.asarray(points) * _ease_out(f / n))).astype(int).tolist()
+                     for f in range(1, n + 1))
+        totals = totals + points
+    for values in steps:
+        vals = list(zip(names, values))
+        ranks = competition_ranks(np.zeros(len(values), dtype=np.int64), np.asarray(values)).tolist()
+        grid = SUMMARY_GRID_SPEC.replace(children=tuple(
+            SummaryCard(n, f"{v:+d}" if v else "0", r, RANK_COLORS.get(r, RANK_GRAY))
+            for (n, v), r in zip(vals, ranks)))
+        yield lambda ps, grid=grid: _draw_promo_summary(ps, grid)
+
+
+# name -> frames -> screen draw functions, one per frame; the last matches the still promo
+PROMO_ANIMATIONS = {
+    'score': lambda frames: _drumroll_animation(*PROMO_SCORE_INPUT, frames),
+    'chip': lambda frames: _drumroll_animation(*PROMO_CHIP_INPUT, frames),
+    'summary': _summary_animation,
+}
+
+
+def _dirty_boxes(old_ops, new_ops, size, margin=2):
+    """Boxes (screen pixels) covering every op that differs between two recordings."""
+    if old_ops is None:
+        return [(0, 0) + size]
+    boxes = []
+    n = min(len(old_ops), len(new_ops))
+    changed = [i for i in range(n) if old_ops[i] != new_ops[i]]
+    tail = list(old_ops[n:]) + list(new_ops[n:])
+    for op in [old_ops[i] for i in changed] + [new_ops[i] for i in changed] + tail:
+        x0, y0, x1, y1 = op[1]
+        boxes.append((max(0, math.floor(x0) - margin), max(0, math.floor(y0) - margin),
+                      min(size[0], math.ceil(x1) + margin), min(size[1], math.ceil(y1) + margin)))
+    # Merge overlapping boxes so shared pixels are redrawn once
+    merged = []
+    for b in sorted(boxes):
+        for i, m in enumerate(merged):
+            if _boxes_touch(b, m):
+                merged[i] = (min(b[0], m[0]), min(b[1], m[1]), max(b[2], m[2]), max(b[3], m[3]))
+                break
+        else:
+            merged.append(b)
+    return merged
+
+
+def animate_promo(name, config=IPHONE, frames=30, frame_ms=33, hold_ms=1500):
+    """Yield ``(frame, boxes, duration_ms)`` for an animated version of promo `name`.
+
+    The backdrop is rendered once. Each frame's screen is recorded as a
+    DisplayList (cheap: nothing is rasterized), diffed against the previous
+    one, and only the changed boxes are replayed, rescaled and composited
+    into the frame, which is updated in place. `boxes` are the frame-pixel
+    boxes that changed (the whole frame first); consecutive frames that look
+    the same are merged into one longer frame. The last frame holds for
+    `hold_ms` extra and matches the still promo.
+    """
+    _, _, title, subtitle = PROMOS[name]
+    layout = promo_frame_layout(config, title, subtitle)
+    backdrop = promo_backdrop(title, subtitle, config)
+    k_x = layout['phone_w'] / config.screen_w
+    k_y = layout['phone_h'] / config.screen_h
+
+    def record(draw_screen):
+        ps = PhoneScreen(config, record=True)
+        draw_screen(ps)
+        return ps.display_list
+
+    screen = frame = None
+    shown = None
+
+    def advance(display_list):
+        nonlocal screen, frame, shown
+        boxes = _dirty_boxes(shown.ops if shown else None, display_list.ops, display_list.size)
+        shown = display_list
+        if screen is None:
+            screen = display_list.replay()
+            frame = composite_screen(backdrop, screen, layout)
+            return [(0, 0) + frame.size]
+        out = []
+        for b in boxes:
+            screen.paste(display_list.replay(clip=b), b[:2])
+            # LANCZOS spreads a source pixel over ~3 output pixels either side
+            region = (max(0, math.floor(b[0] * k_x) - 4), max(0, math.floor(b[1] * k_y) - 4),
+                      min(layout['phone_w'], math.ceil(b[2] * k_x) + 4),
+                      min(layout['phone_h'], math.ceil(b[3] * k_y) + 4))
+            fx, fy = layout['screen_x'] + region[0], layout['screen_y'] + region[1]
+            frame.paste(composite_screen(backdrop, screen, layout, region), (fx, fy))
+            out.append((fx, fy, fx + region[2] - region[0], fy + region[3] - region[1]))
+        return out
+
+    pending = None
+    for draw_screen in PROMO_ANIMATIONS[name](frames):
+        display_list = record(draw_screen)
+        if pending is not None and pending[0].ops == display_list.ops:
+            pending[1] += frame_ms
+            continue
+        if pending is not None:
+            boxes = advance(pending[0])
+            yield frame, boxes, pending[1]
+        pending = [display_list, frame_ms]
+    boxes = advance(pending[0])
+    yield frame, boxes, pending[1] + hold_ms
+
+
+def save_animated_promo(name, output_path, config=IPHONE, frames=30, fps=30, hold_ms=1500):
+    """Stream an animated promo to `output_path`.
+
+    The extension picks the format (.png/.apng, .gif, .webp); a ``%d``-style
+    pattern in the file name writes a numbered PNG sequence instead.
+    """
+    frame_ms = round(1000 / fps)
+    size = (config.promo_w, config.promo_h)
+    if '%' in os.path.basename(output_path):
+        fp, writer = None, PngSequenceWriter(output_path, fps)
+    else:
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext not in ANIMATION_WRITERS:
+            raise ValueError(f"no animation writer for {ext!r} (use {', '.join(ANIMATION_WRITERS)})")
+        fp = open(output_path, 'wb')
+        writer = ANIMATION_WRITERS[ext](fp, size)
+    try:
+        for frame, boxes, duration in animate_promo(name, config, frames, frame_ms, hold_ms):
+            writer.add(frame, boxes, duration)
+        writer.close()
+    finally:
+        if fp is not None:
+            fp.close()
+    print(f"Generated: {output_path} ({writer.frames} frames)")
+
+
+def generate_animated_promos(output_dir, names, ext='png'):
+    """Write the animated promos `names` to ``output_dir/<device>/<promo stem>.<ext>``."""
+    for device, config in (('iphone', IPHONE), ('ipad', IPAD)):
+        out_dir = os.path.join(output_dir, device)
+        for name in names:
+            os.makedirs(out_dir, exist_ok=True)
+            stem = os.path.splitext(PROMOS[name][0])[0]
+            save_animated_promo(name, os.path.join(out_dir, f"{stem}.{ext}"), config)
+
+
+# ══════════════════════════════════════════════
+# History sheet
+# ══════════════════════════════════════════════
+
+HISTORY_ROW_BG = (248, 249, 250)   # #f8f9fa
+CHIP_ROW_BG = (255, 243, 205)      # #fff3cd
+CHIP_ROW_BORDER = (255, 193, 7)    # #ffc107
+CHIP_ROW_TEXT = (133, 100, 4)      # #856404
+
+
+def history_records(score_rows, chip_rows=()):
+    """Group rows of the app's ``scores`` and ``chips`` tables into history records.
+
+    ``score_rows`` are (hanchan, player_name, point, rank, timestamp,
+    formatted_time) and ``chip_rows`` (hanchan, player_name, chip_point,
+    timestamp, formatted_time), both newest first as the app queries them.
+    Like HistoryTable.tsx, scores group by hanchan and chips by timestamp;
+    the two streams are merged lazily, newest first, yielding
+    ``('score', hanchan, time, [(name, point, rank), ...])`` and
+    ``('chip', hanchan, time, [(name, chip_point), ...])``.
+    """
+    def scores():
+        for (hanchan, ts), rows in itertools.groupby(score_rows, key=lambda r: (r[0], r[4])):
+            rows = list(rows)
+            yield -ts, ('score', hanchan, rows[0][5], [(r[1], r[2], r[3]) for r in rows])
+
+    def chips():
+        for ts, rows in itertools.groupby(chip_rows, key=lambda r: r[3]):
+            rows = list(rows)
+            yield -ts, ('chip', rows[0][0], rows[0][4], [(r[1], r[2]) for r in rows])
+
+    for _, record in heapq.merge(scores(), chips(), key=lambda item: item[0]):
+        yield record
+
+
+def history_from_db(db_path, game_id):
+    """(players, records) for one game of an app database backup.
+
+    Rows are streamed from the cursors, so long games are never loaded whole.
+    The backup is opened read-only and closed once the records run out.
+    """
+    con = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        players = [r[0] for r in con.execute(
+            'SELECT player_name FROM game_players WHERE game_id = ? ORDER BY sort_order', (game_id,))]
+    except BaseException:
+        con.close()
+        raise
+
+    def records():
+        try:
+            score_rows = con.execute(
+                'SELECT hanchan, player_name, point, rank, timestamp, formatted_time FROM scores '
+                'WHERE game_id = ? ORDER BY timestamp DESC, hanchan DESC', (game_id,))
+            chip_rows = con.execute(
+                'SELECT hanchan, player_name, chip_point, timestamp, formatted_time FROM chips '
+                'WHERE game_id = ? ORDER BY timestamp DESC', (game_id,))
+            yield from history_records(score_rows, chip_rows)
+        finally:
+            con.close()
+
+    return players, records()
+
+
+class HistorySheet:
+    """The 記録履歴 card for a game of any length, rendered row by row.
+
+    Every record becomes a fixed-height tile: a copy of a cached row template
+    (row background, player names) with its label, time, rank badges and
+    values drawn on top. tiles() yields them one at a time, write_png()
+    streams them into a single tall image and pages() cuts them into page
+    images, so memory holds a page at most and time grows with the row count.
+    """
+
+    def __init__(self, players, config=IPHONE):
+        if len(players) not in (3, 4):
+            raise ValueError(f"history sheet needs 3 or 4 players, got {len(players)}")
+        self.players = list(players)
+        self.config = config
+        self.w = config.screen_w
+        self.base_dp = config.base_dp
+        s = self._s
+        self.inset = s(16)
+        self.row_w = self.w - 2 * self.inset
+        self.row_h = s(80)
+        self.tile_h = self.row_h + s(8)
+        self.cell_w = self.row_w // 4
+        self.fonts = {
+            'title': font(s(16), jp=True), 'hint': font(s(11), jp=True),
+            'name': font(s(11), jp=True), 'value': font(s(13), bold=True),
+            'label': font(s(13), jp=True), 'rank': font(s(10), jp=True),
+            'time': font(s(11), jp=True),
+        }
+        self._measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+    def _s(self, dp):
+        """Scale dp to pixels."""
+        return int(dp * self.w / self.base_dp)
+
+    def _cell_cx(self, ci):
+        return self.inset + ci * self.cell_w + self.cell_w // 2
+
+    def header(self):
+        """Card top: section title and hint line."""
+        s = self._s
+        img = Image.new('RGB', (self.w, s(16) + s(32) + s(18)), WHITE)
+        d = AtlasDraw(img)
+        d.text((self.inset, s(16)), "記録履歴", fill=SECTION_TITLE_COLOR, font=self.fonts['title'])
+        line_y = s(16) + s(24)
+        d.line([(self.inset, line_y), (self.inset + self.row_w, line_y)],
+               fill=SECTION_BORDER, width=max(2, s(2)))
+        d.text((self.inset, line_y + s(8)), "※ 長押しで記録を削除", fill=HINT_TEXT, font=self.fonts['hint'])
+        return img
+
+    def footer(self):
+        """Card bottom padding below the last row's gap."""
+        return Image.new('RGB', (self.w, self._s(8)), WHITE)
+
+    def _template(self, kind):
+        def build():
+            img = Image.new('RGB', (self.w, self.tile_h), WHITE)
+            d = AtlasDraw(img)
+            fill, outline = (HISTORY_ROW_BG, CARD_BORDER) if kind == 'score' else (CHIP_ROW_BG, CHIP_ROW_BORDER)
+            rrect(d, (self.inset, 0, self.inset + self.row_w, self.row_h), self._s(8),
+                  fill=fill, outline=outline, width=1)
+            for ci, name in enumerate(self.players):
+                draw_centered_text(d, name, self._cell_cx(ci), self._s(24), self.fonts['name'], MED_TEXT)
+            return img
+        return intermediate(('history_row', kind, self.w, self.base_dp, tuple(self.players), FONT_JP), build)
+
+    def _badge(self, rank):
+        """Rank badge sprite on the score-row fill, pasted opaque."""
+        def build():
+            text = f"{rank}位"
+            tw, _ = text_size(self._measure, text, self.fonts['rank'])
+            bw = tw + self._s(8)
+            img = Image.new('RGB', (bw + 1, self._s(14) + 1), HISTORY_ROW_BG)
+            d = AtlasDraw(img)
+            rrect(d, (0, 0, bw, self._s(14)), self._s(6), fill=RANK_COLORS.get(rank, RANK_GRAY))
+            d.text((bw // 2 - tw // 2, self._s(1)), text, fill=WHITE, font=self.fonts['rank'])
+            return img
+        return intermediate(('history_badge', rank, self.w, self.base_dp, FONT_JP), build)
+
+    def tile(self, record):
+        """One record as a ``(w, tile_h)`` RGB tile."""
+        s = self._s
+        kind, hanchan, time_text, entries = record
+        img = self._template(kind).copy()
+        d = AtlasDraw(img)
+        x = self.inset
+        if kind == 'score':
+            d.text((x + s(8), s(4)), f"第{hanchan}半荘", fill=DARK_TEXT, font=self.fonts['label'])
+            d.text((x + self.row_w - s(60), s(6)), time_text, fill=GRAY_TEXT, font=self.fonts['time'])
+        else:
+            d.text((x + s(8), s(4)), "チップ", fill=CHIP_ROW_TEXT, font=self.fonts['label'])
+            d.text((x + self.row_w - s(60), s(6)), time_text, fill=CHIP_ROW_TEXT, font=self.fonts['time'])
+        by_name = {e[0]: e[1:] for e in entries}
+        for ci, name in enumerate(self.players):
+            if name not in by_name:
+                continue
+            cx = self._cell_cx(ci)
+            value = by_name[name][0]
+            if kind == 'score':
+                # HistoryTable.tsx draws points in plain text colour, chips signed
+                badge = self._badge(by_name[name][1])
+                img.paste(badge, (cx - (badge.width - 1) // 2, s(40)))
+                vy, fill = s(58), DARK_TEXT
+            else:
+                vy, fill = s(44), GREEN if value > 0 else RED if value < 0 else HINT_TEXT
+            draw_centered_text(d, f"{value:+d}" if value else "0", cx, vy, self.fonts['value'], fill)
+        return img
+
+    def tiles(self, records):
+        for record in records:
+            yield self.tile(record)
+
+    def height(self, rows):
+        """Image height of a sheet with ``rows`` records."""
+        return self.header().height + rows * self.tile_h + self.footer().height
+
+    def write_png(self, fp, records, rows=None):
+        """Stream the whole sheet into one PNG on ``fp`` (a path or binary file).
+
+        Pass ``rows`` when the record count is known up front; otherwise the
+        height is patched in at the end, which needs a seekable file.
+        """
+        if isinstance(fp, (str, os.PathLike)):
+            with open(fp, 'wb') as f:
+                return self.write_png(f, records, rows)
+        height = None if rows is None else self.height(rows)
+        png = PngStream(fp, self.w, height=height)
+        png.write(self.header())
+        for tile in self.tiles(records):
+            png.write(tile)
+        png.write(self.footer())
+        png.close()
+        return png.rows
+
+    def pages(self, records, rows_per_page=20):
+        """Yield one page image (header, up to ``rows_per_page`` rows, footer) at a time."""
+        header, footer = self.header(), self.footer()
+        it = iter(records)
+        while True:
+            chunk = list(itertools.islice(it, rows_per_page))
+            if not chunk:
+                return
+            page = Image.new('RGB', (self.w, header.height + len(chunk) * self.tile_h + footer.height), WHITE)
+            page.paste(header, (0, 0))
+            y = header.height
+            for record in chunk:
+                page.paste(self.tile(record), (0, y))
+                y += self.tile_h
+            page.paste(footer, (0, y))
+            yield page
+
+
+def generate_history_sheet(output_path, players, records, config=IPHONE, rows_per_page=None):
+    """Write a history sheet as one tall PNG, or as numbered pages.
+
+    With ``rows_per_page`` the pages go to ``<stem>_p1.png``, ``<stem>_p2.png``, ...
+    """
+    sheet = HistorySheet(players, config)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    if rows_per_page is None:
+        sheet.write_png(output_path, records)
+        print(f"Generated: {output_path}")
+        return
+    stem, ext = os.path.splitext(output_path)
+    for i, page in enumerate(sheet.pages(records, rows_per_page), 1):
+        path = f"{stem}_p{i}{ext}"
+        page.save(path, 'PNG')
+        print(f"Generated: {path}")
+
+
+# ──────────────────────────────────────────────
+# League leaderboard
+# ──────────────────────────────────────────────
+
+class LeaderboardSheet:
+    """Season standings (see leaderboard.py) as pages of SummaryCards-style rows.
+
+    Each player is a card like draw_summary_card(): a rank accent and badge,
+    the name, the season total and a line with average rank, top rate,
+    chips and hanchan played. Players come in ``stats['order']``; badges
+    show ``stats['place']``, so equal totals share a place and its colour.
+    """
+
+    TITLE = "シーズン順位"
+
+    def __init__(self, players, stats, subtitle=None, config=IPHONE):
+        self.players = list(players)
+        self.stats = stats
+        self.subtitle = subtitle
+        self.w = config.screen_w
+        self.base_dp = config.base_dp
+        s = self._s
+        self.inset = s(16)
+        self.row_w = self.w - 2 * self.inset
+        self.row_h = s(72)
+        self.tile_h = self.row_h + s(8)
+        self.fonts = {
+            'title': font(s(16), jp=True), 'hint': font(s(11), jp=True),
+            'total': font(s(20), bold=True), 'rank': font(s(10), jp=True),
+        }
+        self._measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+    def _s(self, dp):
+        """Scale dp to pixels."""
+        return int(dp * self.w / self.base_dp)
+
+    @staticmethod
+    def badge_text(place):
+        return f"{place}位"
+
+    @staticmethod
+    def total_text(total):
+        return f"{total:+d}" if total else "0"
+
+    @staticmethod
+    def stats_line(stats, i):
+        """Second line of player `i`'s card: average rank, top rate, chips and hanchan."""
+        return (f"平均順位 {stats['average_rank'][i]:.2f}   トップ率 {stats['top_rate'][i]:.0%}   "
+                f"チップ {int(stats['chips'][i]):+d}   {int(stats['hanchan'][i])}半荘")
+
+    @classmethod
+    def texts(cls, players, stats, subtitle=None):
+        """Yield every string a sheet of these standings draws."""
+        yield cls.TITLE
+        if subtitle:
+            yield subtitle
+        for i, name in enumerate(players):
+            yield name
+            yield cls.badge_text(int(stats['place'][i]))
+            yield cls.total_text(int(stats['total'][i]))
+            yield cls.stats_line(stats, i)
+
+    def header(self):
+        """Card top: section title and the season line."""
+        s = self._s
+        img = Image.new('RGB', (self.w, s(16) + s(32) + s(18)), WHITE)
+        d = AtlasDraw(img)
+        d.text((self.inset, s(16)), self.TITLE, fill=SECTION_TITLE_COLOR, font=self.fonts['title'])
+        line_y = s(16) + s(24)
+        d.line([(self.inset, line_y), (self.inset + self.row_w, line_y)],
+               fill=SECTION_BORDER, width=max(2, s(2)))
+        if self.subtitle:
+            d.text((self.inset, line_y + s(8)), self.subtitle, fill=HINT_TEXT, font=self.fonts['hint'])
+        return img
+
+    def footer(self):
+        return Image.new('RGB', (self.w, self._s(8)), WHITE)
+
+    def _badge(self, place):
+        def build():
+            text = self.badge_text(place)
+            tw, _ = text_size(self._measure, text, self.fonts['rank'])
+            bw = max(tw + self._s(10), self._s(30))
+            img = Image.new('RGB', (bw + 1, self._s(16) + 1), HISTORY_ROW_BG)
+            d = AtlasDraw(img)
+            rrect(d, (0, 0, bw, self._s(16)), self._s(8), fill=RANK_COLORS.get(place, RANK_GRAY))
+            d.text((bw // 2 - tw // 2, self._s(2)), text, fill=WHITE, font=self.fonts['rank'])
+            return img
+        return intermediate(('leaderboard_badge', place, self.w, self.base_dp, FONT_JP), build)
+
+    def tile(self, i):
+        """Player `i` as a ``(w, tile_h)`` RGB tile."""
+        s = self._s
+        st = self.stats
+        place = int(st['place'][i])
+        img = Image.new('RGB', (self.w, self.tile_h), WHITE)
+        d = AtlasDraw(img)
+        x, right = self.inset, self.inset + self.row_w
+        rrect(d, (x, 0, right, self.row_h), s(8), fill=HISTORY_ROW_BG, outline=CARD_BORDER, width=2)
+        d.rectangle((x + 1, s(6), x + s(4), self.row_h - s(6)), fill=RANK_COLORS.get(place, RANK_GRAY))
+
+        badge = self._badge(place)
+        img.paste(badge, (x + s(12), s(10)))
+
+        total = int(st['total'][i])
+        total_text = self.total_text(total)
+        tw, _ = text_size(d, total_text, self.fonts['total'])
+        d.text((right - s(12) - tw, s(8)), total_text, font=self.fonts['total'],
+               fill=GREEN if total > 0 else RED if total < 0 else HINT_TEXT)
+
+        name_x = x + s(12) + badge.width + s(8)
+        nf, _ = fit_text(self.players[i], right - s(24) - tw - name_x, s(22), s(14), jp=True)
+        d.text((name_x, s(10)), self.players[i], fill=DARK_TEXT, font=nf)
+
+        line = self.stats_line(st, i)
+        lf, _ = fit_text(line, self.row_w - s(24), s(16), s(11), jp=True)
+        d.text((x + s(12), s(44)), line, fill=GRAY_TEXT, font=lf)
+        return img
+
+    def pages(self, rows_per_page=10):
+        """Yield one page image (header, up to ``rows_per_page`` players, footer) at a time."""
+        header, footer = self.header(), self.footer()
+        order = [int(i) for i in self.stats['order']]
+        for start in range(0, len(order), rows_per_page):
+            chunk = order[start:start + rows_per_page]
+            page = Image.new('RGB', (self.w, header.height + len(chunk) * self.tile_h + footer.height), WHITE)
+            page.paste(header, (0, 0))
+            y = header.height
+            for i in chunk:
+                page.paste(self.tile(i), (0, y))
+                y += self.tile_h
+            page.paste(footer, (0, y))
+            yield page
+
+
+def season_subtitle(season):
+    """Leaderboard header line of a leaderboard.Season: game count and date range."""
+    if not season.dates:
+        return "0ゲーム"
+    return f"{season.n_games}ゲーム・{min(season.dates)}〜{max(season.dates)}"
+
+
+def generate_leaderboard(output_path, season, rows_per_page=10, config=IPHONE):
+    """Write the standings of a leaderboard.Season to ``<stem>_p1.png``, ``<stem>_p2.png``, ..."""
+    import leaderboard
+
+    sheet = LeaderboardSheet(season.players, leaderboard.standings(season), season_subtitle(season), config)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    stem, ext = os.path.splitext(output_path)
+    for i, page in enumerate(sheet.pages(rows_per_page), 1):
+        path = f"{stem}_p{i}{ext}"
+        page.save(path, 'PNG')
+        print(f"Generated: {path}")
+
+
+# ══════════════════════════════════════════════
+# Font subsets
+# ══════════════════════════════════════════════
+
+# Drawn by every font somewhere: digits, signs and times in the promos and
+# the history sheet, "SCORE" on the icon sheet, and the icon tile's 中
+BASE_FONT_CHARS = ''.join(chr(c) for c in range(0x20, 0x7f)) + "中"
+HISTORY_CAPTIONS = ("記録履歴", "※ 長押しで記録を削除", "第半荘", "チップ", "位")
+
+
+def promo_font_chars(configs=(IPHONE, IPAD)):
+    """{system font path: characters} drawn by the promos on `configs`."""
+    chars = {path: set(BASE_FONT_CHARS) for path in (FONT_BOLD, FONT_REGULAR, FONT_JP, FONT_MONO)}
+    for _, _, title, subtitle in PROMOS.values():
+        chars[FONT_JP].update(title + subtitle)
+    for config in configs:
+        for name in PROMOS:
+            for op in record_promo_screen(name, config).ops:
+                if op[0] == 'text':
+                    _, bold, jp, mono = op[4]
+                    chars[font_path(bold, jp, mono)].update(op[3])
+    return chars
+
+
+def history_font_chars(db_path, game_id):
+    """{system font path: characters} of the history sheet of one game in an app database backup."""
+    with contextlib.closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as con:
+        texts = [r[0] for r in con.execute(
+            'SELECT player_name FROM game_players WHERE game_id = ?', (game_id,))]
+        texts += [r[0] for r in con.execute(
+            'SELECT DISTINCT formatted_time FROM scores WHERE game_id = ? UNION '
+            'SELECT DISTINCT formatted_time FROM chips WHERE game_id = ?', (game_id, game_id))]
+    jp = set(BASE_FONT_CHARS).union(*HISTORY_CAPTIONS, *texts)
+    return {FONT_JP: jp, FONT_BOLD: set(BASE_FONT_CHARS)}
+
+
+def leaderboard_font_chars(season):
+    """{system font path: characters} of the leaderboard of a leaderboard.Season."""
+    import leaderboard
+
+    texts = LeaderboardSheet.texts(season.players, leaderboard.standings(season), season_subtitle(season))
+    jp = set(BASE_FONT_CHARS).union(*texts)
+    return {FONT_JP: jp, FONT_BOLD: set(BASE_FONT_CHARS)}
+
+
+def subset_font(path, chars, cache_dir):
+    """Path of `path` cut down to `chars`, built once per character set in `cache_dir`.
+
+    Outlines, hinting and the legacy kern table Pillow's basic layout reads
+    are kept, so the subset draws those characters exactly like the full
+    font. Needs fontTools.
+    """
+    from fontTools import subset
+
+    digest = hashlib.sha1(''.join(sorted(chars)).encode('utf-8')).hexdigest()[:16]
+    stem, ext = os.path.splitext(os.path.basename(path))
+    out = os.path.join(cache_dir, f"{stem}-{digest}{ext}")
+    if os.path.exists(out):
+        return out
+    os.makedirs(cache_dir, exist_ok=True)
+    options = subset.Options()
+    options.layout_features = ['*']
+    options.legacy_kern = True
+    options.notdef_outline = True
+    options.name_IDs = ['*']
+    subsetter = subset.Subsetter(options)
+    ft = subset.load_font(path, options)
+    subsetter.populate(unicodes=[ord(c) for c in chars])
+    subsetter.subset(ft)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    subset.save_font(ft, tmp, options)
+    os.replace(tmp, out)
+    return out
+
+
+def subset_fonts(chars, cache_dir):
+    """Subset every font in `chars` ({system font path: characters}); returns use_font_files() input."""
+    return {path: subset_font(path, cs, cache_dir) for path, cs in chars.items()}
+
+
+# ══════════════════════════════════════════════
+# Theme variants
+# ══════════════════════════════════════════════
+
+# Colour roles a theme can remap: role name -> base colour. Constants that
+# share a colour (SECTION_TITLE_COLOR is BG_DARK, CARD_BG is WHITE, ...)
+# share a role; the first name listed for a colour is the one themes use.
+THEME_ROLES = {
+    'BG_DARK': BG_DARK, 'BG_MED': BG_MED, 'WHITE': WHITE, 'BLACK': (0, 0, 0),
+    'CARD_BORDER': CARD_BORDER, 'GREEN': GREEN, 'RED': RED, 'YELLOW': YELLOW,
+    'GRAY_TEXT': GRAY_TEXT, 'DARK_TEXT': DARK_TEXT, 'MED_TEXT': MED_TEXT,
+    'LIGHT_TEXT': LIGHT_TEXT, 'HINT_TEXT': HINT_TEXT, 'INPUT_BORDER': INPUT_BORDER,
+    'SCORE_BOX_BG': SCORE_BOX_BG, 'SCORE_BOX_BORDER': SCORE_BOX_BORDER,
+    'DRUMROLL_BTN_BG': DRUMROLL_BTN_BG, 'DRUMROLL_BTN_BORDER': DRUMROLL_BTN_BORDER,
+    'DRUMROLL_BTN_TEXT': DRUMROLL_BTN_TEXT, 'SUSPENDED_BG': SUSPENDED_BG,
+    'SUSPENDED_BORDER': SUSPENDED_BORDER, 'GOLD': GOLD, 'SILVER': SILVER, 'BRONZE': BRONZE,
+    'RANK_GRAY': RANK_GRAY, 'TEAL': TEAL, 'CODE_BG': CODE_BG,
+    'GRID_BLUE': GRID_BLUE, 'GRID_LIGHT': GRID_LIGHT, 'TILE_BG': TILE_BG,
+    'SCORE_TEXT_COLOR': SCORE_TEXT_COLOR,
+    'SUMMARY_BG': (248, 249, 250), 'BUTTON_LIGHT': (240, 240, 240),
+    'PROMO_TOP': (10, 20, 55), 'PROMO_BOTTOM': (50, 95, 165), 'SUBTITLE': (255, 225, 130),
+    'DEVICE_BODY': (20, 20, 25), 'DEVICE_EDGE': (60, 60, 65), 'SHEET_EDGE': (180, 190, 210),
+    'TILE_FACE': (230, 230, 230), 'TILE_EDGE': (180, 180, 185), 'TILE_RED': (190, 30, 30),
+}
+
+THEMES = {
+    'dark': {
+        'BG_DARK': (17, 19, 28), 'BG_MED': (44, 52, 76),
+        'PROMO_TOP': (4, 5, 10), 'PROMO_BOTTOM': (32, 38, 58),
+        'SUBTITLE': (255, 204, 102), 'DEVICE_EDGE': (90, 90, 98),
+    },
+    'sakura': {
+        'BG_DARK': (142, 52, 92), 'BG_MED': (214, 112, 146),
+        'PROMO_TOP': (88, 24, 58), 'PROMO_BOTTOM': (226, 150, 178),
+        'SUBTITLE': (255, 236, 244), 'GRID_BLUE': (176, 70, 110), 'GRID_LIGHT': (250, 228, 236),
+        'SCORE_TEXT_COLOR': (120, 30, 70),
+    },
+}
+
+
+class ThemedRender:
+    """An image tagged with colour roles once, then re-coloured per theme.
+
+    Every distinct colour is decomposed as ``u * a + v * b + (1 - u - v) * k``:
+    a blend of two role colours (gradients, anti-aliased edges) darkened
+    towards the shadow role ``k`` (BLACK; card shadows, modal overlay). What
+    the model does not explain is kept as a residual. apply() moves each
+    colour by how its blend changes under the theme and maps it back through
+    the per-pixel index, so a theme costs one table lookup over the image.
+    """
+
+    def __init__(self, img, roles=THEME_ROLES, shadow_role='BLACK'):
+        names = {}
+        for name, color in roles.items():
+            names.setdefault(tuple(color), []).append(name)
+        self.colors = list(names)
+        self.role_names = list(names.values())
+        self.k = next(i for i, n in enumerate(self.role_names) if shadow_role in n)
+        self.size = img.size
+        self.mode = img.mode
+        rgba = np.asarray(img.convert('RGBA'))
+        self.alpha = rgba[..., 3].copy()
+        packed = (rgba[..., 0].astype(np.uint32) << 16) | (rgba[..., 1].astype(np.uint32) << 8) | rgba[..., 2]
+        # Distinct colours through a 24-bit lookup table (much faster than np.unique)
+        flat = packed.ravel()
+        seen = np.zeros(1 << 24, dtype=bool)
+        seen[flat] = True
+        uniq = np.flatnonzero(seen).astype(np.uint32)
+        lut = np.zeros(1 << 24, dtype=np.int32)
+        lut[uniq] = np.arange(len(uniq), dtype=np.int32)
+        self.inverse = lut[flat]
+        counts = np.bincount(self.inverse, minlength=len(uniq))
+        self.unique = np.stack([(uniq >> 16) & 255, (uniq >> 8) & 255, uniq & 255], axis=1).astype(np.float32)
+        # Only roles drawn somewhere in the image can take part in a blend
+        palette = np.array(self.colors, dtype=np.float32)
+        nearest = np.full(len(palette), np.inf, dtype=np.float32)
+        for c0 in range(0, len(self.unique), 4096):
+            d = ((self.unique[c0:c0 + 4096, None, :] - palette[None]) ** 2).sum(2)
+            nearest = np.minimum(nearest, d.min(0))
+        present = np.flatnonzero((nearest <= 12) | (np.arange(len(palette)) == self.k))
+        a, b, self.u, self.v = self._decompose(
+            self.unique, counts, palette[present], int(np.flatnonzero(present == self.k)[0]))
+        self.a, self.b = present[a], present[b]
+
+    @staticmethod
+    def _decompose(pixels, counts, palette, k, tol=3.0, chunk=512):
+        """Best (a, b, u, v) per colour over the role pairs, preferring well-supported pairs."""
+        ia, ib = np.triu_indices(len(palette))
+        A = palette[ia] - palette[k]
+        B = palette[ib] - palette[k]
+        aa = (A * A).sum(1)
+        bb = (B * B).sum(1)
+        ab = (A * B).sum(1)
+        det = aa * bb - ab * ab
+        ee = np.maximum(aa - 2 * ab + bb, 1e-6)
+
+        def fits(c0):
+            P = pixels[c0:c0 + chunk] - palette[k]
+            pp = (P * P).sum(1)[:, None]
+            pa = P @ A.T
+            pb = P @ B.T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                u = (pa * bb - pb * ab) / det
+                v = (pb * aa - pa * ab) / det
+            inside = (det > 1e-3) & (u >= 0) & (v >= 0) & (u + v <= 1)
+            t = np.clip((pa - pb - ab + bb) / ee, 0, 1)
+            ka = np.clip(pa / np.maximum(aa, 1e-6), 0, 1)
+            kb = np.clip(pb / np.maximum(bb, 1e-6), 0, 1)
+            zero = np.zeros_like(pa)
+            # Candidates in order of preference: edge a-b, edges k-a / k-b, interior
+            cands = [(t, 1 - t, 0, None), (ka, zero, 1, None), (zero, kb, 1, None),
+                     (np.where(inside, u, 0), np.where(inside, v, 0), 2, ~inside)]
+            best = None
+            for cu, cv, shape, invalid in cands:
+                resid = pp - 2 * cu * pa - 2 * cv * pb + cu * cu * aa + 2 * cu * cv * ab + cv * cv * bb
+                if invalid is not None:
+                    resid = np.where(invalid, np.inf, resid)
+                rank = np.where(resid <= tol, shape, 3)
+                if best is None:
+                    best = [rank, resid, cu, cv]
+                    continue
+                better = (rank < best[0]) | ((rank == best[0]) & (resid < best[1]))
+                for slot, val in enumerate((rank, resid, cu, cv)):
+                    best[slot] = np.where(better, val, best[slot])
+            return best
+
+        # A fit within tol ranks by shape (a-b blend, then towards k, then
+        # interior); each pair is credited with the pixels it fits most simply,
+        # and a colour takes the best-credited pair it fits, so a gradient and
+        # the shadow across it share the gradient's two roles
+        n = len(pixels)
+        chunks = [fits(c0) for c0 in range(0, n, chunk)]
+        support = np.zeros(len(ia), np.float64)
+        for c0, (rank, _, _, _) in zip(range(0, n, chunk), chunks):
+            simplest = (rank == rank.min(axis=1, keepdims=True)) & (rank < 3)
+            support += (simplest * counts[c0:c0 + chunk, None]).sum(0)
+        out = [np.empty(n, np.int32), np.empty(n, np.int32), np.empty(n, np.float32), np.empty(n, np.float32)]
+        for c0, (rank, resid, u, v) in zip(range(0, n, chunk), chunks):
+            # A role colour is itself; otherwise the most supported pair that
+            # fits wins, whatever its shape; failing that, smallest residual
+            exact = (resid <= 0.5) & ((np.abs(u - 1) < 1e-6) | (np.abs(v - 1) < 1e-6))
+            score = np.where(rank < 3, -support, resid)
+            score = np.where(exact, -np.inf, score)
+            q = score.argmin(axis=1)
+            rows = np.arange(len(q))
+            out[0][c0:c0 + chunk] = ia[q]
+            out[1][c0:c0 + chunk] = ib[q]
+            out[2][c0:c0 + chunk] = u[rows, q]
+            out[3][c0:c0 + chunk] = v[rows, q]
+        return out
+
+    def palette(self, theme):
+        """Role colours under `theme` (a role name -> colour dict)."""
+        out = []
+        for color, names in zip(self.colors, self.role_names):
+            override = next((theme[n] for n in names if n in theme), color)
+            out.append(tuple(override)[:3])
+        return np.array(out, dtype=np.float32)
+
+    def apply(self, theme):
+        delta = self.palette(theme) - np.array(self.colors, dtype=np.float32)
+        u = self.u[:, None]
+        v = self.v[:, None]
+        shift = u * delta[self.a] + v * delta[self.b] + (1 - u - v) * delta[self.k]
+        table = np.clip(self.unique + shift + 0.5, 0, 255).astype(np.uint8)
+        w, h = self.size
+        rgb = table[self.inverse].reshape(h, w, 3)
+        img = Image.fromarray(np.dstack([rgb, self.alpha]), 'RGBA')
+        return img if self.mode == 'RGBA' else img.convert(self.mode)
+
+
+def theme_targets():
+    """(relative path, render function) for every asset that gets themed."""
+    targets = [('icon.png', render_icon), ('adaptive-icon.png', render_adaptive_icon)]
+    for device, config in (('iphone', IPHONE), ('ipad', IPAD)):
+        for name, (filename, _, _, _) in PROMOS.items():
+            targets.append((os.path.join(device, filename), lambda n=name, c=config: render_promo(n, c)))
+    return targets
+
+
+def generate_theme_variants(output_dir, themes, pipeline):
+    """Write every themed asset to ``output_dir/<theme>/...``.
+
+    Each target is rendered and role-tagged once; every theme is then a
+    palette remap of that render.
+    """
+    for rel_path, render in theme_targets():
+        tagged = ThemedRender(render())
+        for theme_name in themes:
+            path = os.path.join(output_dir, theme_name, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pipeline.submit(path, tagged.apply(THEMES[theme_name]))
+
+
 # ══════════════════════════════════════════════
 # Main
 # ══════════════════════════════════════════════
 
-def generate_all_promos(output_dir, config):
-    """Generate all 6 promotional screenshots for a given device config."""
+def encode_png(img):
+    """PNG bytes identical to img.save(path, 'PNG')."""
+    buf = io.BytesIO()
+    img.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+ICO_SIZES = (16, 24, 32, 48, 64, 128, 256)
+
+
+class OutputFormat:
+    """One encoding of a rendered image: a Pillow format and its settings.
+
+    `quality` (0-100) and `effort` (0-9, higher is slower and smaller) are
+    mapped onto each encoder's own options; None keeps Pillow's default.
+    """
+
+    def __init__(self, name, quality=None, effort=None):
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown output format: {name!r} (use {', '.join(OUTPUT_FORMATS)})")
+        if quality is not None and not 0 <= quality <= 100:
+            raise ValueError(f"{name} quality must be 0-100, got {quality}")
+        if effort is not None and not 0 <= effort <= 9:
+            raise ValueError(f"{name} effort must be 0-9, got {effort}")
+        self.name = name
+        self.ext, self.pil_format = OUTPUT_FORMATS[name]
+        self.quality = quality
+        self.effort = effort
+
+    @classmethod
+    def parse(cls, text):
+        """A format from ``name[:q=<quality>][:effort=<effort>]``, e.g. ``webp:q=80:effort=6``."""
+        name, *opts = text.split(':')
+        kwargs = {}
+        for opt in opts:
+            key, _, value = opt.partition('=')
+            key = {'q': 'quality'}.get(key, key)
+            if key not in ('quality', 'effort') or not value.isdigit():
+                raise ValueError(f"bad option {opt!r} for {name} (use q=<0-100>, effort=<0-9>)")
+            kwargs[key] = int(value)
+        return cls(name, **kwargs)
+
+    @property
+    def icon_only(self):
+        """Whether the format is only written for icons (see RenderPipeline)."""
+        return self.name == 'ico'
+
+    @property
+    def key(self):
+        """Identity of the encoding, for cache keys."""
+        return (self.name, self.quality, self.effort)
+
+    def available(self):
+        if self.name == 'png':
+            return True
+        Image.init()  # Image.SAVE is only filled in once the plugins are loaded
+        return self.pil_format in Image.SAVE or (self.pil_format == 'AVIF' and self._load_avif_plugin())
+
+    @staticmethod
+    def _load_avif_plugin():
+        try:
+            import pillow_avif  # noqa: F401  (registers AVIF on Pillow < 11.2)
+        except ImportError:
+            return False
+        return 'AVIF' in Image.SAVE
+
+    def options(self, img):
+        opts = {}
+        if self.name == 'webp':
+            opts['method'] = 4 if self.effort is None else min(6, round(self.effort * 6 / 9))
+            if self.quality is not None:
+                opts['quality'] = self.quality
+        elif self.name == 'avif':
+            if self.effort is not None:
+                opts['speed'] = 10 - min(10, round(self.effort * 10 / 9))
+            if self.quality is not None:
+                opts['quality'] = self.quality
+        elif self.name == 'ico':
+            opts['sizes'] = [(n, n) for n in ICO_SIZES if n <= min(img.size)] or [img.size]
+        elif self.name == 'png' and self.effort is not None:
+            opts['compress_level'] = self.effort
+        return opts
+
+    def encode(self, img):
+        if self.name == 'png' and self.effort is None:
+            return encode_png(img)
+        buf = io.BytesIO()
+        img.save(buf, self.pil_format, **self.options(img))
+        return buf.getvalue()
+
+    def path(self, png_path):
+        """`png_path` with this format's extension."""
+        return os.path.splitext(png_path)[0] + self.ext
+
+
+# name -> (extension, Pillow format)
+OUTPUT_FORMATS = {
+    'png': ('.png', 'PNG'),
+    'webp': ('.webp', 'WEBP'),
+    'avif': ('.avif', 'AVIF'),
+    'ico': ('.ico', 'ICO'),
+}
+PNG_ONLY = (OutputFormat('png'),)
+
+
+class PngStream:
+    """Write a PNG band by band.
+
+    Each band is Sub-filtered and deflated as it arrives, so memory holds one
+    band however tall the image is. With ``height=None`` the header is
+    rewritten with the final row count on close(), which needs a seekable
+    file.
+    """
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    COLOR_TYPES = {'RGB': (2, 3), 'RGBA': (6, 4)}
+
+    def __init__(self, fp, width, mode='RGB', height=None, level=6, idat_size=1 << 16):
+        self.fp = fp
+        self.width = width
+        self.mode = mode
+        self.height = height
+        self.color_type, self.channels = self.COLOR_TYPES[mode]
+        self.rows = 0
+        self._z = zlib.compressobj(level)
+        self._pending = []
+        self._pending_len = 0
+        self._idat_size = idat_size
+        fp.write(self.SIGNATURE)
+        self._ihdr_pos = fp.tell()
+        self._write_ihdr(height or 0)
+
+    def _write_ihdr(self, height):
+        _png_chunk(self.fp, b'IHDR', struct.pack('>IIBBBBB', self.width, height, 8, self.color_type, 0, 0, 0))
+
+    def _emit(self, data, flush=False):
+        if data:
+            self._pending.append(data)
+            self._pending_len += len(data)
+        if self._pending_len >= self._idat_size or (flush and self._pending):
+            _png_chunk(self.fp, b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_len = 0
+
+    def write(self, img):
+        """Append ``img`` (same width) below the rows written so far."""
+        if img.width != self.width:
+            raise ValueError(f"band width {img.width} != {self.width}")
+        band = np.asarray(img.convert(self.mode)).reshape(img.height, -1)
+        out = np.empty((img.height, band.shape[1] + 1), np.uint8)
+        out[:, 0] = 1  # Sub filter: each byte minus the one a pixel to its left
+        out[:, 1:] = band
+        out[:, 1 + self.channels:] -= band[:, :-self.channels]
+        self._emit(self._z.compress(out.tobytes()))
+        self.rows += img.height
+
+    def close(self):
+        if self.height is not None and self.rows != self.height:
+            raise ValueError(f"wrote {self.rows} rows, header says {self.height}")
+        self._emit(self._z.flush(), flush=True)
+        _png_chunk(self.fp, b'IEND', b'')
+        if self.height is None:
+            end = self.fp.tell()
+            self.fp.seek(self._ihdr_pos)
+            self._write_ihdr(self.rows)
+            self.fp.seek(end)
+
+
+def _png_chunk(fp, tag, data):
+    fp.write(struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data)))
+
+
+def _png_image_data(img):
+    """Joined IDAT payloads of `img` encoded by Pillow."""
+    data = encode_png(img)
+    pos = len(PngStream.SIGNATURE)
+    out = []
+    while pos < len(data):
+        length, tag = struct.unpack('>I4s', data[pos:pos + 8])
+        if tag == b'IDAT':
+            out.append(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return b''.join(out)
+
+
+def _union_box(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+class ApngWriter:
+    """Stream frames into an animated PNG.
+
+    After the first, each frame is stored as just the rectangle that changed
+    (the union of its dirty boxes) over the previous one. The frame count is
+    patched into the header on close(), so `fp` must be seekable.
+    """
+
+    def __init__(self, fp, size, loop=0):
+        self.fp = fp
+        self.size = size
+        self.frames = 0
+        self._seq = 0
+        fp.write(PngStream.SIGNATURE)
+        _png_chunk(fp, b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8, 2, 0, 0, 0))
+        self._actl_pos = fp.tell()
+        self._loop = loop
+        _png_chunk(fp, b'acTL', struct.pack('>II', 0, loop))
+
+    def add(self, frame, boxes, duration_ms):
+        box = (0, 0) + self.size if self.frames == 0 else _union_box(boxes)
+        x0, y0, x1, y1 = box
+        _png_chunk(self.fp, b'fcTL', struct.pack('>IIIIIHHBB', self._seq, x1 - x0, y1 - y0, x0, y0,
+                                                 round(duration_ms), 1000, 0, 0))
+        self._seq += 1
+        data = _png_image_data(frame.crop(box).convert('RGB'))
+        if self.frames == 0:
+            _png_chunk(self.fp, b'IDAT', data)
+        else:
+            _png_chunk(self.fp, b'fdAT', struct.pack('>I', self._seq) + data)
+            self._seq += 1
+        self.frames += 1
+
+    def close(self):
+        _png_chunk(self.fp, b'IEND', b'')
+        end = self.fp.tell()
+        self.fp.seek(self._actl_pos)
+        _png_chunk(self.fp, b'acTL', struct.pack('>II', self.frames, self._loop))
+        self.fp.seek(end)
+
+
+class GifWriter:
+    """Stream frames into an animated GIF.
+
+    Like ApngWriter each later frame is only its changed rectangle, left in
+    place for the next (disposal 1), with its own palette so a small patch
+    gets all 256 colours. Pillow quantizes and LZW-encodes every patch.
+    """
+
+    def __init__(self, fp, size, loop=0):
+        self.fp = fp
+        self.size = size
+        self.frames = 0
+        self._clock_ms = 0.0
+        self._written_cs = 0
+        fp.write(b'GIF89a' + struct.pack('<HHBBB', size[0], size[1], 0, 0, 0))
+        fp.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+
+    @staticmethod
+    def _skip_blocks(data, pos):
+        while data[pos]:
+            pos += data[pos] + 1
+        return pos + 1
+
+    @classmethod
+    def _encode(cls, patch):
+        """(colour table, LZW image data) of `patch` as Pillow writes it."""
+        buf = io.BytesIO()
+        patch.quantize(256).save(buf, 'GIF', interlace=False)
+        data = buf.getvalue()
+        flags = data[10]
+        pos = 13
+        table = b''
+        if flags & 0x80:
+            size = 3 << ((flags & 7) + 1)
+            table, pos = data[pos:pos + size], pos + size
+        while data[pos] == 0x21:
+            pos = cls._skip_blocks(data, pos + 2)
+        flags = data[pos + 9]
+        pos += 10
+        if flags & 0x80:
+            size = 3 << ((flags & 7) + 1)
+            table, pos = data[pos:pos + size], pos + size
+        start = pos
+        return table, data[start:cls._skip_blocks(data, pos + 1)]
+
+    def add(self, frame, boxes, duration_ms):
+        box = (0, 0) + self.size if self.frames == 0 else _union_box(boxes)
+        x0, y0, x1, y1 = box
+        table, image_data = self._encode(frame.crop(box).convert('RGB'))
+        # GIF delays are centiseconds; carry the rounding so the total stays true
+        self._clock_ms += duration_ms
+        delay = round(self._clock_ms / 10) - self._written_cs
+        self._written_cs += delay
+        bits = max(0, (len(table) // 3 - 1).bit_length() - 1)
+        self.fp.write(b'\x21\xf9\x04' + struct.pack('<BHB', 1 << 2, delay, 0) + b'\x00')
+        self.fp.write(b'\x2c' + struct.pack('<HHHHB', x0, y0, x1 - x0, y1 - y0, 0x80 | bits))
+        self.fp.write(table.ljust(3 << (bits + 1), b'\x00'))
+        self.fp.write(image_data)
+        self.frames += 1
+
+    def close(self):
+        self.fp.write(b'\x3b')
+
+
+class WebpWriter:
+    """Stream frames into an animated WebP through libwebp's animation encoder.
+
+    Frames are handed to the encoder as they come (it keeps only the
+    compressed frames and finds changed regions itself); the file is written
+    on close(). The encoder is the one Pillow's WebP plugin drives, from
+    Pillow's private _webp module; if that is missing or its interface has
+    changed, frames are kept and written with the public
+    ``save(save_all=True)`` API, which holds every frame until the end.
+    """
+
+    def __init__(self, fp, size, loop=0, lossless=False, quality=90, method=4):
+        self.fp = fp
+        self.size = size
+        self.frames = 0
+        self._loop = loop
+        self._timestamp = 0
+        self._options = (lossless, quality, 100, method)
+        self._kept = None
+        try:
+            from PIL import _webp
+            self._enc = _webp.WebPAnimEncoder(size, 0, loop, False, 9 if lossless else 3,
+                                              17 if lossless else 5, False, False)
+        except (ImportError, AttributeError, TypeError):
+            self._enc = None
+            self._kept = []
+
+    def add(self, frame, boxes, duration_ms):
+        frame = frame.convert('RGBA')
+        if self._enc is not None:
+            try:
+                self._enc.add(frame.getim(), round(self._timestamp), *self._options)
+            except (AttributeError, TypeError):
+                if self.frames:
+                    raise
+                self._enc = None
+                self._kept = []
+        if self._enc is None:
+            self._kept.append((frame, duration_ms))
+        self._timestamp += duration_ms
+        self.frames += 1
+
+    def close(self):
+        if self._enc is not None:
+            self._enc.add(None, round(self._timestamp), *self._options[:3], 0)
+            self.fp.write(self._enc.assemble(b'', b'', b''))
+            return
+        frames = [f for f, _ in self._kept]
+        lossless, quality, _, method = self._options
+        frames[0].save(self.fp, 'WEBP', save_all=True, append_images=frames[1:],
+                       duration=[round(d) for _, d in self._kept], loop=self._loop,
+                       lossless=lossless, quality=quality, method=method)
+        self._kept = None
+
+
+class PngSequenceWriter:
+    """Write every frame as its own PNG, named by a %-pattern like ``frame_%04d.png``.
+
+    Frames that last longer are repeated so the sequence plays at `fps`.
+    """
+
+    def __init__(self, pattern, fps=30):
+        self.pattern = pattern
+        self.fps = fps
+        self.frames = 0
+        self._clock_ms = 0.0
+
+    def add(self, frame, boxes, duration_ms):
+        self._clock_ms += duration_ms
+        data = encode_png(frame)
+        target = max(self.frames + 1, round(self._clock_ms * self.fps / 1000))
+        while self.frames < target:
+            with open(self.pattern % (self.frames + 1), 'wb') as f:
+                f.write(data)
+            self.frames += 1
+
+    def close(self):
+        pass
+
+
+ANIMATION_WRITERS = {'.png': ApngWriter, '.apng': ApngWriter, '.gif': GifWriter, '.webp': WebpWriter}
+
+
+class RenderPipeline:
+    """Encode and write finished images on background threads.
+
+    submit() hands a rendered image to encoder threads through a bounded
+    queue and returns as soon as there is room, so the next target renders
+    while Pillow (which releases the GIL) compresses the previous one and a
+    writer thread puts the bytes on disk. At most ``max_pending + encoders``
+    encodings are alive at once; submit() blocks beyond that.
+
+    Each image is encoded once per OutputFormat in `formats`, as separate
+    jobs, so the encoder threads (one per format by default) work on the
+    formats of one image in parallel. Icon-only formats (ICO) are skipped
+    unless a submit() passes its own `formats`, as the app icons do.
+    ``stats`` records the path, format, size and encode time of every
+    encoding.
+
+    `sink(path, data)` receives each encoding on the writer thread, one at
+    a time; by default the bytes are written to the file `path`.
+    """
+
+    def __init__(self, encoders=None, max_pending=1, sink=None, formats=PNG_ONLY):
+        self.formats = tuple(formats)
+        self.image_formats = tuple(f for f in self.formats if not f.icon_only) or PNG_ONLY
+        self.stats = []
+        self._sink = sink or self._write_file
+        self._encode_q = queue.Queue(maxsize=max_pending)
+        self._write_q = queue.Queue(maxsize=max_pending)
+        self._errors = []
+        if encoders is None:
+            encoders = len(self.formats)
+        self._encoders = [threading.Thread(target=self._encode_loop, daemon=True) for _ in range(encoders)]
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        for t in self._encoders:
+            t.start()
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+
+    def submit(self, path, img, cache_keys=None, formats=None):
+        """Queue `img` for `path` (a .png path; other formats swap the extension).
+
+        It is encoded in `formats` (default: ``image_formats``), and stored
+        in the render cache under `cache_keys`, one per format, when given.
+        """
+        if self._errors:
+            raise self._errors[0]
+        formats = self.image_formats if formats is None else formats
+        for i, fmt in enumerate(formats):
+            self._encode_q.put((fmt.path(path), img, fmt, cache_keys[i] if cache_keys else None))
+
+    def submit_cached(self, path, generator, params, render, config=None, formats=None):
+        """Like submit(path, render()), but render cache hits skip rendering and encoding.
+
+        The image is rendered (once) only when some format misses.
+        """
+        formats = self.image_formats if formats is None else formats
+        if _render_cache is None:
+            return self.submit(path, render(), formats=formats)
+        keys = [render_key(generator, params if fmt.key == PNG_ONLY[0].key else params + (fmt.key,), config)
+                for fmt in formats]
+        hits = [_render_cache.get(key) for key in keys]
+        if any(data is None for data in hits):
+            return self.submit(path, render(), keys, formats)
+        if self._errors:
+            raise self._errors[0]
+        for fmt, data in zip(formats, hits):
+            self._write_q.put((fmt.path(path), data))
+
+    def _encode_loop(self):
+        while True:
+            item = self._encode_q.get()
+            if item is None:
+                return
+            path, img, fmt, cache_key = item
+            del item
+            try:
+                t0 = time.perf_counter()
+                data = fmt.encode(img)
+                self.stats.append({'path': path, 'format': fmt.name, 'bytes': len(data),
+                                   'seconds': time.perf_counter() - t0})
+                if cache_key is not None:
+                    _render_cache.put(cache_key, data)
+            except Exception as e:
+                self._errors.append(e)
+                continue
+            finally:
+                del img
+            self._write_q.put((path, data))
+
+    def _write_loop(self):
+        while True:
+            item = self._write_q.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                self._sink(path, data)
+                print(f"Generated: {path}")
+            except Exception as e:
+                self._errors.append(e)
+
+    @staticmethod
+    def _write_file(path, data):
+        with open(path, 'wb') as fh:
+            fh.write(data)
+
+    def close(self, raise_errors=True):
+        """Wait for everything submitted to be written."""
+        for _ in self._encoders:
+            self._encode_q.put(None)
+        for t in self._encoders:
+            t.join()
+        self._write_q.put(None)
+        self._writer.join()
+        if raise_errors and self._errors:
+            raise self._errors[0]
+
+    def summary(self):
+        """Per-format totals of ``stats``: one line per format."""
+        lines = []
+        for fmt in self.formats:
+            rows = [r for r in self.stats if r['format'] == fmt.name]
+            if rows:
+                lines.append(f"{fmt.name:<5} {len(rows):>4} files {sum(r['bytes'] for r in rows) / 1e6:>9.2f} MB "
+                             f"{sum(r['seconds'] for r in rows):>8.2f}s encoding")
+        return '\n'.join(lines)
+
+
+def generate_all_promos(output_dir, config, pipeline=None):
+    """Generate all 6 promotional screenshots for a given device config.
+
+    Rendering overlaps PNG encoding and writing through a RenderPipeline;
+    pass one to share it across devices.
+    """
     os.makedirs(output_dir, exist_ok=True)
-    generate_promo_setup(os.path.join(output_dir, 'promo_1_setup.png'), config)
-    generate_promo_score(os.path.join(output_dir, 'promo_2_score.png'), config)
-    generate_promo_chip(os.path.join(output_dir, 'promo_3_chip.png'), config)
-    generate_promo_summary(os.path.join(output_dir, 'promo_4_summary.png'), config)
-    generate_promo_past_games(os.path.join(output_dir, 'promo_5_past_games.png'), config)
-    generate_promo_share(os.path.join(output_dir, 'promo_6_share.png'), config)
+    if pipeline is None:
+        with RenderPipeline() as own:
+            return generate_all_promos(output_dir, config, own)
+    for name, (filename, _, _, _) in PROMOS.items():
+        pipeline.submit_cached(os.path.join(output_dir, filename), 'promo', (name,),
+                               lambda: render_promo(name, config), config)
+
+
+class StoreBundle:
+    """Zip or tar archive of encoded assets, written as they arrive.
+
+    add() appends a member straight to `fp` (which need not be seekable)
+    and notes its dimensions, size and SHA-256; close() ends the archive
+    with ``manifest.json`` listing them. Members are stored uncompressed,
+    since PNG data is already deflated, and carry a fixed timestamp so
+    the same assets give the same bundle.
+    """
+
+    DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(self, fp, fmt='zip'):
+        self.fmt = fmt
+        self.entries = []
+        if fmt == 'zip':
+            self._archive = zipfile.ZipFile(fp, 'w', zipfile.ZIP_STORED)
+        elif fmt == 'tar':
+            self._archive = tarfile.open(fileobj=fp, mode='w|')
+        else:
+            raise ValueError(f"unknown bundle format: {fmt!r} (use zip or tar)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def _write(self, name, data, compress=False):
+        if self.fmt == 'zip':
+            info = zipfile.ZipInfo(name, self.DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 0
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def add(self, name, data):
+        """Append the PNG bytes `data` as member `name`."""
+        if data[:8] != PngStream.SIGNATURE or data[12:16] != b'IHDR':
+            raise ValueError(f"{name}: not a PNG")
+        width, height = struct.unpack('>II', data[16:24])
+        self._write(name, data)
+        self.entries.append({'path': name, 'width': width, 'height': height,
+                             'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()})
+
+    def close(self):
+        manifest = json.dumps({'assets': self.entries}, ensure_ascii=False, indent=1)
+        self._write('manifest.json', manifest.encode('utf-8'), compress=True)
+        self._archive.close()
+
+
+# Device folder -> config of the store screenshots
+STORE_DEVICES = {'iphone': IPHONE, 'ipad': IPAD}
+
+
+def generate_store_bundle(fp, fmt='zip', locale='ja', encoders=1):
+    """Render every store screenshot into a StoreBundle on `fp` in one pass.
+
+    Members are ``<device>/<locale>/<promo file>``. The promo captions are
+    Japanese, so 'ja' is the only locale they are drawn in.
+    """
+    with StoreBundle(fp, fmt) as bundle, RenderPipeline(encoders, sink=bundle.add) as pipeline:
+        for device, config in STORE_DEVICES.items():
+            for name, (filename, _, _, _) in PROMOS.items():
+                pipeline.submit_cached(f"{device}/{locale}/{filename}", 'promo', (name,),
+                                       lambda: render_promo(name, config), config)
+    return bundle
+
+
+# File -> (generator, params, render) of the app assets; render(*params) draws one
+APP_ASSETS = {
+    'icon.png': ('icon', (1024,), render_icon),
+    'adaptive-icon.png': ('adaptive_icon', (1024,), render_adaptive_icon),
+    'splash.png': ('splash', (1284, 2778), render_splash),
+    'favicon.png': ('favicon', (48,), render_favicon),
+}
+
+
+def _asset_tasks(assets_dir, formats=PNG_ONLY):
+    """(path, generator, params, render, config, formats) for every generated asset.
+
+    The icon is written in all of `formats`, everything else in the
+    non-icon ones; icon-only formats (ICO) get a 256px favicon of their own.
+    """
+    image_formats = tuple(f for f in formats if not f.icon_only) or PNG_ONLY
+    icon_formats = tuple(f for f in formats if f.icon_only)
+    tasks = [(os.path.join(assets_dir, filename), generator, params, functools.partial(render, *params), None,
+              formats if filename == 'icon.png' else image_formats)
+             for filename, (generator, params, render) in APP_ASSETS.items()]
+    if icon_formats:
+        tasks.append((os.path.join(assets_dir, 'favicon.png'), 'favicon', (256,),
+                      functools.partial(render_favicon, 256), None, icon_formats))
+    for device, config in (('iphone', IPHONE), ('ipad', IPAD)):
+        for name, (filename, _, _, _) in PROMOS.items():
+            tasks.append((os.path.join(assets_dir, device, filename), 'promo', (name,),
+                          functools.partial(render_promo, name, config), config, image_formats))
+    return tasks
+
+
+def _run_task(path, generator, params, render, config, formats):
+    with RenderPipeline(formats=formats) as pipeline:
+        pipeline.submit_cached(path, generator, params, render, config, formats)
+    return pipeline.stats
+
+
+def _init_worker(cache_dir, font_files, render_cache):
+    attach_intermediate_cache(cache_dir)
+    use_font_files(font_files)
+    if render_cache is not None:
+        attach_render_cache(*render_cache)
+
+
+def generate_all_parallel(assets_dir, jobs, font_files=None, formats=PNG_ONLY):
+    """Generate every asset on `jobs` worker processes, in `formats`.
+
+    Workers share gradients, frame templates, shadow sprites, the tile and
+    the score sheet through an IntermediateCache in a temporary directory,
+    so each is rendered once per build rather than once per worker. They
+    load fonts from `font_files` (see use_font_files()) when given, and
+    use the same render cache as this process. Each worker encodes the
+    formats of its asset on threads, as RenderPipeline does. Returns the
+    pipelines' ``stats`` rows.
+    """
+    import multiprocessing
+    import shutil
+    import tempfile
+
+    for device in ('iphone', 'ipad'):
+        os.makedirs(os.path.join(assets_dir, device), exist_ok=True)
+    cache_dir = tempfile.mkdtemp(prefix='mahjong-assets-')
+    render_cache = None
+    if _render_cache is not None:
+        render_cache = (_render_cache.directory, _render_cache.max_bytes)
+    try:
+        with multiprocessing.Pool(jobs, initializer=_init_worker,
+                                  initargs=(cache_dir, font_files or {}, render_cache)) as pool:
+            stats = pool.starmap(_run_task, _asset_tasks(assets_dir, formats))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return [row for rows in stats for row in rows]
 
 
 if __name__ == '__main__':
-    assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
-
-    # App assets
-    generate_icon(os.path.join(assets_dir, 'icon.png'))
-    generate_adaptive_icon(os.path.join(assets_dir, 'adaptive-icon.png'))
-    generate_splash(os.path.join(assets_dir, 'splash.png'))
-    generate_favicon(os.path.join(assets_dir, 'favicon.png'))
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='render on this many worker processes (default: 1)')
+    parser.add_argument('--themes', default='',
+                        help=f"also write colour variants to assets/themes/<theme>/ "
+                             f"(comma-separated: {', '.join(THEMES)})")
+    parser.add_argument('--animate', default='',
+                        help=f"also write animated promos to assets/animated/<device>/ "
+                             f"(comma-separated: {', '.join(PROMO_ANIMATIONS)})")
+    parser.add_argument('--animation-format', default='png', choices=['png', 'gif', 'webp'],
+                        help='animated promo format: APNG, GIF or WebP (default: png)')
+    parser.add_argument('--history', nargs=2, metavar=('DB', 'GAME_ID'),
+                        help='render the history sheet of one game in an app database backup '
+                             'to assets/history/game_<GAME_ID>.png and exit')
+    parser.add_argument('--history-page-rows', type=int, default=None,
+                        help='split the history sheet into pages of this many rows')
+    parser.add_argument('--leaderboard', metavar='DIR',
+                        help='render the season standings of a directory of share codes (see leaderboard.py) '
+                             'to assets/leaderboard/standings_p<N>.png and exit')
+    parser.add_argument('--leaderboard-page-rows', type=int, default=10,
+                        help='players per leaderboard page (default: 10)')
+    parser.add_argument('--subset-fonts', action='store_true',
+                        help='render with fonts cut down to the characters drawn (needs fontTools)')
+    parser.add_argument('--font-cache', default=os.path.join(os.path.expanduser('~'), '.cache',
+                                                             'mahjong-score-table', 'fonts'),
+                        help='where --subset-fonts keeps subsets, by character set (default: %(default)s)')
+    parser.add_argument('--render-cache', metavar='DIR',
+                        help='reuse encoded assets and intermediates from this shared cache directory')
+    parser.add_argument('--render-cache-mb', type=int, default=512,
+                        help='evict least recently used render cache entries beyond this size (default: 512)')
+    parser.add_argument('--formats', default='',
+                        help="write each asset in these formats, encoded in parallel from one render "
+                             "(comma-separated name[:q=<0-100>][:effort=<0-9>] of "
+                             f"{', '.join(OUTPUT_FORMATS)}; e.g. png,webp:q=80:effort=6,avif:q=50,ico); "
+                             "ico is only written for the app icon and favicon")
+    parser.add_argument('--bundle', metavar='PATH',
+                        help="write the store screenshots to a .zip or .tar bundle with a manifest "
+                             "instead of assets/ ('-' for stdout, as zip) and exit")
+    parser.add_argument('--bundle-locale', default='ja',
+                        help='locale folder of the screenshots in the bundle (default: ja)')
+    cli = parser.parse_args()
 
-    # iPhone promotional screenshots (1242x2688)
-    iphone_dir = os.path.join(assets_dir, 'iphone')
-    generate_all_promos(iphone_dir, IPHONE)
+    assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
 
-    # iPad promotional screenshots (2048x2732)
-    ipad_dir = os.path.join(assets_dir, 'ipad')
-    generate_all_promos(ipad_dir, IPAD)
+    themes = [t for t in cli.themes.split(',') if t]
+    for theme in themes:
+        if theme not in THEMES:
+            parser.error(f"unknown theme: {theme}")
+    animations = [a for a in cli.animate.split(',') if a]
+    for animation in animations:
+        if animation not in PROMO_ANIMATIONS:
+            parser.error(f"unknown animation: {animation}")
+
+    try:
+        formats = tuple(OutputFormat.parse(f) for f in cli.formats.split(',') if f) or PNG_ONLY
+    except ValueError as e:
+        parser.error(str(e))
+    for fmt in formats:
+        if not fmt.available():
+            parser.error(f"this Pillow cannot write {fmt.name} "
+                         f"({'needs Pillow 11.2+ or pillow-avif-plugin' if fmt.name == 'avif' else 'missing codec'})")
+    if cli.history:
+        db_path, game_id = cli.history
+        if cli.subset_fonts:
+            use_font_files(subset_fonts(history_font_chars(db_path, int(game_id)), cli.font_cache))
+        players, records = history_from_db(db_path, int(game_id))
+        generate_history_sheet(os.path.join(assets_dir, 'history', f'game_{game_id}.png'),
+                               players, records, rows_per_page=cli.history_page_rows)
+        raise SystemExit
+
+    if cli.leaderboard:
+        import leaderboard
+        season, added, rejected = leaderboard.update_season(cli.leaderboard)
+        print(f"{season.n_games} games ({added} new)"
+              + (f", {len(rejected)} codes could not be decoded" if rejected else ""))
+        if cli.subset_fonts:
+            use_font_files(subset_fonts(leaderboard_font_chars(season), cli.font_cache))
+        generate_leaderboard(os.path.join(assets_dir, 'leaderboard', 'standings.png'), season,
+                             rows_per_page=cli.leaderboard_page_rows)
+        raise SystemExit
+
+    font_files = subset_fonts(promo_font_chars(), cli.font_cache) if cli.subset_fonts else {}
+    use_font_files(font_files)
+    render_cache = attach_render_cache(cli.render_cache, cli.render_cache_mb << 20)
+    if render_cache is not None:
+        atexit.register(render_cache.trim)
+
+    if cli.bundle:
+        fmt = 'tar' if cli.bundle.endswith('.tar') else 'zip'
+        if cli.bundle == '-':
+            import contextlib
+            out = sys.stdout.buffer
+            with contextlib.redirect_stdout(sys.stderr):
+                generate_store_bundle(out, fmt, cli.bundle_locale)
+        else:
+            with open(cli.bundle, 'wb') as fp:
+                bundle = generate_store_bundle(fp, fmt, cli.bundle_locale)
+            print(f"Bundled: {cli.bundle} ({len(bundle.entries)} assets)")
+        raise SystemExit
+
+    if cli.jobs > 1:
+        stats = generate_all_parallel(assets_dir, cli.jobs, font_files, formats)
+        with RenderPipeline(formats=formats) as pipeline:
+            pipeline.stats.extend(stats)
+            if themes:
+                # Variants are remaps of one render per target, so they stay in this process
+                generate_theme_variants(os.path.join(assets_dir, 'themes'), themes, pipeline)
+        if formats != PNG_ONLY:
+            print(pipeline.summary())
+        generate_animated_promos(os.path.join(assets_dir, 'animated'), animations, cli.animation_format)
+        print("\nAll assets generated successfully!")
+        raise SystemExit
+
+    with RenderPipeline(formats=formats) as pipeline:
+        # App assets
+        for filename, (generator, params, render) in APP_ASSETS.items():
+            pipeline.submit_cached(os.path.join(assets_dir, filename), generator, params,
+                                   functools.partial(render, *params),
+                                   formats=formats if filename == 'icon.png' else None)
+        icon_formats = [f for f in formats if f.icon_only]
+        if icon_formats:
+            # favicon.png is 48px; the multi-size favicon.ico gets its own 256px render
+            pipeline.submit_cached(os.path.join(assets_dir, 'favicon.png'), 'favicon', (256,),
+                                   lambda: render_favicon(256), formats=icon_formats)
+
+        # iPhone promotional screenshots (1242x2688)
+        iphone_dir = os.path.join(assets_dir, 'iphone')
+        generate_all_promos(iphone_dir, IPHONE, pipeline)
+
+        # iPad promotional screenshots (2048x2732)
+        ipad_dir = os.path.join(assets_dir, 'ipad')
+        generate_all_promos(ipad_dir, IPAD, pipeline)
+
+        if themes:
+            generate_theme_variants(os.path.join(assets_dir, 'themes'), themes, pipeline)
+    if formats != PNG_ONLY:
+        print(pipeline.summary())
+
+    generate_animated_promos(os.path.join(assets_dir, 'animated'), animations, cli.animation_format)
 
     print("\nAll assets generated successfully!")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Season standings over a directory of Mahjong Score Table share codes.
+
+Every share code in the archive (reference or compact, see sharecode.py;
+one per line of the .txt files under the directory, share URLs accepted)
+is decoded once into columns of score and chip rows, with players
+identified by name across games. From those columns a player-by-game
+score matrix and the per-player standings are computed with array
+operations:
+
+  - games, hanchan and total points
+  - average rank, with ranks recomputed per hanchan by the tie rule of
+    calcRanks in utils.ts (equal points share the better rank)
+  - top rate (share of hanchan finished first)
+  - chip balance
+
+The decoded columns are kept in a cache file per archive directory, so a
+re-run after new games arrive only decodes the codes it has not seen.
+generate_assets.py --leaderboard renders the standings as images.
+
+Requires numpy.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from urllib.parse import unquote
+
+import numpy as np
+
+from analytics import competition_ranks
+from sharecode import COMPACT_MARKER, DEEP_LINK_PREFIX, decode_compact, decode_share_code
+
+SEASON_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'mahjong-score-table', 'leaderboard')
+
+# <table>.<column>; roster rows are the game_players of each game
+COLUMNS = ('roster.game', 'roster.player',
+           'scores.game', 'scores.hanchan', 'scores.player', 'scores.point', 'scores.rank',
+           'chips.game', 'chips.player', 'chips.chip_point')
+
+
+# ──────────────────────────────────────────────
+# Decoding
+# ──────────────────────────────────────────────
+
+def read_codes(directory):
+    """Share codes in the .txt files under `directory`, in path order.
+
+    One code per line; share URLs are unwrapped, blank lines and lines
+    starting with '#' skipped.
+    """
+    codes = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.txt'):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    if line.startswith(DEEP_LINK_PREFIX):
+                        line = unquote(line[len(DEEP_LINK_PREFIX):])
+                    codes.append(line)
+    return codes
+
+
+def decode_game(code):
+    """ShareGameData of a reference or compact share code."""
+    if code.startswith(COMPACT_MARKER):
+        return decode_compact(code)
+    data = json.loads(decode_share_code(code))
+    if not isinstance(data, dict) or data.get('v') not in (1, 2) or not isinstance(data.get('p'), list):
+        raise ValueError("not a share code")
+    return data
+
+
+def game_entries(data):
+    """(players, scores, chips) of ShareGameData.
+
+    Scores are (hanchan, player index, point) and chips (hanchan, player
+    index, chip_point); V1 entries name their player, which is looked up
+    in (or appended to) `players`.
+    """
+    players = list(data['p'])
+    index = {name: i for i, name in enumerate(players)}
+
+    def rows(entries):
+        out = []
+        for entry in entries:
+            player = entry[1]
+            if data['v'] == 1:
+                if player not in index:
+                    index[player] = len(players)
+                    players.append(player)
+                player = index[player]
+            elif not 0 <= player < len(players):
+                raise ValueError(f"player index out of range: {player}")
+            out.append((int(entry[0]), player, int(entry[2])))
+        return out
+
+    return players, rows(data.get('s') or ()), rows(data.get('c') or ())
+
+
+# ──────────────────────────────────────────────
+# Season
+# ──────────────────────────────────────────────
+
+class Season:
+    """Decoded games of an archive, as columns that grow as codes arrive.
+
+    Games are numbered in the order they were added and players index
+    ``players``. A game is identified by the SHA-1 of its share code, so
+    the same code in two files is counted once.
+    """
+
+    def __init__(self):
+        self.digests = []
+        self.dates = []
+        self.players = []
+        self.columns = {key: np.zeros(0, dtype=np.int64) for key in COLUMNS}
+        self._player_index = {}
+
+    @property
+    def n_games(self):
+        return len(self.digests)
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    @classmethod
+    def load(cls, path):
+        """The season saved at `path`, or an empty one if missing or unreadable."""
+        season = cls()
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != SEASON_VERSION:
+                    return season
+                season.digests = data['digests'].tolist()
+                season.dates = data['dates'].tolist()
+                season.players = data['players'].tolist()
+                season.columns = {key: data[key] for key in COLUMNS}
+        except (OSError, KeyError, ValueError):
+            return cls()
+        season._player_index = {name: i for i, name in enumerate(season.players)}
+        return season
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, version=SEASON_VERSION, digests=np.array(self.digests, dtype=str),
+                     dates=np.array(self.dates, dtype=str), players=np.array(self.players, dtype=str),
+                     **self.columns)
+        os.replace(tmp, path)
+
+    def add(self, codes):
+        """Decode and fold in the codes not seen before.
+
+        Returns (number of games added, codes that failed to decode).
+        Ranks are computed for the new games' rows only.
+        """
+        seen = set(self.digests)
+        first_game = self.n_games
+        new = {key: [] for key in COLUMNS}
+        rejected = []
+        for code in codes:
+            digest = hashlib.sha1(code.encode('utf-8')).hexdigest()
+            if digest in seen:
+                continue
+            try:
+                data = decode_game(code)
+                names, scores, chips = game_entries(data)
+                date = str(data['d'])
+            except (ValueError, KeyError, IndexError, TypeError, zlib.error):
+                rejected.append(code)
+                continue
+            seen.add(digest)
+            game = len(self.digests)
+            self.digests.append(digest)
+            self.dates.append(date)
+            ids = [self._player_index.setdefault(name, len(self._player_index)) for name in names]
+            for player in ids:
+                new['roster.game'].append(game)
+                new['roster.player'].append(player)
+            for hanchan, p, point in scores:
+                new['scores.game'].append(game)
+                new['scores.hanchan'].append(hanchan)
+                new['scores.player'].append(ids[p])
+                new['scores.point'].append(point)
+            for hanchan, p, chip_point in chips:
+                new['chips.game'].append(game)
+                new['chips.player'].append(ids[p])
+                new['chips.chip_point'].append(chip_point)
+        self.players = list(self._player_index)
+
+        cols = {key: np.array(values, dtype=np.int64) for key, values in new.items() if key != 'scores.rank'}
+        hanchan = cols['scores.hanchan']
+        group = cols['scores.game'] * (int(hanchan.max()) + 1 if len(hanchan) else 1) + hanchan
+        cols['scores.rank'] = competition_ranks(group, cols['scores.point'])
+        for key in COLUMNS:
+            self.columns[key] = np.concatenate([self.columns[key], cols[key]])
+        return self.n_games - first_game, rejected
+
+
+def season_path(directory, cache_dir=DEFAULT_CACHE_DIR):
+    """Cache file of the season of the archive `directory`."""
+    key = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()
+    return os.path.join(cache_dir, key + '.npz')
+
+
+def update_season(directory, cache_dir=DEFAULT_CACHE_DIR):
+    """The season of the archive `directory`, folding in codes added since the last run.
+
+    Returns (season, games added, rejected codes).
+    """
+    path = season_path(directory, cache_dir)
+    season = Season.load(path)
+    added, rejected = season.add(read_codes(directory))
+    if added:
+        season.save(path)
+    return season, added, rejected
+
+
+# ──────────────────────────────────────────────
+# Standings
+# ──────────────────────────────────────────────
+
+def score_matrix(season):
+    """Points of each player in each game, as a (players, games) array."""
+    n, g = len(season.players), season.n_games
+    flat = season['scores.player'] * g + season['scores.game']
+    return np.bincount(flat, weights=season['scores.point'], minlength=n * g).astype(np.int64).reshape(n, g)
+
+
+def standings(season):
+    """Per-player standings, as a dict of arrays indexed like ``season.players``.
+
+    ``order`` lists players by total points (then average rank) and
+    ``place`` is each player's place in it, equal totals sharing a place.
+    """
+    n = len(season.players)
+    player = season['scores.player']
+    rank = season['scores.rank']
+
+    total = score_matrix(season).sum(axis=1)
+    played = np.zeros((n, season.n_games), dtype=bool)
+    played[season['roster.player'], season['roster.game']] = True
+    hanchan = np.bincount(player, minlength=n)
+    rank_sum = np.bincount(player, weights=rank, minlength=n)
+    tops = np.bincount(player[rank == 1], minlength=n)
+    chips = np.bincount(season['chips.player'], weights=season['chips.chip_point'], minlength=n).astype(np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_rank = np.where(hanchan > 0, rank_sum / hanchan, 0.0)
+        top_rate = np.where(hanchan > 0, tops / hanchan, 0.0)
+    return {
+        'games': played.sum(axis=1),
+        'hanchan': hanchan,
+        'total': total,
+        'average_rank': average_rank,
+        'top_rate': top_rate,
+        'chips': chips,
+        'order': np.lexsort((average_rank, -total)),
+        'place': competition_ranks(np.zeros(n, dtype=np.int64), total),
+    }
+
+
+def format_table(players, stats):
+    lines = [f"{'#':>3} {'player':<16}{'games':>6}{'hanchan':>8}{'total':>9}{'avg rank':>9}{'top':>7}{'chips':>7}"]
+    for i in stats['order']:
+        lines.append(f"{stats['place'][i]:>3} {players[i]:<16}{stats['games'][i]:>6}{stats['hanchan'][i]:>8}"
+                     f"{stats['total'][i]:>+9}{stats['average_rank'][i]:>9.2f}{stats['top_rate'][i]:>7.1%}"
+                     f"{stats['chips'][i]:>+7}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('archive', help='directory of .txt files with one share code per line')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR,
+                        help=f'season cache directory (default: {DEFAULT_CACHE_DIR})')
+    cli = parser.parse_args()
+
+    t0 = time.time()
+    season, added, rejected = update_season(cli.archive, cli.cache)
+    print(format_table(season.players, standings(season)))
+    print(f"\n{season.n_games} games ({added} new), {len(season['scores.point'])} score rows "
+          f"in {time.time() - t0:.2f}s")
+    if rejected:
+        print(f"{len(rejected)} codes could not be decoded")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Share codes of Mahjong Score Table games, and an experimental compact variant.
+
+The reference codec matches encodeShareCode / decodeShareCode in utils.ts:
+the ShareGameDataV1/V2 JSON, deflated (zlib format, as pako writes it) and
+base64-encoded. export_game builds the V2 payload of one game of an app
+database backup the way exportGameData in database.ts does.
+
+The compact variant is an experiment for measuring, not a format the app
+reads. It stores the V2 score and chip arrays column by column, with
+hanchan and timestamps delta-encoded and formatted times run-length
+encoded. The result is raw-deflated against PRESET_DICTIONARY, a zlib
+preset dictionary trained on typical payloads, and written as unpadded
+base64url after a '~' marker, which buildShareUrl leaves unescaped.
+
+Run as a script to benchmark code length and encode/decode throughput of
+both codecs over synthetic games (see synthetic.py) and the games of any
+backups given.
+"""
+
+import base64
+import json
+import random
+import sqlite3
+import time
+import zlib
+from collections import Counter
+
+COMPACT_MARKER = '~'
+COMPACT_VERSION = 1
+DEEP_LINK_PREFIX = 'mahjong-score://import?code='
+
+
+# ──────────────────────────────────────────────
+# Reference codec (utils.ts)
+# ──────────────────────────────────────────────
+
+def share_json(data):
+    """JSON.stringify(data): no whitespace, non-ASCII kept as is."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_share_code(text):
+    """encodeShareCode: UTF-8, deflate (zlib format, level 6), base64."""
+    return base64.b64encode(zlib.compress(text.encode('utf-8'), 6)).decode('ascii')
+
+
+def decode_share_code(code):
+    """decodeShareCode, including the old uncompressed base64 codes."""
+    raw = base64.b64decode(code)
+    try:
+        raw = zlib.decompress(raw)
+    except zlib.error:
+        pass
+    return raw.decode('utf-8')
+
+
+def share_url(code):
+    """buildShareUrl: the code percent-encoded as encodeURIComponent does."""
+    from urllib.parse import quote
+    return DEEP_LINK_PREFIX + quote(code, safe="-_.!~*'()")
+
+
+def export_game(db_path, game_id):
+    """ShareGameDataV2 of one game of an app database backup, as exportGameData builds it."""
+    con = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        row = con.execute('SELECT player_count, start_date FROM games WHERE id = ?', (game_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no game {game_id} in {db_path}")
+        players = [r[0] for r in con.execute(
+            'SELECT player_name FROM game_players WHERE game_id = ? ORDER BY sort_order', (game_id,))]
+        index = {name: i for i, name in enumerate(players)}
+        scores = con.execute(
+            'SELECT hanchan, player_name, point, timestamp, formatted_time FROM scores '
+            'WHERE game_id = ? ORDER BY hanchan, player_name', (game_id,)).fetchall()
+        chips = con.execute(
+            'SELECT hanchan, player_name, chip_point, timestamp, formatted_time FROM chips '
+            'WHERE game_id = ? ORDER BY hanchan, player_name', (game_id,)).fetchall()
+    finally:
+        con.close()
+    data = {
+        'v': 2, 'pc': row[0], 'd': row[1], 'p': players,
+        's': [[h, index[n], pt, ts, ft] for h, n, pt, ts, ft in scores],
+    }
+    if chips:
+        data['c'] = [[h, index[n], cp, ts, ft] for h, n, cp, ts, ft in chips]
+    return data
+
+
+def export_backup(db_path):
+    """ShareGameDataV2 of every game in an app database backup."""
+    con = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        ids = [r[0] for r in con.execute('SELECT id FROM games ORDER BY id')]
+    finally:
+        con.close()
+    return [export_game(db_path, game_id) for game_id in ids]
+
+
+# ──────────────────────────────────────────────
+# Compact variant (experimental)
+# ──────────────────────────────────────────────
+
+def _delta(values):
+    return [b - a for a, b in zip([0] + values, values)]
+
+
+def _undelta(deltas):
+    out = []
+    total = 0
+    for d in deltas:
+        total += d
+        out.append(total)
+    return out
+
+
+def _pack_entries(entries):
+    """Score or chip entries as columns; entries of mixed shape are kept as rows."""
+    width = len(entries[0]) if entries else 3
+    if width not in (3, 5) or any(len(e) != width for e in entries):
+        return {'r': entries}
+    cols = {
+        'h': _delta([e[0] for e in entries]),
+        'i': [e[1] for e in entries],
+        'x': [e[2] for e in entries],
+    }
+    if width == 5:
+        cols['t'] = _delta([e[3] for e in entries])
+        runs = []
+        for e in entries:
+            if runs and runs[-1][1] == e[4]:
+                runs[-1][0] += 1
+            else:
+                runs.append([1, e[4]])
+        cols['f'] = runs
+    return cols
+
+
+def _unpack_entries(cols):
+    if 'r' in cols:
+        return cols['r']
+    columns = [_undelta(cols['h']), cols['i'], cols['x']]
+    if 't' in cols:
+        columns.append(_undelta(cols['t']))
+        columns.append([ft for n, ft in cols['f'] for _ in range(n)])
+    return [list(e) for e in zip(*columns)]
+
+
+def pack(data):
+    """The compact JSON text of ShareGameDataV2 `data`."""
+    if data.get('v') != 2:
+        raise ValueError("compact codes carry ShareGameDataV2 only")
+    doc = {'pc': data['pc'], 'd': data['d'], 'p': data['p'], 's': _pack_entries(data['s'])}
+    if 'c' in data:
+        doc['c'] = _pack_entries(data['c'])
+    return share_json(doc)
+
+
+def unpack(text):
+    doc = json.loads(text)
+    data = {'v': 2, 'pc': doc['pc'], 'd': doc['d'], 'p': doc['p'], 's': _unpack_entries(doc['s'])}
+    if 'c' in doc:
+        data['c'] = _unpack_entries(doc['c'])
+    return data
+
+
+def encode_compact(data, zdict=None):
+    """Compact share code of ShareGameDataV2 `data`."""
+    z = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zdict=zdict or PRESET_DICTIONARY)
+    raw = bytes([COMPACT_VERSION]) + z.compress(pack(data).encode('utf-8')) + z.flush()
+    return COMPACT_MARKER + base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_compact(code, zdict=None):
+    """ShareGameDataV2 of a compact share code."""
+    if not code.startswith(COMPACT_MARKER):
+        raise ValueError("not a compact share code")
+    body = code[len(COMPACT_MARKER):]
+    raw = base64.urlsafe_b64decode(body + '=' * (-len(body) % 4))
+    if raw[0] != COMPACT_VERSION:
+        raise ValueError(f"unsupported compact share code version: {raw[0]}")
+    z = zlib.decompressobj(-15, zdict=zdict or PRESET_DICTIONARY)
+    return unpack((z.decompress(raw[1:]) + z.flush()).decode('utf-8'))
+
+
+def train_dictionary(samples, size=1024, lengths=(4, 6, 8, 12, 16, 24, 32)):
+    """A preset dictionary of up to `size` UTF-8 bytes for compressing texts like `samples`.
+
+    Substrings are scored by how many samples contain them times their
+    length and taken greedily, skipping any whose 4-grams are mostly in the
+    dictionary already. The best come last, where deflate reaches them with
+    the shortest distances.
+    """
+    df = Counter()
+    for text in samples:
+        seen = set()
+        for n in lengths:
+            seen.update(text[i:i + n] for i in range(len(text) - n + 1))
+        df.update(seen)
+    picked = []
+    covered = set()
+    used = 0
+    for sub, count in sorted(df.items(), key=lambda kv: (-kv[1] * len(kv[0].encode('utf-8')), kv[0])):
+        if count < 2:
+            break
+        n = len(sub.encode('utf-8'))
+        grams = {sub[i:i + 4] for i in range(len(sub) - 3)}
+        if used + n > size or len(grams & covered) * 2 > len(grams):
+            continue
+        picked.append(sub)
+        covered |= grams
+        used += n
+    return ''.join(reversed(picked)).encode('utf-8')
+
+
+# Trained once with train_dictionary() on the packed text of the first
+# synthetic_corpus() and frozen since: compact codes carry COMPACT_VERSION,
+# not the dictionary, so changing a byte here breaks every code already
+# shared. A retrained dictionary needs a new COMPACT_VERSION, with this one
+# kept for decoding version 1 codes.
+PRESET_DICTIONARY = (
+    '2,-4,4,-5,-23,2,3,-21,-2日12:4,-5,5,-日04:i":[2,f":[[3,":29"],'
+    ':25"],2,-5":3,"d":"陽菜",""由美","","優子"4,-24,-1,3,-5,-40,-1,1,-'
+    ',0,83,-10,20-2,-たけし",""美咲","0,25,0,9,-110,220,16"由美"-1,-,-10'
+    '0,19"陽菜"日03:たけし"","太郎"あおい","0,28","たけし0,180,17"次郎","","美咲""太'
+    '郎"郎","1,-10,260,15"大輔","日02:2,-10,23"美咲"","あおい"花子","0,290,21'
+    ',-5,,-4,6"],日13:0,24","花子"さくら","0,27,-3,0"],"花子"","大輔"日01:3"'
+    '],,-1,あおい""あおい4"],","さくら9"],8"],7"],2"],"大輔",-2,1"],5"],日00:'
+    '","ゆうきさくら""さくら8,0,6,0,ゆうき","7,0,":[-日14:5,0,日23:9,0,ゆうき""ゆうき'
+    '日22:日15:[4,",0,3,1,2,0,3,1,2,0,3,1,2,0,3,1,2,0,2,1,3,0,2,1,3'
+    ',0,2,1,3,0,2,1,3日16:日20:日21:日19:,0,1,2,3,0,1,2,3,0,1,2,3,0,1'
+    ',2,3日18:日17:,0,2{"pci":[]]}}],"x],"t2025/0"],[4,,"x":[,"t":['
+    '17","p":["":[4,0,0,0,4,0,0,0,0,0],"f":[[4,"pc":4,"d":"2025"]'
+    ']},"c":{"h":[4,0,1,0,0,0,1,0,0,0,1,0,0,0],"i":"],"s":{"h":[1'
+    ',0,0,0,1,0,0,0,1,0":[1,0,0,0,1,0,0,0,1,0,0,0,1,0,0'
+).encode('utf-8')
+
+
+# ──────────────────────────────────────────────
+# Synthetic games
+# ──────────────────────────────────────────────
+
+def synthetic_corpus(n=200, seed=1):
+    """`n` games with a mix of lengths (mostly an evening, a few marathons) and 3 or 4 players."""
+    from synthetic import SyntheticGame
+
+    rng = random.Random(seed)
+    return [SyntheticGame(rng.getrandbits(64), rng.choice([4, 4, 4, 3]),
+                          rng.choice([1, 2, 4, 6, 8, 8, 10, 12, 16, 24, 40, 80])).share_data()
+            for _ in range(n)]
+
+
+# ──────────────────────────────────────────────
+# Benchmark
+# ──────────────────────────────────────────────
+
+def benchmark(games, repeat=3):
+    """Code and URL lengths and throughput of both codecs over `games`.
+
+    Returns ``{codec: {'code': total code chars, 'url': total URL chars,
+    'encode': games/s, 'decode': games/s}}`` plus ``'json'``, the total
+    JSON length. Every code is checked to round-trip.
+    """
+    texts = [share_json(g) for g in games]
+    codecs = {
+        'v2': (lambda g, t: encode_share_code(t), lambda c: json.loads(decode_share_code(c))),
+        'compact': (lambda g, t: encode_compact(g), decode_compact),
+    }
+    out = {'json': sum(len(t.encode('utf-8')) for t in texts)}
+    for name, (encode, decode) in codecs.items():
+        codes = [encode(g, t) for g, t in zip(games, texts)]
+        for g, c in zip(games, codes):
+            if decode(c) != g:
+                raise AssertionError(f"{name} does not round-trip")
+        best_enc = best_dec = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for g, t in zip(games, texts):
+                encode(g, t)
+            t1 = time.perf_counter()
+            for c in codes:
+                decode(c)
+            t2 = time.perf_counter()
+            best_enc = min(best_enc, t1 - t0)
+            best_dec = min(best_dec, t2 - t1)
+        out[name] = {
+            'code': sum(len(c) for c in codes),
+            'url': sum(len(share_url(c)) for c in codes),
+            'encode': len(games) / best_enc,
+            'decode': len(games) / best_dec,
+        }
+    return out
+
+
+def format_benchmark(label, games, result):
+    ref = result['v2']
+    lines = [f"{label}: {len(games)} games, {result['json']} bytes of JSON",
+             f"  {'codec':<9}{'code':>10}{'url':>10}{'vs v2':>8}{'encode/s':>11}{'decode/s':>11}"]
+    for name in ('v2', 'compact'):
+        r = result[name]
+        lines.append(f"  {name:<9}{r['code']:>10}{r['url']:>10}{r['url'] / ref['url']:>8.1%}"
+                     f"{r['encode']:>11.0f}{r['decode']:>11.0f}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('backups', nargs='*', help='app database backups whose games join the corpus')
+    parser.add_argument('--games', type=int, default=200, help='synthetic games (default: 200)')
+    parser.add_argument('--seed', type=int, default=1, help='synthetic corpus seed (default: 1)')
+    parser.add_argument('--train', action='store_true',
+                        help='print a preset dictionary trained on the corpus and exit')
+    cli = parser.parse_args()
+
+    synthetic = synthetic_corpus(cli.games, cli.seed)
+    real = [g for path in cli.backups for g in export_backup(path)]
+    if cli.train:
+        sys.stdout.write(repr(train_dictionary([pack(g) for g in synthetic + real]).decode('utf-8')) + '\n')
+        raise SystemExit
+    print(format_benchmark('synthetic', synthetic, benchmark(synthetic)))
+    if real:
+        print(format_benchmark('backups', real, benchmark(real)))
+    short = [g for g in synthetic + real if len(g['s']) <= 12 * g['pc']]
+    if short:
+        print(format_benchmark('up to 12 hanchan', short, benchmark(short)))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Seeded synthetic Mahjong Score Table games for load testing.
+
+Games have 3 or 4 players and any number of hanchan. Each hanchan is
+scored the way a table settles one: final scores are drawn around the
+starting stack, then converted to points with return, oka and uma,
+rounded to thousands with the top player absorbing the remainder. Every
+hanchan's points sum to zero and are not all zero, and every chip
+movement likewise, so all data passes the checks GameScreen applies with
+calcTotal / isAllZero in utils.ts.
+
+A game is regenerated from its own seed whenever it is iterated, so
+nothing is held in memory. write_sqlite() streams games into a database
+with the schema of database.ts, and write_share_codes() writes one share
+code per line.
+"""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# player count -> (starting stack, return, uma by rank)
+RULES = {
+    4: (25000, 30000, (30, 10, -10, -30)),
+    3: (35000, 40000, (20, 0, -20)),
+}
+POINT_RANGE = (-200, 200)   # DrumRollInput's min / max
+CHIP_RANGE = (-10, 10)
+
+NAMES = ['太郎', '花子', '次郎', '美咲', '健太', 'さくら', '翔', '陽菜', '大輔', '由美',
+         'ゆうき', 'あおい', 'Ken', 'Mai', 'たけし', '優子']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  player_count INTEGER NOT NULL,
+  start_date TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  finished INTEGER NOT NULL DEFAULT 0,
+  imported INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS scores (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  game_id INTEGER NOT NULL,
+  hanchan INTEGER NOT NULL,
+  player_name TEXT NOT NULL,
+  point INTEGER NOT NULL,
+  rank INTEGER NOT NULL,
+  timestamp INTEGER NOT NULL,
+  formatted_time TEXT NOT NULL,
+  FOREIGN KEY (game_id) REFERENCES games (id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS chips (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  game_id INTEGER NOT NULL,
+  hanchan INTEGER NOT NULL,
+  player_name TEXT NOT NULL,
+  chip_point INTEGER NOT NULL,
+  timestamp INTEGER NOT NULL,
+  formatted_time TEXT NOT NULL,
+  FOREIGN KEY (game_id) REFERENCES games (id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS game_players (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  game_id INTEGER NOT NULL,
+  player_name TEXT NOT NULL,
+  sort_order INTEGER NOT NULL,
+  FOREIGN KEY (game_id) REFERENCES games (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_scores_game ON scores(game_id);
+CREATE INDEX IF NOT EXISTS idx_scores_hanchan ON scores(game_id, hanchan);
+CREATE INDEX IF NOT EXISTS idx_chips_game ON chips(game_id);
+CREATE INDEX IF NOT EXISTS idx_game_players_game ON game_players(game_id);
+"""
+
+
+# ──────────────────────────────────────────────
+# App rules (utils.ts)
+# ──────────────────────────────────────────────
+
+def is_all_zero(values):
+    return all(v == 0 for v in values)
+
+
+def calc_total(values):
+    return sum(values)
+
+
+def format_date(ts):
+    """formatDate (YYYY/MM/DD), in UTC."""
+    t = datetime.fromtimestamp(ts / 1000, timezone.utc)
+    return f"{t.year}/{t.month:02d}/{t.day:02d}"
+
+
+def format_time(ts):
+    """formatTime (M月D日HH:mm), in UTC."""
+    t = datetime.fromtimestamp(ts / 1000, timezone.utc)
+    return f"{t.month}月{t.day}日{t.hour:02d}:{t.minute:02d}"
+
+
+# ──────────────────────────────────────────────
+# Model
+# ──────────────────────────────────────────────
+
+def hanchan_points(rng, players, spread=12000):
+    """Points of one hanchan for `players` seats, zero-sum and not all zero."""
+    start, ret, uma = RULES[players]
+    shifts = [rng.gauss(0, spread) for _ in range(players)]
+    mean = sum(shifts) / players
+    finals = [start + round((s - mean) / 100) * 100 for s in shifts]
+    finals[0] += start * players - sum(finals)
+    # Equal scores go to the earlier seat, as at the table
+    order = sorted(range(players), key=lambda i: (-finals[i], i))
+    points = [0] * players
+    for rank, i in enumerate(order[1:], 1):
+        points[i] = round((finals[i] - ret) / 1000) + uma[rank]
+    top = order[0]
+    points[top] = -sum(points)
+    lo, hi = POINT_RANGE
+    if not all(lo <= p <= hi for p in points):
+        return hanchan_points(rng, players, spread)
+    return points
+
+
+def chip_moves(rng, players):
+    """A zero-sum, not all-zero chip movement."""
+    lo, hi = CHIP_RANGE
+    while True:
+        moves = [rng.randint(lo // 2, hi // 2) for _ in range(players - 1)]
+        moves.append(-sum(moves))
+        if not is_all_zero(moves) and lo <= moves[-1] <= hi:
+            return moves
+
+
+class SyntheticGame:
+    """One generated game; iterate rounds() as often as needed, it is rebuilt from `seed`."""
+
+    def __init__(self, seed, players, hanchan, chip_rate=0.25, start=None):
+        self.seed = seed
+        rng = random.Random(seed)
+        self.players = rng.sample(NAMES, players)
+        self.hanchan = hanchan
+        self.chip_rate = chip_rate
+        if start is None:
+            start = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(
+                days=rng.randrange(365), hours=rng.randrange(12, 22))
+        self.created_at = int(start.timestamp() * 1000)
+        self._rounds_seed = rng.getrandbits(64)
+
+    def rounds(self):
+        """Yield ``(hanchan, timestamp, points, chips)`` per hanchan; chips is None or
+        ``(timestamp, moves)``. Points and moves are per player, in seat order."""
+        rng = random.Random(self._rounds_seed)
+        n = len(self.players)
+        ts = self.created_at
+        for h in range(1, self.hanchan + 1):
+            ts += rng.randrange(25, 50) * 60000 + rng.randrange(60000)
+            points = hanchan_points(rng, n)
+            if calc_total(points) != 0 or is_all_zero(points):
+                raise AssertionError(f"hanchan {h} breaks the app's score rules: {points}")
+            chips = None
+            if rng.random() < self.chip_rate:
+                chips = (ts + rng.randrange(1000, 60000), chip_moves(rng, n))
+            yield h, ts, points, chips
+
+    def share_data(self):
+        """ShareGameDataV2 of the game, in exportGameData's order (hanchan, then player name)."""
+        order = sorted(range(len(self.players)), key=lambda i: self.players[i])
+        scores, chips = [], []
+        for h, ts, points, chip in self.rounds():
+            ft = format_time(ts)
+            scores.extend([h, i, points[i], ts, ft] for i in order)
+            if chip:
+                cts, moves = chip
+                cft = format_time(cts)
+                chips.extend([h, i, moves[i], cts, cft] for i in order)
+        data = {'v': 2, 'pc': len(self.players), 'd': format_date(self.created_at),
+                'p': self.players, 's': scores}
+        if chips:
+            data['c'] = chips
+        return data
+
+
+def synthetic_games(games, hanchan, seed=0, players=(3, 4, 4, 4), chip_rate=0.25):
+    """Yield `games` SyntheticGames.
+
+    `hanchan` is a count or a (min, max) range drawn from per game; the
+    player count is drawn from `players`.
+    """
+    rng = random.Random(seed)
+    for _ in range(games):
+        n = hanchan if isinstance(hanchan, int) else rng.randint(*hanchan)
+        yield SyntheticGame(rng.getrandbits(64), rng.choice(players), n, chip_rate)
+
+
+# ──────────────────────────────────────────────
+# Output
+# ──────────────────────────────────────────────
+
+def write_sqlite(path, games, batch=50000):
+    """Stream `games` into the SQLite database at `path` (created with database.ts's schema).
+
+    Rows go in through executemany() in batches of `batch`, so memory stays
+    flat however many rounds the games have. Returns (games, score rows,
+    chip rows) written. Needs numpy, for ranking through analytics.py.
+    """
+    import numpy as np
+    from analytics import competition_ranks
+
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    con.execute('PRAGMA journal_mode=OFF')
+    con.execute('PRAGMA synchronous=OFF')
+    n_games = n_scores = n_chips = 0
+    scores, chips = [], []
+
+    def flush():
+        nonlocal n_scores, n_chips
+        # A batch holds whole hanchan, so they rank in one pass over the batch
+        if scores:
+            cols = list(zip(*scores))
+            game, hanchan, point = (np.array(cols[i], dtype=np.int64) for i in (0, 1, 3))
+            ranks = competition_ranks(game * (int(hanchan.max()) + 1) + hanchan, point).tolist()
+            scores[:] = [row[:4] + (rank,) + row[4:] for row, rank in zip(scores, ranks)]
+        con.executemany('INSERT INTO scores (game_id, hanchan, player_name, point, rank, timestamp, '
+                        'formatted_time) VALUES (?, ?, ?, ?, ?, ?, ?)', scores)
+        con.executemany('INSERT INTO chips (game_id, hanchan, player_name, chip_point, timestamp, '
+                        'formatted_time) VALUES (?, ?, ?, ?, ?, ?)', chips)
+        n_scores += len(scores)
+        n_chips += len(chips)
+        scores.clear()
+        chips.clear()
+
+    try:
+        for game in games:
+            game_id = con.execute(
+                'INSERT INTO games (player_count, start_date, created_at, finished) VALUES (?, ?, ?, 1)',
+                (len(game.players), format_date(game.created_at), game.created_at)).lastrowid
+            con.executemany('INSERT INTO game_players (game_id, player_name, sort_order) VALUES (?, ?, ?)',
+                            [(game_id, name, i) for i, name in enumerate(game.players)])
+            for h, ts, points, chip in game.rounds():
+                ft = format_time(ts)
+                scores.extend((game_id, h, name, p, ts, ft) for name, p in zip(game.players, points))
+                if chip:
+                    cts, moves = chip
+                    cft = format_time(cts)
+                    chips.extend((game_id, h, name, m, cts, cft) for name, m in zip(game.players, moves))
+                if len(scores) >= batch:
+                    flush()
+            n_games += 1
+        flush()
+        con.commit()
+    finally:
+        con.close()
+    return n_games, n_scores, n_chips
+
+
+def write_share_codes(path, games):
+    """Write the share code of each of `games` to `path`, one per line; returns the count."""
+    from sharecode import encode_share_code, share_json
+
+    n = 0
+    with open(path, 'w', encoding='ascii') as fh:
+        for game in games:
+            fh.write(encode_share_code(share_json(game.share_data())) + '\n')
+            n += 1
+    return n
+
+
+def _hanchan_arg(text):
+    lo, _, hi = text.partition('-')
+    return int(lo) if not hi else (int(lo), int(hi))
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100, help='games to generate (default: 100)')
+    parser.add_argument('--hanchan', type=_hanchan_arg, default=(1, 20),
+                        help="hanchan per game, N or MIN-MAX (default: 1-20)")
+    parser.add_argument('--players', default='3,4,4,4',
+                        help='player counts drawn from per game (default: 3,4,4,4)')
+    parser.add_argument('--chip-rate', type=float, default=0.25,
+                        help='chance of a chip movement after each hanchan (default: 0.25)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--db', help='write the games to this SQLite file')
+    parser.add_argument('--codes', help='write one share code per game to this file')
+    cli = parser.parse_args()
+    if not cli.db and not cli.codes:
+        parser.error('nothing to write: give --db and/or --codes')
+
+    players = tuple(int(p) for p in cli.players.split(','))
+    for p in players:
+        if p not in RULES:
+            parser.error(f"unsupported player count: {p}")
+
+    def games():
+        return synthetic_games(cli.games, cli.hanchan, cli.seed, players, cli.chip_rate)
+
+    if cli.db:
+        t0 = time.time()
+        n_games, n_scores, n_chips = write_sqlite(cli.db, games())
+        print(f"{cli.db}: {n_games} games, {n_scores} score rows, {n_chips} chip rows "
+              f"in {time.time() - t0:.1f}s")
+    if cli.codes:
+        t0 = time.time()
+        n = write_share_codes(cli.codes, games())
+        print(f"{cli.codes}: {n} share codes in {time.time() - t0:.1f}s")